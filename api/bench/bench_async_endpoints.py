@@ -0,0 +1,168 @@
+"""同期 LLM 呼び出しと非同期 LLM 呼び出しのスループット比較ベンチマーク
+
+LLM の代わりに一定時間待機するだけの疑似チェーンを使い、N 個の同時クライアントから
+質問生成・診断 API を呼び出したときのスループットと、負荷中のヘルスチェック応答時間を測定する。
+
+- before: async エンドポイント内で同期の chain.invoke を呼ぶ（従来の実装）
+- after: async エンドポイントから chain.ainvoke を await する（現在の main.py）
+
+実行方法:
+    cd api
+    .venv/bin/python bench/bench_async_endpoints.py --clients 32 --requests 4 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+import main
+import services.diagnosis_service as diagnosis_service
+import services.question_generator as question_generator
+from models.diagnosis import DiagnosisRequest, PrimaryDiagnosisResult, QuestionAnswer
+from models.question import Question, QuestionSet
+
+
+def _sample_question_set() -> QuestionSet:
+    """疑似チェーンが返す質問セット"""
+    return QuestionSet(
+        questions=[
+            Question(
+                question_text=f"質問{i + 1}",
+                choices=["選択肢A", "選択肢B", "選択肢C", "選択肢D"],
+            )
+            for i in range(10)
+        ]
+    )
+
+
+class SimulatedChain:
+    """一定時間待機してから固定の結果を返す疑似チェーン"""
+
+    def __init__(self, result, latency: float):
+        self.result = result
+        self.latency = latency
+
+    def invoke(self, _input):
+        time.sleep(self.latency)
+        return self.result
+
+    async def ainvoke(self, _input, config=None):
+        await asyncio.sleep(self.latency)
+        return self.result
+
+
+def install_simulated_chains(latency: float) -> None:
+    """サービスが使うチェーンを疑似チェーンに差し替える"""
+    question_chain = SimulatedChain(_sample_question_set(), latency)
+    diagnosis_chain = SimulatedChain(
+        PrimaryDiagnosisResult(primary="強化系", specialist_score=50, reason="ベンチマーク"),
+        latency,
+    )
+    question_generator.get_question_chain = lambda: question_chain
+    diagnosis_service.get_diagnosis_chain = lambda: diagnosis_chain
+
+
+def build_blocking_app() -> FastAPI:
+    """従来の実装（async エンドポイント内で同期呼び出し）を再現したアプリ"""
+    app = FastAPI()
+
+    @app.get("/")
+    async def root():
+        return {"message": "ok"}
+
+    @app.get("/api/questions/generate")
+    async def generate():
+        return question_generator.generate_questions()
+
+    @app.post("/api/diagnosis")
+    async def diagnose(request: DiagnosisRequest):
+        return diagnosis_service.diagnose_personality(request.question_answers)
+
+    return app
+
+
+def _diagnosis_payload() -> dict:
+    """診断 API のリクエストボディ"""
+    question_set = _sample_question_set()
+    request = DiagnosisRequest(
+        question_answers=[
+            QuestionAnswer(question=q, selected_choice_index=i % 4)
+            for i, q in enumerate(question_set.questions)
+        ]
+    )
+    return request.model_dump()
+
+
+async def run_load(app, clients: int, requests_per_client: int) -> dict:
+    """N 個のクライアントから同時にリクエストを送り、結果を集計する"""
+    transport = httpx.ASGITransport(app=app)
+    payload = _diagnosis_payload()
+    health_latencies = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def worker(index: int):
+            for i in range(requests_per_client):
+                if (index + i) % 2 == 0:
+                    response = await client.get("/api/questions/generate")
+                else:
+                    response = await client.post("/api/diagnosis", json=payload)
+                response.raise_for_status()
+
+        async def health_probe():
+            # 10ms ごとにヘルスチェックを送り、予定時刻からの遅れも含めた応答時間を記録する
+            while not done.is_set():
+                scheduled = time.perf_counter()
+                await asyncio.sleep(0.01)
+                await client.get("/")
+                health_latencies.append(time.perf_counter() - scheduled - 0.01)
+
+        probe = asyncio.create_task(health_probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe
+
+    total = clients * requests_per_client
+    return {
+        "requests": total,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": total / elapsed,
+        "health_max_ms": max(health_latencies) * 1000 if health_latencies else 0.0,
+    }
+
+
+def _print_result(label: str, result: dict) -> None:
+    print(
+        f"{label:<8} {result['requests']:>5} req  {result['elapsed_seconds']:>7.2f} s  "
+        f"{result['throughput_rps']:>8.1f} req/s  health max {result['health_max_ms']:>8.1f} ms"
+    )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32, help="同時クライアント数")
+    parser.add_argument("--requests", type=int, default=4, help="クライアントあたりのリクエスト数")
+    parser.add_argument("--latency", type=float, default=0.2, help="疑似 LLM 呼び出しの所要時間（秒）")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    install_simulated_chains(args.latency)
+
+    print(f"clients={args.clients} requests/client={args.requests} latency={args.latency}s")
+    _print_result("before", asyncio.run(run_load(build_blocking_app(), args.clients, args.requests)))
+    _print_result("after", asyncio.run(run_load(main.app, args.clients, args.requests)))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,160 @@
+"""コールドスタート（初期化）時間のベンチマーク
+
+毎回新しい Python プロセスで Lambda のエントリーポイントを読み込み、
+モジュールの読み込み時間と lifespan の起動処理（LLM チェーンの事前構築を含む）の
+所要時間を測定する。`-X importtime` の出力からパッケージごとの読み込み時間も集計する。
+
+--save で結果を JSON に保存し、--baseline で保存済みの結果と比較できる。
+中央値が --max-regression を超えて悪化した場合は終了コード 1 を返すので、
+デプロイ前のチェックに使える。
+
+実行方法:
+    cd api
+    .venv/bin/python bench/bench_cold_start.py --runs 5 --save cold-start.json
+    .venv/bin/python bench/bench_cold_start.py --runs 5 --baseline cold-start.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子プロセスで実行するコード（読み込み時間と起動処理の時間を JSON で出力する）
+CHILD_CODE = """
+import asyncio, json, time
+started = time.perf_counter()
+import {target} as entry
+imported = time.perf_counter()
+
+async def startup():
+    async with entry.app.router.lifespan_context(entry.app):
+        pass
+
+asyncio.run(startup())
+ready = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000}}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """`-X importtime` の出力からトップレベルのパッケージごとの自身の読み込み時間（ms）を集計する"""
+    packages: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            packages[name.split(".")[0]] += int(self_us) / 1000
+        except ValueError:
+            continue
+    return packages
+
+
+def run_once(target: str) -> dict:
+    """新しいプロセスで1回だけ初期化を実行して計測する"""
+    env = dict(os.environ)
+    for name in ("COLD_START_PROFILE", "AWS_LAMBDA_FUNCTION_NAME", "PYTHONPROFILEIMPORTTIME"):
+        env.pop(name, None)
+    # LLM チェーンの事前構築まで計測するためにダミーのキーを設定する（API は呼び出さない）
+    env.setdefault("GOOGLE_API_KEY", "bench-cold-start-dummy-key")
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_CODE.format(target=target)],
+        cwd=API_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{target} の初期化に失敗しました:\n{proc.stderr[-2000:]}")
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["packages"] = parse_importtime(proc.stderr)
+    return result
+
+
+def summarize(runs: List[dict], top: int) -> dict:
+    """複数回の計測結果を中央値で集計する"""
+    packages: Dict[str, List[float]] = defaultdict(list)
+    for run in runs:
+        for name, ms in run["packages"].items():
+            packages[name].append(ms)
+    package_medians = sorted(
+        ((name, statistics.median(values)) for name, values in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    import_ms = [run["import_ms"] for run in runs]
+    startup_ms = [run["startup_ms"] for run in runs]
+    total_ms = [run["import_ms"] + run["startup_ms"] for run in runs]
+    return {
+        "runs": len(runs),
+        "import_ms": {"median": statistics.median(import_ms), "min": min(import_ms)},
+        "startup_ms": {"median": statistics.median(startup_ms), "min": min(startup_ms)},
+        "total_ms": {"median": statistics.median(total_ms), "min": min(total_ms)},
+        "packages": [{"package": name, "self_ms": ms} for name, ms in package_medians[:top]],
+    }
+
+
+def print_summary(target: str, summary: dict) -> None:
+    """集計結果を表示する"""
+    print(f"\n{target}（{summary['runs']} 回、中央値 / 最小）")
+    for key, label in (("import_ms", "import"), ("startup_ms", "startup"), ("total_ms", "total")):
+        print(f"  {label:8s} {summary[key]['median']:8.1f}ms / {summary[key]['min']:8.1f}ms")
+    print("  パッケージごとの読み込み時間（self、中央値）")
+    for item in summary["packages"]:
+        print(f"    {item['self_ms']:8.1f}ms  {item['package']}")
+
+
+def compare(summary: dict, baseline: dict, max_regression: float) -> bool:
+    """ベースラインと比較し、悪化が許容範囲内なら True を返す"""
+    ok = True
+    for key in ("import_ms", "startup_ms", "total_ms"):
+        before = baseline[key]["median"]
+        after = summary[key]["median"]
+        ratio = (after - before) / before if before > 0 else 0.0
+        regressed = ratio > max_regression
+        ok = ok and not regressed
+        mark = "✗" if regressed else "✓"
+        print(f"  {mark} {key:10s} {before:8.1f}ms → {after:8.1f}ms ({ratio:+.1%})")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="コールドスタート（初期化）時間のベンチマーク")
+    parser.add_argument("--target", default="lambda_handler", help="読み込むモジュール（デフォルト lambda_handler）")
+    parser.add_argument("--runs", type=int, default=5, help="計測回数（デフォルト 5）")
+    parser.add_argument("--top", type=int, default=15, help="表示するパッケージ数（デフォルト 15）")
+    parser.add_argument("--save", help="結果を保存する JSON ファイル")
+    parser.add_argument("--baseline", help="比較するベースラインの JSON ファイル")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.2, help="許容する悪化の割合（デフォルト 0.2 = 20%%）"
+    )
+    args = parser.parse_args()
+
+    runs = [run_once(args.target) for _ in range(args.runs)]
+    summary = summarize(runs, args.top)
+    print_summary(args.target, summary)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nベースライン（{args.baseline}）との比較（許容 {args.max_regression:.0%}）")
+        if not compare(summary, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
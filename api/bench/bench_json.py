@@ -0,0 +1,142 @@
+"""JSON のシリアライズのマイクロベンチマーク
+
+実際のペイロード（同梱の QuestionSet、診断結果、script/players.json）で、
+FastAPI のデフォルトの経路（モデルの再検証 + jsonable_encoder + json.dumps）と
+orjson / 検証済みモデルの高速な経路（services.responses.model_response）の所要時間を比較する。
+players.json は読み込みと json.dump(..., indent=2) 形式での書き出しも比較する。
+
+実行方法:
+    cd api
+    .venv/bin/python bench/bench_json.py --number 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import Callable, List, Tuple
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, API_DIR)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from models.diagnosis import DiagnosisResponse
+from models.question import QuestionSetResponse
+from prompts.diagnosis import CANNED_COMMENTS
+from prompts.fallback_questions import FALLBACK_QUESTION_SET
+from services.responses import FastJSONResponse, model_response
+from services.serialization import HAS_ORJSON, dumps, loads
+
+PLAYERS_JSON = os.path.join(os.path.dirname(API_DIR), "script", "players.json")
+
+
+def fastapi_default(model, model_class) -> Callable[[], bytes]:
+    """FastAPI のデフォルトの経路（response_model での再検証 → jsonable_encoder → JSONResponse）"""
+
+    def run() -> bytes:
+        validated = model_class.model_validate(model.model_dump())
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    return run
+
+
+def orjson_response(model, model_class) -> Callable[[], bytes]:
+    """デフォルトのレスポンスクラスだけを orjson にした経路（再検証と jsonable_encoder は残る）"""
+
+    def run() -> bytes:
+        validated = model_class.model_validate(model.model_dump())
+        return FastJSONResponse(jsonable_encoder(validated)).body
+
+    return run
+
+
+def model_dump_json(model) -> Callable[[], bytes]:
+    """再検証はせず、pydantic-core で直接 JSON にする経路"""
+    return lambda: Response(model.model_dump_json(), media_type="application/json").body
+
+
+def trusted_model(model) -> Callable[[], bytes]:
+    """再検証はせず、dict にしてから orjson で JSON にする経路（main.py で使用）"""
+    return lambda: model_response(model).body
+
+
+def measure(name: str, func: Callable[[], object], number: int, repeat: int) -> Tuple[str, float]:
+    """1回あたりの所要時間（µs、repeat 回の最小値）を返す"""
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return name, best / number * 1e6
+
+
+def print_group(title: str, size: int, results: List[Tuple[str, float]]) -> None:
+    """ベースライン（先頭）との比較を表示する"""
+    baseline = results[0][1]
+    print(f"\n{title}（{size:,} bytes）")
+    for name, us in results:
+        print(f"  {name:<36} {us:10.1f} µs  x{baseline / us:5.2f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="1回の計測での実行回数（デフォルト 2000）")
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数（最小値を採用、デフォルト 5）")
+    args = parser.parse_args()
+    number, repeat = args.number, args.repeat
+    print(f"orjson: {'有効' if HAS_ORJSON else '未インストール（標準ライブラリの json を使用）'}")
+
+    question_set = QuestionSetResponse.model_validate({**FALLBACK_QUESTION_SET, "set_id": "0" * 32})
+    print_group(
+        "QuestionSet レスポンス",
+        len(model_response(question_set).body),
+        [
+            measure("FastAPI デフォルト", fastapi_default(question_set, QuestionSetResponse), number, repeat),
+            measure("orjson レスポンスクラス", orjson_response(question_set, QuestionSetResponse), number, repeat),
+            measure("model_dump_json", model_dump_json(question_set), number, repeat),
+            measure("検証済みモデル（model_response）", trusted_model(question_set), number, repeat),
+        ],
+    )
+
+    diagnosis = DiagnosisResponse(scores=[80, 100, 80, 60, 60, 80], comment=CANNED_COMMENTS["強化系"])
+    print_group(
+        "DiagnosisResponse レスポンス",
+        len(model_response(diagnosis).body),
+        [
+            measure("FastAPI デフォルト", fastapi_default(diagnosis, DiagnosisResponse), number, repeat),
+            measure("orjson レスポンスクラス", orjson_response(diagnosis, DiagnosisResponse), number, repeat),
+            measure("model_dump_json", model_dump_json(diagnosis), number, repeat),
+            measure("検証済みモデル（model_response）", trusted_model(diagnosis), number, repeat),
+        ],
+    )
+
+    with open(PLAYERS_JSON, "rb") as f:
+        raw = f.read()
+    players = json.loads(raw)
+    player_number = max(1, number // 20)
+    print_group(
+        "players.json 読み込み",
+        len(raw),
+        [
+            measure("json.loads", lambda: json.loads(raw.decode("utf-8")), player_number, repeat),
+            measure("serialization.loads", lambda: loads(raw), player_number, repeat),
+        ],
+    )
+    print_group(
+        "players.json 書き出し（indent=2）",
+        len(raw),
+        [
+            measure(
+                "json.dumps(ensure_ascii=False)",
+                lambda: json.dumps(players, ensure_ascii=False, indent=2).encode("utf-8"),
+                player_number,
+                repeat,
+            ),
+            measure("serialization.dumps(indent=True)", lambda: dumps(players, indent=True), player_number, repeat),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main_cli()
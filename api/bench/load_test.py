@@ -0,0 +1,356 @@
+"""FastAPI アプリの負荷試験
+
+main.py のアプリを同じプロセス内で ASGI クライアント（httpx）から呼び出し、
+指定した同時実行数・リクエストの比率・時間で質問生成・診断 API に負荷をかける。
+LLM は fake バックエンド（LLM_BACKEND=fake、所要時間は対数正規分布）を使うため API キーは不要。
+
+スループット、エンドポイントごとの p50 / p95 / p99、イベントループの遅延、RSS を計測し、
+--save で JSON に保存、--baseline で保存済みの結果と比較できる
+（スループットまたは p95 が --max-regression を超えて悪化した場合は終了コード 1）。
+
+1つの uvicorn ワーカーの上限は --concurrency を増やして、Lambda の1インスタンス
+（同時に1リクエストのみ処理する）は --concurrency 1 で測定する。
+
+実行方法:
+    cd api
+    .venv/bin/python bench/load_test.py --concurrency 32 --duration 30 --mix questions=1,diagnosis=3
+    .venv/bin/python bench/load_test.py --concurrency 32 --duration 30 --save load.json
+    .venv/bin/python bench/load_test.py --concurrency 32 --duration 30 --baseline load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, API_DIR)
+
+# 負荷をかける操作（--mix で指定する名前 → メソッドとパス）
+OPERATIONS = {
+    "questions": ("GET", "/api/questions/generate"),
+    "diagnosis": ("POST", "/api/diagnosis"),
+    "health": ("GET", "/"),
+}
+
+# イベントループの遅延を測定する間隔（秒）
+LOOP_LAG_INTERVAL = 0.01
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """`questions=1,diagnosis=3` 形式のリクエストの比率を解析する"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"不明な操作です: {name}（{', '.join(OPERATIONS)}）")
+        mix[name] = float(weight) if weight else 1.0
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("比率の合計は正の値にしてください")
+    return mix
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """ソート済みのサンプルの分位点（サンプルがない場合は 0）"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(samples: List[float]) -> dict:
+    """所要時間（秒）のサンプルを ms の統計値にまとめる"""
+    ordered = sorted(samples)
+    return {
+        "p50_ms": percentile(ordered, 0.5) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+    }
+
+
+def rss_mb() -> float:
+    """現在の RSS（MB）。/proc がない環境ではピークの RSS を返す"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS はバイト、Linux は KB
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def diagnosis_payload(question_set: dict, rng: random.Random) -> dict:
+    """診断 API のリクエストボディ（回答はランダムに選ぶ）"""
+    return {
+        "question_answers": [
+            {"question": question, "selected_choice_index": rng.randrange(len(question["choices"]))}
+            for question in question_set["questions"]
+        ]
+    }
+
+
+class LoadResult:
+    """リクエストごとの結果とイベントループの遅延・RSS のサンプル"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.fallbacks: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.loop_lags: List[float] = []
+        self.rss_samples: List[float] = []
+
+    def record(self, operation: str, status: str, seconds: float, fallback: Optional[str]) -> None:
+        self.latencies[operation].append(seconds)
+        self.statuses[operation][status] += 1
+        if fallback:
+            self.fallbacks[operation] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        """計測期間の結果を集計する"""
+        total = sum(len(samples) for samples in self.latencies.values())
+        ok = sum(counts["200"] for counts in self.statuses.values())
+        endpoints = {}
+        for operation, samples in sorted(self.latencies.items()):
+            endpoints[operation] = {
+                "requests": len(samples),
+                "throughput_rps": len(samples) / elapsed,
+                "statuses": dict(self.statuses[operation]),
+                "fallbacks": self.fallbacks[operation],
+                **latency_summary(samples),
+            }
+        all_samples = [seconds for samples in self.latencies.values() for seconds in samples]
+        return {
+            "elapsed_seconds": elapsed,
+            "requests": total,
+            "ok": ok,
+            "errors": dict(self.errors),
+            "throughput_rps": total / elapsed if elapsed > 0 else 0.0,
+            "latency": latency_summary(all_samples),
+            "endpoints": endpoints,
+            "loop_lag": latency_summary(self.loop_lags),
+            "rss_mb": {
+                "start": self.rss_samples[0] if self.rss_samples else 0.0,
+                "peak": max(self.rss_samples, default=0.0),
+                "end": self.rss_samples[-1] if self.rss_samples else 0.0,
+            },
+        }
+
+
+async def run_load(
+    app,
+    question_set: dict,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    mix: Dict[str, float],
+    use_cache: bool,
+    seed: int,
+) -> dict:
+    """
+    同時実行数ぶんのクライアントから、時間内にできるだけ多くリクエストを送る
+
+    ウォームアップ中の結果は集計しない。
+    """
+    import httpx
+
+    result = LoadResult()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    headers = {} if use_cache else {"X-Diagnosis-Cache": "bypass"}
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def monitor():
+        # 一定間隔で sleep し、予定時刻からの遅れをイベントループの遅延として記録する
+        while time.perf_counter() < deadline:
+            scheduled = time.perf_counter() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            now = time.perf_counter()
+            if now >= measure_from:
+                result.loop_lags.append(max(0.0, now - scheduled))
+                if len(result.loop_lags) % 50 == 1:
+                    result.rss_samples.append(rss_mb())
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def worker(index: int):
+            rng = random.Random(seed * 100003 + index)
+            while time.perf_counter() < deadline:
+                operation = rng.choices(names, weights)[0]
+                method, path = OPERATIONS[operation]
+                body = diagnosis_payload(question_set, rng) if operation == "diagnosis" else None
+                request_started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body, headers=headers)
+                    status, fallback = str(response.status_code), response.headers.get("x-fallback")
+                except Exception as e:
+                    status, fallback = "exception", None
+                    result.errors[type(e).__name__] += 1
+                finished = time.perf_counter()
+                if request_started >= measure_from:
+                    result.record(operation, status, finished - request_started, fallback)
+                # 429 は Retry-After だけ待つ（実際のクライアントと同様）。ASGI の呼び出しはネットワーク I/O がなく
+                # イベントループに制御を返さずに完了することがあるため、毎回制御を返す
+                retry_after = response.headers.get("retry-after") if status == "429" else None
+                await asyncio.sleep(min(float(retry_after), deadline - finished) if retry_after else 0)
+
+        result.rss_samples.append(rss_mb())
+        await asyncio.gather(monitor(), *(worker(i) for i in range(concurrency)))
+        result.rss_samples.append(rss_mb())
+
+    return result.summary(time.perf_counter() - measure_from)
+
+
+async def run_with_lifespan(args) -> dict:
+    """アプリの lifespan（LLM チェーンの事前構築など）を実行してから負荷をかける"""
+    import main
+    from services.llm_backends import fake_output
+
+    # 診断で回答する質問セットも fake で作る
+    question_set = fake_output("QuestionSet", f"load-test-{args.seed}")
+
+    async with main.app.router.lifespan_context(main.app):
+        return await run_load(
+            main.app,
+            question_set,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            warmup=args.warmup,
+            mix=args.mix,
+            use_cache=args.cache,
+            seed=args.seed,
+        )
+
+
+def print_summary(summary: dict) -> None:
+    """集計結果を表示する"""
+    config = summary["config"]
+    print(
+        f"\nconcurrency={config['concurrency']} duration={config['duration']}s mix={config['mix']} "
+        f"llm latency median={config['llm_latency_median']}s sigma={config['llm_latency_sigma']}"
+    )
+    print(
+        f"  total    {summary['requests']:>6} req  {summary['throughput_rps']:>8.1f} req/s  "
+        f"p50 {summary['latency']['p50_ms']:>8.1f}ms  p95 {summary['latency']['p95_ms']:>8.1f}ms  "
+        f"p99 {summary['latency']['p99_ms']:>8.1f}ms"
+    )
+    for operation, endpoint in summary["endpoints"].items():
+        statuses = " ".join(f"{status}:{count}" for status, count in sorted(endpoint["statuses"].items()))
+        print(
+            f"  {operation:<9}{endpoint['requests']:>6} req  {endpoint['throughput_rps']:>8.1f} req/s  "
+            f"p50 {endpoint['p50_ms']:>8.1f}ms  p95 {endpoint['p95_ms']:>8.1f}ms  "
+            f"p99 {endpoint['p99_ms']:>8.1f}ms  [{statuses}] fallback {endpoint['fallbacks']}"
+        )
+    lag = summary["loop_lag"]
+    rss = summary["rss_mb"]
+    print(f"  loop lag p50 {lag['p50_ms']:.2f}ms  p99 {lag['p99_ms']:.2f}ms  max {lag['max_ms']:.2f}ms")
+    print(f"  RSS      start {rss['start']:.1f}MB  peak {rss['peak']:.1f}MB  end {rss['end']:.1f}MB")
+    if summary["errors"]:
+        print(f"  errors   {summary['errors']}")
+
+
+def compare(summary: dict, baseline: dict, max_regression: float) -> bool:
+    """ベースラインと比較し、悪化が許容範囲内なら True を返す"""
+    checks: List[Tuple[str, float, float, bool]] = [
+        ("throughput_rps", baseline["throughput_rps"], summary["throughput_rps"], True),
+        ("p95_ms", baseline["latency"]["p95_ms"], summary["latency"]["p95_ms"], False),
+        ("loop_lag_p99_ms", baseline["loop_lag"]["p99_ms"], summary["loop_lag"]["p99_ms"], False),
+    ]
+    ok = True
+    for name, before, after, higher_is_better in checks:
+        ratio = (after - before) / before if before > 0 else 0.0
+        # イベントループの遅延は値が小さく揺れやすいため表示のみ
+        regressed = name != "loop_lag_p99_ms" and (-ratio if higher_is_better else ratio) > max_regression
+        ok = ok and not regressed
+        mark = "✗" if regressed else "✓"
+        print(f"  {mark} {name:16s} {before:10.1f} → {after:10.1f} ({ratio:+.1%})")
+    return ok
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="同時クライアント数（デフォルト 16）")
+    parser.add_argument("--duration", type=float, default=20.0, help="計測時間（秒、デフォルト 20）")
+    parser.add_argument("--warmup", type=float, default=2.0, help="集計しないウォームアップ時間（秒、デフォルト 2）")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix("questions=1,diagnosis=1"),
+        help=f"リクエストの比率（例 questions=1,diagnosis=3。操作: {', '.join(OPERATIONS)}）",
+    )
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="fake LLM の所要時間の中央値（秒、デフォルト 1.5）")
+    parser.add_argument("--llm-sigma", type=float, default=0.4, help="fake LLM の所要時間の対数正規分布の σ（デフォルト 0.4）")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="fake LLM が一時的なエラーを返す割合")
+    parser.add_argument("--cache", action="store_true", help="診断結果のキャッシュを使う（デフォルトは毎回再計算）")
+    parser.add_argument(
+        "--admission",
+        action="store_true",
+        help="アドミッション制御を有効にする（全リクエストが同じ IP アドレスのため、デフォルトは無効）",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--save", help="結果を保存する JSON ファイル")
+    parser.add_argument("--baseline", help="比較するベースラインの JSON ファイル")
+    parser.add_argument(
+        "--max-regression", type=float, default=0.2, help="許容する悪化の割合（デフォルト 0.2 = 20%%）"
+    )
+    args = parser.parse_args()
+
+    # アプリを読み込む前に fake バックエンドの設定を行う
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MEDIAN"] = str(args.llm_latency)
+    os.environ["LLM_FAKE_LATENCY_SIGMA"] = str(args.llm_sigma)
+    os.environ["LLM_FAKE_FAILURE_RATE"] = str(args.llm_failure_rate)
+    os.environ["LLM_FAKE_SEED"] = str(args.seed)
+    os.environ["ADMISSION_CONTROL"] = "true" if args.admission else "false"
+
+    summary = asyncio.run(run_with_lifespan(args))
+    summary["config"] = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "mix": args.mix,
+        "llm_latency_median": args.llm_latency,
+        "llm_latency_sigma": args.llm_sigma,
+        "llm_failure_rate": args.llm_failure_rate,
+        "cache": args.cache,
+        "admission": args.admission,
+        "seed": args.seed,
+    }
+    summary["environment"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    print_summary(summary)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nベースライン（{args.baseline}）との比較（許容 {args.max_regression:.0%}）")
+        if not compare(summary, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,41 +1,25 @@
 """
 AWS Lambda ハンドラー
 FastAPI アプリケーションを Lambda 上で実行するためのエントリーポイント
+
+Google API Key は初期化時には取得せず、LLM を最初に使うときに Secrets Manager から取得する
+（services/secrets.py。SECRETS_TTL_SECONDS ごとに再取得するため、ローテーションに再デプロイは不要）。
+
+COLD_START_PROFILE=1 を設定すると、初期化フェーズとモジュールごとの読み込み時間を
+CloudWatch Logs に出力する。
 """
-import os
-import json
-import boto3
-from mangum import Mangum
-from main import app
+from services.profiling import cold_start_profiler
 
-# Secrets Manager から環境変数を取得
-def load_secrets():
-    """AWS Secrets Manager から Google API Key を取得して環境変数に設定"""
-    secret_name = os.environ.get("SECRET_NAME", "giravanz-match/dev/google-api-key")
-    region_name = os.environ.get("AWS_DEFAULT_REGION", "ap-northeast-1")
-    
-    # Lambda 実行時のみ Secrets Manager から取得
-    if "AWS_LAMBDA_FUNCTION_NAME" in os.environ:
-        try:
-            session = boto3.session.Session()
-            client = session.client(
-                service_name='secretsmanager',
-                region_name=region_name
-            )
-            
-            get_secret_value_response = client.get_secret_value(
-                SecretId=secret_name
-            )
-            
-            secret = json.loads(get_secret_value_response['SecretString'])
-            os.environ['GOOGLE_API_KEY'] = secret['GOOGLE_API_KEY']
-            
-        except Exception as e:
-            print(f"Error loading secrets: {e}")
-            raise
+cold_start_profiler.install()
 
-# Secrets をロード
-load_secrets()
+with cold_start_profiler.phase("import mangum"):
+    from mangum import Mangum
+
+with cold_start_profiler.phase("import main"):
+    from main import app
 
 # Mangum ハンドラー（FastAPI を Lambda 用に変換）
-handler = Mangum(app, lifespan="off")
+# lifespan を有効にして、LLM クライアント・チェーンを最初の呼び出しで事前構築する
+handler = Mangum(app, lifespan="auto")
+
+cold_start_profiler.finish()
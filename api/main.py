@@ -1,18 +1,107 @@
 """FastAPI アプリケーション - サッカー診断質問生成API"""
 
-from fastapi import FastAPI, HTTPException
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from services.question_generator import generate_questions
-from services.diagnosis_service import diagnose_personality
-from models.question import QuestionSet
-from models.diagnosis import DiagnosisRequest, DiagnosisResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from services.question_generator import agenerate_questions, astream_questions
+from services.question_pool import PoolConfig, QuestionPool
+from services.llm_registry import llm_registry
+from services.diagnosis_service import adiagnose_personality, astream_diagnosis
+from services.diagnosis_cache import create_diagnosis_cache_from_env, diagnosis_cache_key
+from services.player_matching import MATCH_METRICS, PlayerIndex, load_player_index_from_env, parse_vector
+from services.admission import AdmissionMiddleware, admission_controller
+from services.circuit_breaker import is_circuit_open, llm_circuit_breaker
+from services.compression import CompressionMiddleware
+from services.deadline import DeadlineMiddleware, is_deadline_exceeded
+from services.fallback import fallback_diagnosis, fallback_questions
+from services.question_sets import create_question_set_store_from_env, to_question_answers
+from services.hedging import llm_hedger
+from services.http_cache import etag_matches, make_etag, not_modified, with_cache_headers
+from services.metrics import ServerTimingMiddleware, metrics
+from services.profiling import cold_start_profiler
+from services.retry import llm_retry_policy
+from services.secrets import secret_store
+from services.responses import FastJSONResponse, model_response
+from services.sse import SSE_HEADERS, format_sse
+from services.env import env_bool, env_str
+from models.question import QuestionSet, QuestionSetResponse
+from models.diagnosis import CompactDiagnosisRequest, DiagnosisRequest, DiagnosisResponse, QuestionAnswer
+from models.matching import MatchResponse, PlayersResponse
+
+# 生成済み質問セットのプール（QUESTION_POOL_SIZE が 0 の場合は無効）
+question_pool = QuestionPool(PoolConfig.from_env())
+
+# 同一の回答内容に対する診断結果のキャッシュ（DIAGNOSIS_CACHE_BACKEND で切り替え）
+diagnosis_cache = create_diagnosis_cache_from_env()
+
+# 配信した質問セット（診断時に質問セット ID と回答のインデックスだけで引き当てる）
+question_set_store = create_question_set_store_from_env()
+
+# 診断結果キャッシュの利用状況を示すヘッダー（リクエストで "bypass" を指定すると再計算する）
+DIAGNOSIS_CACHE_HEADER = "X-Diagnosis-Cache"
+
+# Gemini の障害時（サーキットブレーカーが開いている間）に代替の結果を返したことを示すヘッダー
+FALLBACK_HEADER = "X-Fallback"
+
+# キャッシュできるリソースの Cache-Control（質問セットは ID が内容から決まるため変わらない）
+QUESTION_SET_CACHE_CONTROL = env_str("QUESTION_SET_CACHE_CONTROL", "public, max-age=3600, immutable")
+PLAYERS_CACHE_CONTROL = env_str("PLAYERS_CACHE_CONTROL", "public, max-age=300")
+
+# /metrics に出力する各コンポーネントの統計情報
+metrics.register_stats("question_pool", lambda: question_pool.stats())
+metrics.register_stats("diagnosis_cache", lambda: diagnosis_cache.stats())
+metrics.register_stats("question_sets", lambda: question_set_store.stats())
+metrics.register_stats("llm_registry", lambda: llm_registry.stats())
+metrics.register_stats("secrets", lambda: secret_store.stats())
+metrics.register_stats("retry_budget", lambda: llm_retry_policy.budget.stats())
+metrics.register_stats("hedging", lambda: llm_hedger.stats())
+metrics.register_stats("circuit_breaker", lambda: llm_circuit_breaker.stats())
+metrics.register_stats("fallback_questions", lambda: fallback_questions.stats())
+metrics.register_stats("admission", lambda: admission_controller.stats())
+
+# 選手のスコアベクトルのインデックス（起動時に players-diagnosis.json から構築）
+player_index: Optional[PlayerIndex] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    起動時に LLM チェーンと選手インデックスを事前構築してプールの充填を開始し、終了時に補充処理を停止する
+
+    Lambda（Mangum）では lifespan が呼び出しごとに実行されるが、事前構築は2回目以降
+    キャッシュを返すだけなので軽量。補充処理は次の呼び出しで続きを行えるよう停止しない。
+    LLM_WARMUP=false の場合は事前構築せず、LLM を使う最初のリクエストで構築する（Lambda ではデフォルト false。
+    LLM を使わないリクエストがコールドスタートで LangChain の読み込みやシークレットの取得を待たないようにする）。
+    """
+    global player_index
+    warmup_default = "AWS_LAMBDA_FUNCTION_NAME" not in os.environ
+    if env_bool("LLM_WARMUP", warmup_default) and not llm_registry.stats()["chains"]:
+        with cold_start_profiler.phase("llm warmup"):
+            llm_registry.warmup()
+    if player_index is None:
+        with cold_start_profiler.phase("player index"):
+            player_index = load_player_index_from_env()
+    question_pool.start()
+    yield
+    if "AWS_LAMBDA_FUNCTION_NAME" not in os.environ:
+        await question_pool.stop()
+
 
 app = FastAPI(
     title="サッカー診断質問生成API",
     description="LangChain + Gemini を使用してサッカー診断用の質問を生成します",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
+# LLM を使うエンドポイントの受け付けを全体・IP アドレスごとのレートと待ち行列で制限し、超えた場合は 429 を返す
+# （CORS ヘッダーを付けて Retry-After を読めるよう、CORS より内側・期限を参照できるよう DeadlineMiddleware より内側に置く）
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
 # CORS設定（フロントエンドからアクセス可能にする）
 app.add_middleware(
     CORSMiddleware,
@@ -20,8 +109,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag", "Retry-After", FALLBACK_HEADER, DIAGNOSIS_CACHE_HEADER],
 )
 
+# リクエストごとの期限を設定し、LLM 呼び出しのタイムアウト・リトライの判断に使う
+app.add_middleware(DeadlineMiddleware)
+
+# 処理段階ごとの所要時間を Server-Timing ヘッダーで返し、/metrics 用に集計する
+app.add_middleware(ServerTimingMiddleware)
+
+# 一定サイズ以上の JSON・テキストのレスポンスを brotli / gzip で圧縮する（Server-Sent Events は除く）
+app.add_middleware(CompressionMiddleware)
+
 
 @app.get("/")
 async def root():
@@ -29,50 +128,352 @@ async def root():
     return {"message": "サッカー診断質問生成API is running"}
 
 
-@app.get("/api/questions/generate", response_model=QuestionSet)
-async def generate_questions_endpoint():
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """処理段階ごとの所要時間（p50 / p95 / p99）と各コンポーネントの統計情報を Prometheus 形式で返す"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def _with_set_id(question_set: QuestionSet) -> QuestionSetResponse:
+    """質問セットを保存し、質問セット ID を付けたレスポンスにする"""
+    return QuestionSetResponse(questions=question_set.questions, set_id=question_set_store.save(question_set))
+
+
+@app.get("/api/questions/generate", response_model=QuestionSetResponse)
+async def generate_questions_endpoint(response: Response):
     """
     サッカー診断用の質問セット（10個の質問、各4択）を生成する
+
+    レスポンスの `set_id` を使うと、診断時に質問を送り返さずに `/api/diagnosis/compact` で
+    回答のインデックスだけを送れる。
+
+    Gemini の障害でサーキットブレーカーが開いている間は、直近に生成した質問セット
+    （なければ同梱の質問セット）を `X-Fallback: circuit-open` ヘッダー付きで返す。
     
     Returns:
-        QuestionSet: 10個の質問を含む質問セット
+        QuestionSetResponse: 10個の質問を含む質問セットと質問セット ID
         
     Raises:
-        HTTPException: API キーが未設定、または生成に失敗した場合
+        HTTPException: API キーが未設定、または生成に失敗した場合（リクエストの期限切れの場合は 504）
+    """
+    try:
+        if question_pool.config.enabled:
+            # プールから取り出す（空の場合のみ LLM を直接呼び出す）
+            question_set = await question_pool.get()
+        else:
+            question_set = await agenerate_questions()
+        return model_response(_with_set_id(question_set), response)
+    except ValueError as e:
+        # 環境変数未設定などの設定エラー
+        raise HTTPException(status_code=500, detail=f"設定エラー: {str(e)}")
+    except Exception as e:
+        if is_circuit_open(e):
+            response.headers[FALLBACK_HEADER] = "circuit-open"
+            return model_response(_with_set_id(fallback_questions.get()), response)
+        # その他のエラー
+        status_code = 504 if is_deadline_exceeded(e) else 500
+        raise HTTPException(status_code=status_code, detail=f"質問生成に失敗しました: {str(e)}")
+
+
+@app.get("/api/questions/stream")
+async def stream_questions_endpoint():
+    """
+    質問を生成しながら Server-Sent Events で1問ずつ配信する
+
+    イベント:
+        question: 確定した質問 `{"index": 0, "question": {...}}`（先頭から順に）
+        complete: 10個の質問を含む完全な質問セットと質問セット ID（QuestionSetResponse）
+        error: 生成に失敗した場合 `{"detail": "..."}`（以降のイベントは送信されない）
+
+    サーキットブレーカーが開いている場合は、代替の質問セットを同じ形式のイベントで返す。
+    """
+
+    async def event_stream():
+        index = 0
+        try:
+            async for item in astream_questions():
+                if isinstance(item, QuestionSet):
+                    yield format_sse("complete", _with_set_id(item).model_dump())
+                else:
+                    yield format_sse("question", {"index": index, "question": item.model_dump()})
+                    index += 1
+        except ValueError as e:
+            # 環境変数未設定などの設定エラー
+            yield format_sse("error", {"detail": f"設定エラー: {str(e)}"})
+        except Exception as e:
+            if is_circuit_open(e) and index == 0:
+                question_set = fallback_questions.get()
+                for i, question in enumerate(question_set.questions):
+                    yield format_sse("question", {"index": i, "question": question.model_dump()})
+                yield format_sse("complete", _with_set_id(question_set).model_dump())
+                return
+            # その他のエラー
+            yield format_sse("error", {"detail": f"質問生成に失敗しました: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.get("/api/questions/pool/stats")
+async def question_pool_stats():
+    """質問セットプールの統計情報（ヒット数・ミス数・補充レイテンシなど）を返す"""
+    return question_pool.stats()
+
+
+@app.get("/api/questions/{set_id}", response_model=QuestionSetResponse)
+async def get_question_set_endpoint(set_id: str, if_none_match: Optional[str] = Header(default=None)):
+    """
+    生成済みの質問セットを質問セット ID で取得する
+
+    質問セット ID は内容から決まるため、強い ETag と長い Cache-Control を付けて返す。
+    `If-None-Match` が一致する場合は質問セットを参照せずに 304 を返す。
+
+    Raises:
+        HTTPException: 質問セットが見つからない（期限切れ・別インスタンスで生成された）場合は 404
     """
+    etag = make_etag("question_set", set_id)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, QUESTION_SET_CACHE_CONTROL)
+    question_set = question_set_store.get(set_id)
+    if question_set is None:
+        raise HTTPException(status_code=404, detail="質問セットが見つかりません（期限切れの可能性があります）")
+    response = model_response(QuestionSetResponse(questions=question_set.questions, set_id=set_id))
+    return with_cache_headers(response, etag, QUESTION_SET_CACHE_CONTROL)
+
+
+async def _diagnose(
+    question_answers: List[QuestionAnswer],
+    response: Response,
+    x_diagnosis_cache: Optional[str],
+) -> DiagnosisResponse:
+    """診断結果キャッシュを使って診断する（/api/diagnosis と /api/diagnosis/compact で共通）"""
+    cache_key = diagnosis_cache_key(question_answers)
+    bypass = (x_diagnosis_cache or "").strip().lower() == "bypass"
+    if bypass:
+        diagnosis_cache.record_bypass()
+    else:
+        cached = diagnosis_cache.get(cache_key)
+        if cached is not None:
+            response.headers[DIAGNOSIS_CACHE_HEADER] = "hit"
+            return cached
+
     try:
-        question_set = generate_questions()
-        return question_set
+        result = await adiagnose_personality(question_answers)
     except ValueError as e:
         # 環境変数未設定などの設定エラー
         raise HTTPException(status_code=500, detail=f"設定エラー: {str(e)}")
     except Exception as e:
+        if is_circuit_open(e):
+            fallback = fallback_diagnosis(question_answers)
+            if fallback is None:
+                raise HTTPException(status_code=503, detail=f"診断に失敗しました: {str(e)}")
+            response.headers[FALLBACK_HEADER] = "circuit-open"
+            return fallback
         # その他のエラー
-        raise HTTPException(status_code=500, detail=f"質問生成に失敗しました: {str(e)}")
+        status_code = 504 if is_deadline_exceeded(e) else 500
+        raise HTTPException(status_code=status_code, detail=f"診断に失敗しました: {str(e)}")
+
+    diagnosis_cache.set(cache_key, result)
+    response.headers[DIAGNOSIS_CACHE_HEADER] = "bypass" if bypass else "miss"
+    return result
 
 
 @app.post("/api/diagnosis", response_model=DiagnosisResponse)
-async def diagnose_endpoint(request: DiagnosisRequest):
+async def diagnose_endpoint(
+    request: DiagnosisRequest,
+    response: Response,
+    x_diagnosis_cache: Optional[str] = Header(default=None),
+):
     """
     ユーザーの回答を分析して念能力の6系統を診断する
+
+    同じ質問・選択肢・回答の組み合わせは診断結果キャッシュから返す。
+    `X-Diagnosis-Cache: bypass` ヘッダーを付けるとキャッシュを使わずに再計算する。
+    Gemini の障害でサーキットブレーカーが開いている間は、ローカル採点と定型コメントの結果を
+    `X-Fallback: circuit-open` ヘッダー付きで返す（キャッシュしない）。
     
     Args:
         request: 質問、選択肢、ユーザーの回答を含むリクエスト
+        x_diagnosis_cache: "bypass" の場合はキャッシュを使わない
     
     Returns:
         DiagnosisResponse: 6系統のスコアと診断コメント
         
     Raises:
-        HTTPException: API キーが未設定、または診断に失敗した場合
+        HTTPException: API キーが未設定、または診断に失敗した場合（リクエストの期限切れの場合は 504、
+            サーキットブレーカーが開いていてローカル採点もできない場合は 503）
     """
+    return model_response(await _diagnose(request.question_answers, response, x_diagnosis_cache), response)
+
+
+@app.post("/api/diagnosis/compact", response_model=DiagnosisResponse)
+async def diagnose_compact_endpoint(
+    request: CompactDiagnosisRequest,
+    response: Response,
+    x_diagnosis_cache: Optional[str] = Header(default=None),
+):
+    """
+    質問セット ID と選択した選択肢のインデックスだけで診断する
+
+    質問はサーバーで保持している質問セットから引き当てるため、質問を送り返す必要がなく、
+    改ざんされた質問で診断されることもない。キャッシュ・障害時の動作は /api/diagnosis と同じ。
+
+    Args:
+        request: 質問生成レスポンスの質問セット ID と、質問の順に選択した選択肢のインデックス
+        x_diagnosis_cache: "bypass" の場合はキャッシュを使わない
+
+    Returns:
+        DiagnosisResponse: 6系統のスコアと診断コメント
+
+    Raises:
+        HTTPException: 質問セットが見つからない（期限切れ・別インスタンスで生成された）場合は 404
+            （クライアントは /api/diagnosis で質問ごと送り直す）。その他は /api/diagnosis と同じ
+    """
+    question_set = question_set_store.get(request.set_id)
+    if question_set is None:
+        raise HTTPException(status_code=404, detail="質問セットが見つかりません（期限切れの可能性があります）")
     try:
-        result = diagnose_personality(request.question_answers)
-        return result
+        question_answers = to_question_answers(question_set, request.answers)
     except ValueError as e:
-        # 環境変数未設定などの設定エラー
-        raise HTTPException(status_code=500, detail=f"設定エラー: {str(e)}")
-    except Exception as e:
-        # その他のエラー
-        raise HTTPException(status_code=500, detail=f"診断に失敗しました: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+    return model_response(await _diagnose(question_answers, response, x_diagnosis_cache), response)
+
+
+@app.post("/api/diagnosis/stream")
+async def stream_diagnosis_endpoint(
+    request: DiagnosisRequest,
+    x_diagnosis_cache: Optional[str] = Header(default=None),
+):
+    """
+    ユーザーの回答を診断し、スコアを先に、診断コメントを後から Server-Sent Events で配信する
+
+    診断結果キャッシュにある場合は、キャッシュの内容を同じ形式のイベントで即座に返す。
+
+    イベント:
+        scores: 6系統のスコア `{"scores": [...]}`（primary と特質系スコアが確定した時点で1回）
+        comment: 診断コメントの差分テキスト `{"delta": "..."}`（複数回）
+        complete: 完全な診断結果（DiagnosisResponse）
+        error: 診断に失敗した場合 `{"detail": "..."}`（以降のイベントは送信されない）
+
+    サーキットブレーカーが開いている場合は、ローカル採点と定型コメントの結果を同じ形式のイベントで返す
+    （コメントを送信し始めた後を除く）。
+    """
+
+    cache_key = diagnosis_cache_key(request.question_answers)
+    bypass = (x_diagnosis_cache or "").strip().lower() == "bypass"
+    if bypass:
+        diagnosis_cache.record_bypass()
+    cached = None if bypass else diagnosis_cache.get(cache_key)
+
+    async def event_stream():
+        if cached is not None:
+            yield format_sse("scores", {"scores": cached.scores})
+            yield format_sse("comment", {"delta": cached.comment})
+            yield format_sse("complete", cached.model_dump())
+            return
+
+        scores_sent = comment_sent = False
+        try:
+            async for event, payload in astream_diagnosis(request.question_answers):
+                if event == "scores":
+                    scores_sent = True
+                    yield format_sse("scores", {"scores": payload})
+                elif event == "comment":
+                    comment_sent = True
+                    yield format_sse("comment", {"delta": payload})
+                else:
+                    diagnosis_cache.set(cache_key, payload)
+                    yield format_sse("complete", payload.model_dump())
+        except ValueError as e:
+            # 環境変数未設定などの設定エラー
+            yield format_sse("error", {"detail": f"設定エラー: {str(e)}"})
+        except Exception as e:
+            fallback = None
+            if is_circuit_open(e) and not comment_sent:
+                fallback = fallback_diagnosis(request.question_answers)
+            if fallback is not None:
+                if not scores_sent:
+                    yield format_sse("scores", {"scores": fallback.scores})
+                yield format_sse("comment", {"delta": fallback.comment})
+                yield format_sse("complete", fallback.model_dump())
+                return
+            # その他のエラー
+            yield format_sse("error", {"detail": f"診断に失敗しました: {str(e)}"})
+
+    cache_status = "hit" if cached is not None else ("bypass" if bypass else "miss")
+    headers = {**SSE_HEADERS, DIAGNOSIS_CACHE_HEADER: cache_status}
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
+
+@app.get("/api/diagnosis/cache/stats")
+async def diagnosis_cache_stats():
+    """診断結果キャッシュの統計情報（ヒット数・ミス数・再計算数など）を返す"""
+    return diagnosis_cache.stats()
+
+
+@app.get("/api/players", response_model=PlayersResponse)
+async def players_endpoint(if_none_match: Optional[str] = Header(default=None)):
+    """
+    選手の診断結果の一覧を返す
+
+    選手データの内容から強い ETag を作成し、`If-None-Match` が一致する場合は 304 を返す。
+
+    Raises:
+        HTTPException: 選手データが読み込まれていない場合（503）
+    """
+    if player_index is None or not player_index.loaded:
+        raise HTTPException(status_code=503, detail="選手の診断結果が読み込まれていません")
+    etag = make_etag("players", player_index.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, PLAYERS_CACHE_CONTROL)
+    response = model_response(PlayersResponse(players=player_index.players()))
+    return with_cache_headers(response, etag, PLAYERS_CACHE_CONTROL)
+
+
+@app.get("/api/match", response_model=MatchResponse)
+async def match_endpoint(
+    scores: str = Query(description="診断の6系統スコア（カンマ区切り、強化系・変化系・具現化系・特質系・操作系・放出系の順）"),
+    k: int = Query(default=3, ge=1, le=50, description="返す人数"),
+    metric: str = Query(default="cosine", description="距離の種類（cosine / l1）"),
+    position: Optional[List[str]] = Query(default=None, description="対象とするポジション（複数指定可）"),
+    weights: Optional[str] = Query(default=None, description="l1 の系統ごとの重み（カンマ区切り）"),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """
+    診断スコアに近い選手を距離が近い順に返す
+
+    結果は選手データとパラメータだけで決まるため、それらから強い ETag を作成し、
+    `If-None-Match` が一致する場合は探索せずに 304 を返す。
+
+    Returns:
+        MatchResponse: 距離が近い順の選手リスト（距離が同じ場合は選手IDの昇順）
+
+    Raises:
+        HTTPException: パラメータが不正な場合（400）、選手データが読み込まれていない場合（503）
+    """
+    if player_index is None or not player_index.loaded:
+        raise HTTPException(status_code=503, detail="選手の診断結果が読み込まれていません")
+    if metric not in MATCH_METRICS:
+        raise HTTPException(
+            status_code=400, detail=f"metric は {' / '.join(MATCH_METRICS)} のいずれかを指定してください"
+        )
+    try:
+        query = parse_vector(scores, "scores")
+        weight_vector = parse_vector(weights, "weights") if weights else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    etag = make_etag(
+        "match",
+        player_index.version,
+        metric,
+        k,
+        query,
+        sorted(set(position or [])),
+        weight_vector if metric == "l1" else None,
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, PLAYERS_CACHE_CONTROL)
 
+    matches = player_index.search(query, k=k, metric=metric, positions=position, weights=weight_vector)
+    response = model_response(MatchResponse(metric=metric, matches=matches))
+    return with_cache_headers(response, etag, PLAYERS_CACHE_CONTROL)
@@ -1,9 +1,12 @@
 """診断リクエスト・レスポンスのデータモデル定義"""
 
-from typing import List
+from typing import Annotated, List
 from pydantic import BaseModel, Field
 from models.question import Question
 
+# 念能力の6系統（スコア配列の順序。円環状に隣り合う系統ほど相性が良い）
+NEN_TYPES = ["強化系", "変化系", "具現化系", "特質系", "操作系", "放出系"]
+
 
 class QuestionAnswer(BaseModel):
     """質問と回答のペア"""
@@ -22,6 +25,15 @@ class DiagnosisRequest(BaseModel):
     )
 
 
+class CompactDiagnosisRequest(BaseModel):
+    """診断リクエスト（コンパクト形式） - 質問セット ID と、質問の順に選択した選択肢のインデックス"""
+
+    set_id: str = Field(description="質問生成レスポンスの質問セット ID", min_length=1, max_length=64)
+    answers: List[Annotated[int, Field(ge=0, le=3)]] = Field(
+        description="各質問でユーザーが選択した選択肢のインデックス（0-3、質問の順）", min_length=10, max_length=10
+    )
+
+
 class PrimaryDiagnosisResult(BaseModel):
     """LLMからの診断結果 - 主系統、特質系スコア、理由"""
 
@@ -34,6 +46,12 @@ class PrimaryDiagnosisResult(BaseModel):
     reason: str = Field(description="診断理由と性格分析のコメント")
 
 
+class DiagnosisComment(BaseModel):
+    """LLMからの診断コメント - 系統とスコアを決めた後にコメントだけを生成する場合に使用"""
+
+    reason: str = Field(description="診断理由と性格分析のコメント")
+
+
 class DiagnosisResponse(BaseModel):
     """診断レスポンス - 念能力の6系統スコアと診断コメント"""
 
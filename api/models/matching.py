@@ -0,0 +1,36 @@
+"""選手マッチングのデータモデル定義"""
+
+from typing import List
+from pydantic import BaseModel, Field
+
+
+class Player(BaseModel):
+    """選手の診断結果"""
+
+    id: str = Field(description="選手ID（背番号）")
+    name: str = Field(description="選手名")
+    position: str = Field(description="ポジション（GK、DF、MF、FW、STAFF）")
+    primary: str = Field(description="選手の主系統")
+    scores: List[int] = Field(
+        description="選手の6系統スコア（強化系、変化系、具現化系、特質系、操作系、放出系の順）"
+    )
+    comment: str = Field(description="選手の診断コメント")
+
+
+class PlayersResponse(BaseModel):
+    """選手一覧レスポンス"""
+
+    players: List[Player] = Field(description="選手の診断結果のリスト（players-diagnosis.json の順）")
+
+
+class PlayerMatch(Player):
+    """マッチングした選手"""
+
+    distance: float = Field(description="診断スコアとの距離（小さいほど近い）")
+
+
+class MatchResponse(BaseModel):
+    """マッチングレスポンス - 距離が近い順の選手リスト"""
+
+    metric: str = Field(description="距離の種類（cosine または l1）")
+    matches: List[PlayerMatch] = Field(description="距離が近い順の選手リスト")
@@ -1,6 +1,6 @@
 """質問・選択肢のデータモデル定義"""
 
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -11,6 +11,15 @@ class Question(BaseModel):
     choices: List[str] = Field(
         description="4つの選択肢", min_length=4, max_length=4
     )
+    # 生成時に LLM が付与する各選択肢の念系統タグ（メタ読み防止のためレスポンスには含めない）
+    choice_types: Optional[List[str]] = Field(
+        default=None,
+        exclude=True,
+        description=(
+            "各選択肢が反映している念系統（choices と同じ順序の4要素。"
+            "強化系、変化系、具現化系、特質系、操作系、放出系のいずれか）"
+        ),
+    )
 
 
 class QuestionSet(BaseModel):
@@ -19,3 +28,12 @@ class QuestionSet(BaseModel):
     questions: List[Question] = Field(
         description="10個の質問", min_length=10, max_length=10
     )
+
+
+class QuestionSetResponse(QuestionSet):
+    """質問生成レスポンス - 質問セットと、診断時に回答のインデックスだけを送るための質問セット ID"""
+
+    set_id: Optional[str] = Field(
+        default=None,
+        description="質問セット ID（/api/diagnosis/compact で使用。サーバーで保持していない場合は null）",
+    )
@@ -1,11 +1,17 @@
 """診断用のプロンプトテンプレート"""
 
-from langchain_core.prompts import ChatPromptTemplate
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
+# langchain_core は読み込みに時間がかかるため、プロンプトを最初に作成するときに読み込む
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
 
-def get_diagnosis_prompt() -> ChatPromptTemplate:
+
+@lru_cache(maxsize=None)
+def get_diagnosis_prompt() -> "ChatPromptTemplate":
     """
-    ユーザーの回答から念能力の6系統を診断するプロンプトテンプレートを返す
+    ユーザーの回答から念能力の6系統を診断するプロンプトテンプレートを返す（一度だけ構築して使い回す）
 
     Returns:
         ChatPromptTemplate: 診断用のプロンプト
@@ -141,6 +147,61 @@ LLMは以下の2つを判定してください：
 }}
 """
 
+    from langchain_core.prompts import ChatPromptTemplate
+
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", system_message),
+            ("human", human_message),
+        ]
+    )
+
+
+@lru_cache(maxsize=None)
+def get_diagnosis_comment_prompt() -> "ChatPromptTemplate":
+    """
+    主系統と特質系スコアが決まった後に、診断コメントだけを生成するプロンプトテンプレートを返す
+
+    Returns:
+        ChatPromptTemplate: 診断コメント生成用のプロンプト
+    """
+
+    system_message = """あなたはサッカーと心理学の専門家です。
+
+ユーザーの念能力の系統はすでに判定済みです。判定結果とユーザーの回答をもとに、診断コメントだけを作成してください。
+
+念能力の系統とマッチング対象ポジション:
+- 強化系: GK（ゴールキーパー）
+- 放出系: FW（フォワード）
+- 変化系: MF（攻撃的ミッドフィールダー）
+- 操作系: DF（ディフェンダー）
+- 具現化系: MF（中盤・ゲームメイカー）
+- 特質系: コーチ・スタッフ
+
+## 診断コメントの作成
+- 「あなたは〇〇系だから、△△のポジションの選手とマッチングするぞ！」という形式を含める
+- ユーザーの回答から読み取れた具体的な性格傾向を説明
+- 肯定的かつ具体的なフィードバック
+
+## 出力形式
+
+**reason**: 診断理由を日本語で200文字程度で説明
+- おじいちゃんのような口調で親しみやすく、絵文字を含めて書く
+- 3行程度で書く
+- その人の強みや特徴などを診断し、最後にネテロ会長っぽい名言を言って締めくくる
+"""
+
+    human_message = """判定結果:
+- 主系統: {primary}
+- 特質系スコア: {specialist_score}
+
+ユーザーの回答データ:
+
+{question_answers}
+"""
+
+    from langchain_core.prompts import ChatPromptTemplate
+
     return ChatPromptTemplate.from_messages(
         [
             ("system", system_message),
@@ -149,3 +210,36 @@ LLMは以下の2つを判定してください：
     )
 
 
+# LLM を使わない場合（ローカル採点のみのモード）の系統ごとの定型コメント
+CANNED_COMMENTS = {
+    "強化系": (
+        "ほっほっほ、お主は真っすぐで努力を惜しまぬ強化系じゃな💪 "
+        "あなたは強化系だから、GKの選手とマッチングするぞ！🧤 "
+        "基礎を積み重ねる者こそ最後にゴールを守り抜くのじゃ。「心を込めた一本の正拳突きに勝るものなし」じゃよ🙏"
+    ),
+    "変化系": (
+        "ふぉっふぉっ、お主は気まぐれで読めぬ変化系じゃのう🌀 "
+        "あなたは変化系だから、攻撃的MFの選手とマッチングするぞ！⚽ "
+        "相手の予想を裏切る遊び心こそ最大の武器じゃ。「型にはまらぬ者が、新しい型をつくる」のじゃよ✨"
+    ),
+    "具現化系": (
+        "ほう、お主は頭の中のイメージを形にする具現化系じゃな🎨 "
+        "あなたは具現化系だから、ゲームメイカーのMFの選手とマッチングするぞ！🧠 "
+        "思い描いた一本のパスが試合を変えるのじゃ。「想像できぬものは、創造もできぬ」じゃよ🌟"
+    ),
+    "特質系": (
+        "なんと、お主は誰にも真似できぬ特質系じゃ！🌈 "
+        "あなたは特質系だから、コーチ・スタッフとマッチングするぞ！📋 "
+        "常識の外側にこそ、お主だけの答えがあるのじゃ。「己の道を信じる者に、道は開ける」じゃよ🔥"
+    ),
+    "操作系": (
+        "ふむ、お主は冷静に全体を見渡す操作系じゃな🧩 "
+        "あなたは操作系だから、DFの選手とマッチングするぞ！🛡️ "
+        "仲間を動かし守りを組み立てる力は本物じゃ。「勝負は始まる前に決まっておる」のじゃよ♟️"
+    ),
+    "放出系": (
+        "ほっほっ、お主は思いを真っすぐ外へ放つ放出系じゃな🚀 "
+        "あなたは放出系だから、FWの選手とマッチングするぞ！⚽ "
+        "迷わず打ち抜く一撃がチームを救うのじゃ。「感謝の一撃、ゴールへ届け」じゃよ🙏"
+    ),
+}
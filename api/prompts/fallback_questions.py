@@ -0,0 +1,110 @@
+"""Gemini の障害時（サーキットブレーカーが開いている間）に返す同梱の質問セット
+
+LLM が生成する質問と同じく、各選択肢に念系統のタグ（choice_types）を付けておき、
+診断時にローカル採点できるようにする。
+"""
+
+FALLBACK_QUESTION_SET = {
+    "questions": [
+        {
+            "question_text": "試合終了間際、応援しているチームが1点差で負けています。あなたはスタンドで何をしますか？",
+            "choices": [
+                "最後の1秒まで声を枯らして応援し続ける",
+                "周りの観客にも声をかけて、スタジアム全体の応援をまとめる",
+                "なぜか急に落ち着いて、帰りの電車の時間を調べ始める",
+                "相手の守備の穴を見つけて、どこを攻めれば点が入るか分析する",
+            ],
+            "choice_types": ["強化系", "放出系", "特質系", "操作系"],
+        },
+        {
+            "question_text": "好きな選手のプレーで、一番心を動かされるのはどんな場面ですか？",
+            "choices": [
+                "相手の意表を突くヒールパスやフェイント",
+                "ボールを持っていないときの、試合を読み切ったポジショニング",
+                "ゴール後のパフォーマンスが毎回斜め上の方向にスベっているところ",
+                "泥だらけになっても体を張り続けるスライディング",
+            ],
+            "choice_types": ["変化系", "操作系", "特質系", "強化系"],
+        },
+        {
+            "question_text": "友達を初めてスタジアム観戦に誘うことになりました。どう準備しますか？",
+            "choices": [
+                "当日の集合時間から座席、帰りのルートまで完璧な計画を立てる",
+                "チームの魅力が伝わる手作りの観戦ガイドを作る",
+                "とにかく熱量で押し切って「行けば分かる！」と連れて行く",
+                "マスコットの着ぐるみの中の人の苦労について熱く語っておく",
+            ],
+            "choice_types": ["操作系", "具現化系", "放出系", "特質系"],
+        },
+        {
+            "question_text": "自分がチームの監督になったら、どんなサッカーを目指しますか？",
+            "choices": [
+                "誰よりも走り、最後まで諦めない泥臭いサッカー",
+                "試合ごとに戦い方を変えて、相手に的を絞らせないサッカー",
+                "ハーフタイムに選手全員で円陣を組んで俳句を詠むサッカー",
+                "データに基づいて全員の動きを緻密に設計したサッカー",
+            ],
+            "choice_types": ["強化系", "変化系", "特質系", "操作系"],
+        },
+        {
+            "question_text": "応援グッズを1つだけ持っていくとしたら、どれを選びますか？",
+            "choices": [
+                "自分でデザインした世界に1つだけのゲーフラ",
+                "遠くまで声を届けるためのメガホン",
+                "なぜか毎回勝つ気がする、謎の木彫りの置物",
+                "長年使い込んだ、色あせたタオルマフラー",
+            ],
+            "choice_types": ["具現化系", "放出系", "特質系", "強化系"],
+        },
+        {
+            "question_text": "試合の前日の夜、あなたはどう過ごしますか？",
+            "choices": [
+                "対戦相手の直近5試合を見返して、予想スタメンを組む",
+                "気分次第で、過去の名勝負を見たりまったく別のことをしたりする",
+                "いつもと同じ時間に寝て、いつもと同じ朝ごはんを食べる",
+                "夢の中で自分が決勝ゴールを決める予行演習をする",
+            ],
+            "choice_types": ["操作系", "変化系", "強化系", "特質系"],
+        },
+        {
+            "question_text": "チームが大敗した次の日、あなたはどうしますか？",
+            "choices": [
+                "SNS で仲間に「次こそ勝とう！」と呼びかける",
+                "敗因をノートにまとめて、次の試合の見どころを整理する",
+                "負けた試合のユニフォームを洗わずに封印し、験担ぎの儀式を始める",
+                "悔しさを忘れないよう、いつもより長く走り込む",
+            ],
+            "choice_types": ["放出系", "操作系", "特質系", "強化系"],
+        },
+        {
+            "question_text": "サッカーの魅力を一言で表すとしたら？",
+            "choices": [
+                "何が起こるか分からない予測不能なところ",
+                "90分間に全力を注ぎ込むひたむきさ",
+                "芝生の緑とユニフォームの色が作る美しい景色",
+                "ボールが丸いこと。それに尽きる",
+            ],
+            "choice_types": ["変化系", "強化系", "具現化系", "特質系"],
+        },
+        {
+            "question_text": "スタジアムグルメを選ぶとき、あなたのこだわりは？",
+            "choices": [
+                "混雑する時間を避けて、キックオフまでの動線を計算して買う",
+                "その日の気分と行列の長さを見て、その場で決める",
+                "毎回同じ店の同じメニューを食べ続けている",
+                "ハーフタイムに一番長い行列に並ぶこと自体を楽しんでいる",
+            ],
+            "choice_types": ["操作系", "変化系", "強化系", "特質系"],
+        },
+        {
+            "question_text": "あなたがチームのために新しいチャントを作ることになりました。どんな曲にしますか？",
+            "choices": [
+                "スタジアム中に響き渡る、誰でもすぐに歌える力強い曲",
+                "メロディも歌詞も細部までこだわり抜いた、完成度の高い曲",
+                "相手サポーターもつい口ずさんでしまう、不思議な中毒性のある曲",
+                "試合展開に合わせて歌詞を差し替えられる、アレンジ自在な曲",
+            ],
+            "choice_types": ["放出系", "具現化系", "特質系", "変化系"],
+        },
+    ]
+}
@@ -1,45 +1,62 @@
 """質問生成用のプロンプトテンプレート"""
 
 import random
-from langchain_core.prompts import ChatPromptTemplate
-
-
-def get_question_generation_prompt(seed: int = None) -> ChatPromptTemplate:
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+# langchain_core は読み込みに時間がかかるため、プロンプトを最初に作成するときに読み込む
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+# 多様性を持たせるためのテーマ候補（観戦者・ファン視点）
+THEMES = [
+    "試合観戦の楽しみ方",
+    "好きな選手のタイプ",
+    "応援スタイル",
+    "試合の見どころ",
+    "サッカーの魅力",
+    "チーム選びの基準",
+    "観戦時の感情",
+    "サッカー文化への関わり方",
+    "理想のプレースタイル",
+    "サッカーから学ぶこと",
+    "日常生活での価値観",
+    "人間関係の築き方",
+]
+
+
+def get_question_generation_variables(seed: int = None) -> dict:
     """
-    サッカー診断用の質問を生成するためのプロンプトテンプレートを返す
+    質問生成プロンプトに渡す変数（テーマのヒントとシード）を返す
 
     Args:
         seed: ランダムシード（指定すると毎回異なる質問の視点を促す）
 
     Returns:
-        ChatPromptTemplate: 質問生成用のプロンプト
+        dict: プロンプト変数（themes_hint, seed）
     """
     # シードが指定されていない場合はランダムに生成
     if seed is None:
         seed = random.randint(1, 1000000)
 
-    # 多様性を持たせるためのテーマ候補（観戦者・ファン視点）
-    themes = [
-        "試合観戦の楽しみ方",
-        "好きな選手のタイプ",
-        "応援スタイル",
-        "試合の見どころ",
-        "サッカーの魅力",
-        "チーム選びの基準",
-        "観戦時の感情",
-        "サッカー文化への関わり方",
-        "理想のプレースタイル",
-        "サッカーから学ぶこと",
-        "日常生活での価値観",
-        "人間関係の築き方",
-    ]
-
     # シードを使って毎回異なるテーマの組み合わせを選択
     random.seed(seed)
-    selected_themes = random.sample(themes, min(6, len(themes)))
-    themes_hint = "、".join(selected_themes)
+    selected_themes = random.sample(THEMES, min(6, len(THEMES)))
+    return {"themes_hint": "、".join(selected_themes), "seed": seed}
+
+
+@lru_cache(maxsize=None)
+def get_question_generation_prompt() -> "ChatPromptTemplate":
+    """
+    サッカー診断用の質問を生成するためのプロンプトテンプレートを返す
 
-    system_message = f"""あなたはサッカーと心理学の専門家です。
+    テーマのヒントとシードはテンプレート変数として受け取るため、テンプレート自体は
+    プロセス内で一度だけ構築して使い回す（変数は get_question_generation_variables で作成）。
+
+    Returns:
+        ChatPromptTemplate: 質問生成用のプロンプト
+    """
+    system_message = """あなたはサッカーと心理学の専門家です。
 サッカーにちなんだ質問を10個作成し、各質問に**必ず4つの選択肢**を用意してください。
 
 
@@ -86,6 +103,9 @@ def get_question_generation_prompt(seed: int = None) -> ChatPromptTemplate:
   - 特質系の選択肢も毎回異なる位置に配置すること
   - 例: 強化系の特性を持つ選択肢が、常に1番目に来ないようにする
 - 質問は多様性を持たせること（プレースタイル、練習方法、メンタル、チームでの役割など）
+- **各質問の choice_types には、choices と同じ順序で各選択肢が反映している念系統名を入れること**
+  - 値は「強化系」「変化系」「具現化系」「特質系」「操作系」「放出系」のいずれか
+  - choice_types は採点にのみ使用され、回答者には表示されない
 
 ## 創造性のためのヒント（毎回異なる視点で質問を作成すること）
 
@@ -101,6 +121,8 @@ def get_question_generation_prompt(seed: int = None) -> ChatPromptTemplate:
 
 必ず前回とは異なる、新鮮でユニークな質問を作成してください。4つの選択肢のうち1つは、ユーモアとセンスのある特質系を測定する内容にしてください。"""
 
+    from langchain_core.prompts import ChatPromptTemplate
+
     return ChatPromptTemplate.from_messages(
         [
             ("system", system_message),
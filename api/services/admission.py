@@ -0,0 +1,317 @@
+"""LLM を使うエンドポイントのアドミッション制御 - 全体・クライアントごとのトークンバケットと上限付きの待ち行列"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+from services.deadline import remaining
+from services.env import env_bool, env_float, env_int
+from services.metrics import metrics
+
+# アドミッション制御の対象とするパス（LLM を呼び出す可能性があるエンドポイント）
+ADMISSION_PATHS = (
+    "/api/questions/generate",
+    "/api/questions/stream",
+    "/api/diagnosis",
+    "/api/diagnosis/stream",
+    "/api/diagnosis/compact",
+)
+
+# 拒否の理由（メトリクスのラベル）
+CLIENT_RATE = "client_rate"
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class AdmissionRejected(Exception):
+    """アドミッション制御でリクエストを拒否した（429 で返す）"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"リクエストが多すぎます（{reason}）")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    トークンバケット（rate が 0 以下の場合は無制限）
+
+    rate（1秒あたりのトークン数）で補充され、最大 burst までバーストを許容する。
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """トークンが1つ貯まるまでの時間（秒、すでにあれば 0）"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def try_take(self) -> bool:
+        """トークンがあれば1つ消費して True を返す"""
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+@dataclass
+class AdmissionConfig:
+    """アドミッション制御の設定"""
+
+    enabled: bool = True
+    rate: float = 20.0  # 全体の受け付けレート（リクエスト/秒、0 で無制限）
+    burst: float = 40.0
+    max_concurrent: int = 64  # 同時に処理するリクエスト数の上限（0 で無制限）
+    client_rate: float = 1.0  # クライアント（IP アドレス）ごとの受け付けレート（0 で無制限）
+    client_burst: float = 20.0
+    max_queue: int = 64  # 待ち行列の長さの上限
+    max_wait_seconds: float = 5.0  # 待ち行列で待つ時間の上限
+    max_clients: int = 10000  # トークンバケットを保持するクライアント数の上限（古いものから削除）
+    trust_forwarded_for: bool = False  # X-Forwarded-For の先頭をクライアントの IP アドレスとして使う
+
+    @classmethod
+    def from_env(cls) -> "AdmissionConfig":
+        """
+        環境変数から設定を読み込む
+
+        - ADMISSION_CONTROL: アドミッション制御を有効にする（デフォルト true）
+        - ADMISSION_RATE / ADMISSION_BURST: 全体の受け付けレート（リクエスト/秒）とバースト（デフォルト 20 / 40）
+        - ADMISSION_MAX_CONCURRENT: 同時に処理するリクエスト数の上限（デフォルト 64）
+        - ADMISSION_CLIENT_RATE / ADMISSION_CLIENT_BURST: IP アドレスごとのレートとバースト（デフォルト 1 / 20）
+        - ADMISSION_MAX_QUEUE: 待ち行列の長さの上限（デフォルト 64）
+        - ADMISSION_MAX_WAIT_SECONDS: 待ち行列で待つ時間の上限（デフォルト 5 秒）
+        - ADMISSION_MAX_CLIENTS: 保持するクライアント数の上限（デフォルト 10000）
+        - ADMISSION_TRUST_FORWARDED_FOR: X-Forwarded-For を信頼する（CloudFront などの背後の場合。デフォルト false）
+        """
+        return cls(
+            enabled=env_bool("ADMISSION_CONTROL", True),
+            rate=max(0.0, env_float("ADMISSION_RATE", 20.0)),
+            burst=max(1.0, env_float("ADMISSION_BURST", 40.0)),
+            max_concurrent=max(0, env_int("ADMISSION_MAX_CONCURRENT", 64)),
+            client_rate=max(0.0, env_float("ADMISSION_CLIENT_RATE", 1.0)),
+            client_burst=max(1.0, env_float("ADMISSION_CLIENT_BURST", 20.0)),
+            max_queue=max(0, env_int("ADMISSION_MAX_QUEUE", 64)),
+            max_wait_seconds=max(0.0, env_float("ADMISSION_MAX_WAIT_SECONDS", 5.0)),
+            max_clients=max(1, env_int("ADMISSION_MAX_CLIENTS", 10000)),
+            trust_forwarded_for=env_bool("ADMISSION_TRUST_FORWARDED_FOR", False),
+        )
+
+
+class AdmissionController:
+    """
+    LLM を使うリクエストの受け付けを制御する
+
+    1. クライアントごとのトークンバケットが空なら、待たせずに拒否する（1つのクライアントの再試行の嵐を止める）
+    2. 全体のトークンバケットと同時処理数に空きがあれば受け付ける
+    3. 空きがなければ上限付きの待ち行列（FIFO）で待つ。待ち行列が満杯、または max_wait_seconds
+       （リクエストの期限の方が短ければそちら）を過ぎた場合は拒否する
+
+    拒否したリクエストは LLM を呼び出さない（リトライのループも始めない）。
+    待ち行列は同じイベントループ上のリクエストの間でのみ共有する。
+    """
+
+    def __init__(self, config: AdmissionConfig):
+        self.config = config
+        self._global = TokenBucket(config.rate, config.burst)
+        self._clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {CLIENT_RATE: 0, QUEUE_FULL: 0, QUEUE_TIMEOUT: 0}
+
+    def _client_bucket(self, client: str) -> TokenBucket:
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.config.client_rate, self.config.client_burst)
+            self._clients[client] = bucket
+            while len(self._clients) > self.config.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return bucket
+
+    def _has_slot(self) -> bool:
+        return self.config.max_concurrent <= 0 or self._in_flight < self.config.max_concurrent
+
+    def _try_admit(self) -> bool:
+        """同時処理数と全体のトークンに空きがあれば受け付ける"""
+        if not self._has_slot() or not self._global.try_take():
+            return False
+        self._in_flight += 1
+        self.admitted += 1
+        return True
+
+    def _dispatch(self) -> None:
+        """待ち行列の先頭から、空きがある限り受け付ける"""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if not self._try_admit():
+                break
+            self._waiters.popleft()
+            waiter.set_result(None)
+
+        # トークン不足で待っている場合は、トークンが貯まる時刻に再度受け付ける
+        if self._waiters and self._has_slot():
+            delay = self._global.wait_time()
+            loop = asyncio.get_running_loop()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = loop.call_later(max(delay, 0.001), self._dispatch)
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        metrics.inc("admission_rejected_total", help="アドミッション制御で拒否したリクエスト数", reason=reason)
+        return AdmissionRejected(reason, retry_after)
+
+    def _queue_retry_after(self) -> float:
+        """待ち行列が空くまでの目安（秒）"""
+        if self.config.rate > 0:
+            return (len(self._waiters) + 1) / self.config.rate
+        return self.config.max_wait_seconds or 1.0
+
+    async def acquire(self, client: str) -> None:
+        """
+        リクエストを受け付ける（必要なら待ち行列で待つ）。処理が終わったら release() を呼ぶ
+
+        Args:
+            client: クライアントの識別子（IP アドレス）
+
+        Raises:
+            AdmissionRejected: クライアントのレート超過、待ち行列が満杯、または待ち時間の上限を超えた場合
+        """
+        bucket = self._client_bucket(client)
+        if not bucket.try_take():
+            raise self._reject(CLIENT_RATE, bucket.wait_time())
+
+        if not self._waiters and self._try_admit():
+            return
+        if len(self._waiters) >= self.config.max_queue:
+            raise self._reject(QUEUE_FULL, self._queue_retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        self._dispatch()
+        timeout = self.config.max_wait_seconds
+        left = remaining()
+        if left is not None:
+            timeout = min(timeout, max(0.0, left))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                raise self._reject(QUEUE_TIMEOUT, self._queue_retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 受け付けた直後にキャンセルされた場合は枠を返す
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            metrics.observe(
+                "admission_queue_wait_seconds",
+                time.perf_counter() - started,
+                help="アドミッション制御の待ち行列で待った時間（秒）",
+            )
+
+    def release(self) -> None:
+        """受け付けたリクエストの処理が終わったことを記録し、待ち行列の次のリクエストを受け付ける"""
+        self._in_flight = max(0, self._in_flight - 1)
+        if self._waiters:
+            self._dispatch()
+
+    def stats(self) -> dict:
+        """待ち行列の長さ・処理中の数・拒否数などを返す"""
+        return {
+            "enabled": self.config.enabled,
+            "queue_depth": sum(1 for waiter in self._waiters if not waiter.done()),
+            "in_flight": self._in_flight,
+            "clients": len(self._clients),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+def client_address(scope, trust_forwarded_for: bool) -> str:
+    """リクエストのクライアントの IP アドレス"""
+    if trust_forwarded_for:
+        for key, value in scope.get("headers", []):
+            if key.lower() == b"x-forwarded-for":
+                first = value.decode("latin-1").split(",")[0].strip()
+                if first:
+                    return first
+    client: Optional[Tuple[str, int]] = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionMiddleware:
+    """
+    LLM を使うエンドポイント（ADMISSION_PATHS）の前段でアドミッション制御を行う ASGI ミドルウェア
+
+    拒否した場合は `Retry-After` ヘッダー付きの 429 を返す。受け付けた枠はレスポンスを送り終える
+    （Server-Sent Events ではストリームが終わる）まで保持する。
+    """
+
+    def __init__(self, app, controller: "AdmissionController"):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self.controller.config.enabled
+            or scope.get("path") not in ADMISSION_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client = client_address(scope, self.controller.config.trust_forwarded_for)
+        try:
+            await self.controller.acquire(client)
+        except AdmissionRejected as e:
+            from services.responses import FastJSONResponse
+
+            response = FastJSONResponse(
+                {"detail": f"リクエストが多すぎます。しばらくしてから再度お試しください（{e.reason}）"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+
+def create_admission_controller_from_env() -> AdmissionController:
+    """環境変数からアドミッション制御を作成する"""
+    return AdmissionController(AdmissionConfig.from_env())
+
+
+# プロセス全体で共有するアドミッション制御
+admission_controller = create_admission_controller_from_env()
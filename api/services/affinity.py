@@ -0,0 +1,97 @@
+"""親和性スコアの計算 - 主系統と特質系スコアから6系統のスコアを求める（API・スクリプト共通）"""
+
+from typing import TYPE_CHECKING, List, Sequence, Tuple, Union
+
+from models.diagnosis import NEN_TYPES
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# 特質系のスコアは主系統からの距離ではなく、LLM（またはローカル採点）の値をそのまま使う
+SPECIALIST_INDEX = NEN_TYPES.index("特質系")
+
+# 円環上の距離（0〜3）ごとのスコア
+DISTANCE_SCORES = (100, 80, 60, 40)
+
+NEN_TYPE_INDEX = {nen_type: i for i, nen_type in enumerate(NEN_TYPES)}
+
+# 系統間の円環上の最短距離（6×6）
+RING_DISTANCE: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(min(abs(i - j), len(NEN_TYPES) - abs(i - j)) for j in range(len(NEN_TYPES)))
+    for i in range(len(NEN_TYPES))
+)
+
+# 主系統ごとのスコア（6×6、特質系の列は calculate_affinities で置き換える）
+AFFINITY_TABLE: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(DISTANCE_SCORES[d] for d in row) for row in RING_DISTANCE
+)
+
+
+def calculate_affinities(primary: str, specialist_score: int) -> List[int]:
+    """
+    primaryを基準に親和性スコアを計算
+
+    Args:
+        primary: 主系統の名前
+        specialist_score: 特質系のスコア（0-100）
+
+    Returns:
+        List[int]: 6つの系統のスコア配列
+
+    Raises:
+        ValueError: primaryが無効な系統名の場合
+    """
+    index = NEN_TYPE_INDEX.get(primary)
+    if index is None:
+        raise ValueError(f"Invalid primary type: {primary}")
+
+    scores = list(AFFINITY_TABLE[index])
+    scores[SPECIALIST_INDEX] = specialist_score
+    return scores
+
+
+def calculate_affinities_batch(
+    primaries: Union[Sequence[str], Sequence[int], "np.ndarray"],
+    specialist_scores: Union[Sequence[int], "np.ndarray"],
+) -> "np.ndarray":
+    """
+    複数の診断の親和性スコアを一括で計算する（NumPy が必要）
+
+    再採点・集計ジョブ向け。結果は各行について calculate_affinities と同じになる。
+
+    Args:
+        primaries: 主系統の名前、または NEN_TYPES のインデックスの配列（長さ N）
+        specialist_scores: 特質系のスコアの配列（長さ N）
+
+    Returns:
+        np.ndarray: N×6 のスコア行列（int64）
+
+    Raises:
+        ImportError: NumPy がインストールされていない場合
+        ValueError: 無効な系統名・インデックスが含まれる場合、または配列の長さが異なる場合
+    """
+    import numpy as np
+
+    primaries = np.asarray(primaries)
+    specialist_scores = np.asarray(specialist_scores, dtype=np.int64)
+    if primaries.ndim != 1 or primaries.shape != specialist_scores.shape:
+        raise ValueError(
+            f"primaries と specialist_scores は同じ長さの1次元配列にしてください: "
+            f"{primaries.shape} / {specialist_scores.shape}"
+        )
+
+    if primaries.dtype.kind in "iu":
+        indices = primaries.astype(np.int64)
+        invalid = (indices < 0) | (indices >= len(NEN_TYPES))
+    else:
+        # 系統名は重複が多いので、ユニークな値だけを辞書で引いてから展開する
+        names, inverse = np.unique(primaries.astype(str), return_inverse=True)
+        lookup = np.array([NEN_TYPE_INDEX.get(name, -1) for name in names], dtype=np.int64)
+        indices = lookup[inverse]
+        invalid = indices < 0
+    if invalid.any():
+        raise ValueError(f"Invalid primary type: {primaries[invalid][0]}")
+
+    scores = np.asarray(AFFINITY_TABLE, dtype=np.int64)[indices]
+    scores[:, SPECIALIST_INDEX] = specialist_scores
+    return scores
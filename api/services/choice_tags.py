@@ -0,0 +1,75 @@
+"""選択肢の念系統タグのインデックス - 生成した質問のタグをサーバー側で保持する"""
+
+import hashlib
+import json
+from typing import List, Optional
+
+from models.diagnosis import NEN_TYPES
+from models.question import Question, QuestionSet
+from services.env import env_float, env_int
+from services.ttl_store import MemoryTTLStore
+
+
+def question_key(question: Question) -> str:
+    """質問文と選択肢から質問を識別するキーを作成する"""
+    payload = json.dumps(
+        [question.question_text, list(question.choices)],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def valid_choice_types(question: Question) -> Optional[List[str]]:
+    """質問のタグが選択肢と同数で、すべて既知の系統名であればそれを返す"""
+    tags = question.choice_types
+    if not tags or len(tags) != len(question.choices):
+        return None
+    if any(tag not in NEN_TYPES for tag in tags):
+        return None
+    return list(tags)
+
+
+class ChoiceTagIndex:
+    """
+    質問ごとの選択肢タグを保持するインデックス
+
+    タグはクライアントに返さないため、診断リクエストで送り返された質問からは復元できない。
+    生成時にここへ登録しておき、診断時に質問文と選択肢から引き当てる。
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self._store = MemoryTTLStore(ttl_seconds, max_entries)
+
+    def register(self, question_set: QuestionSet) -> int:
+        """
+        質問セットのタグを登録する
+
+        Returns:
+            int: 登録できた質問の数（タグが欠けている・不正な質問は登録しない）
+        """
+        registered = 0
+        for question in question_set.questions:
+            tags = valid_choice_types(question)
+            if tags is not None:
+                self._store.set(question_key(question), json.dumps(tags, ensure_ascii=False))
+                registered += 1
+        return registered
+
+    def lookup(self, question: Question) -> Optional[List[str]]:
+        """質問の選択肢タグを返す（質問自体が持っていればそれを優先し、不明な場合は None）"""
+        tags = valid_choice_types(question)
+        if tags is not None:
+            return tags
+        value = self._store.get(question_key(question))
+        return json.loads(value) if value is not None else None
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+# プロセス全体で共有するインデックス
+choice_tag_index = ChoiceTagIndex(
+    ttl_seconds=max(1.0, env_float("CHOICE_TAGS_TTL_SECONDS", 6 * 3600.0)),
+    max_entries=max(1, env_int("CHOICE_TAGS_MAX_ENTRIES", 100000)),
+)
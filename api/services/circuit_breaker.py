@@ -0,0 +1,155 @@
+"""LLM 呼び出しのサーキットブレーカー - Gemini の障害時に呼び出しを止めて即座に失敗させる"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional
+
+from services.env import env_bool, env_float, env_int
+from services.metrics import metrics
+
+# ブレーカーの状態
+CLOSED = "closed"  # 通常どおり呼び出す
+OPEN = "open"  # 呼び出さずに即座に失敗させる
+HALF_OPEN = "half_open"  # 回復を確認するため1回だけ呼び出す
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているため LLM を呼び出さなかった"""
+
+
+def is_circuit_open(error: BaseException) -> bool:
+    """例外またはその原因が CircuitOpenError かどうか"""
+    while error is not None:
+        if isinstance(error, CircuitOpenError):
+            return True
+        error = error.__cause__
+    return False
+
+
+class CircuitBreaker:
+    """
+    LLM 呼び出しのサーキットブレーカー
+
+    直近 window 回の試行のうち failure_rate 以上が失敗すると（min_calls 回以上試行している場合）開き、
+    open_seconds の間は呼び出しを拒否する。その後半開きになり、1回だけ試行を許可して
+    成功すれば閉じ、失敗すれば再び開く。半開きの試行が open_seconds 以上返らない場合は次の試行を許可する。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+    ):
+        self.enabled = enabled
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """現在の状態（開いてから open_seconds 経過していれば半開き）"""
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def _update_state(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_started = None
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            self.opened += 1
+            metrics.inc("llm_circuit_opened_total", help="サーキットブレーカーが開いた回数")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+
+    def allow(self) -> bool:
+        """試行してよいか（拒否した場合は rejected に数える）"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._update_state()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                now = time.monotonic()
+                if self._probe_started is None or now - self._probe_started >= self.open_seconds:
+                    self._probe_started = now
+                    return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """試行の成功を記録する（半開きの場合は閉じる）"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        """試行の失敗を記録する（失敗率がしきい値を超えた場合・半開きの場合は開く）"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (
+                self._state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def stats(self) -> dict:
+        """状態・直近の失敗率・開いた回数・拒否した回数を返す"""
+        with self._lock:
+            self._update_state()
+            total = len(self._outcomes)
+            return {
+                "enabled": self.enabled,
+                "state": self._state,
+                "open": self._state == OPEN,
+                "half_open": self._state == HALF_OPEN,
+                "failure_rate": self._outcomes.count(False) / total if total else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+def create_circuit_breaker_from_env() -> CircuitBreaker:
+    """
+    環境変数から LLM 呼び出しのサーキットブレーカーを作成する
+
+    - LLM_CIRCUIT_BREAKER: サーキットブレーカーを有効にする（デフォルト true）
+    - LLM_CIRCUIT_FAILURE_RATE: 開く失敗率（デフォルト 0.5）
+    - LLM_CIRCUIT_WINDOW: 失敗率を計算する直近の試行数（デフォルト 20）
+    - LLM_CIRCUIT_MIN_CALLS: 失敗率を判定する最小の試行数（デフォルト 10）
+    - LLM_CIRCUIT_OPEN_SECONDS: 開いてから回復を確認するまでの時間（デフォルト 30 秒）
+    """
+    window = max(1, env_int("LLM_CIRCUIT_WINDOW", 20))
+    return CircuitBreaker(
+        enabled=env_bool("LLM_CIRCUIT_BREAKER", True),
+        failure_rate=min(1.0, max(0.0, env_float("LLM_CIRCUIT_FAILURE_RATE", 0.5))),
+        window=window,
+        min_calls=min(window, max(1, env_int("LLM_CIRCUIT_MIN_CALLS", 10))),
+        open_seconds=max(0.0, env_float("LLM_CIRCUIT_OPEN_SECONDS", 30.0)),
+    )
+
+
+# Gemini の呼び出し全体で共有するサーキットブレーカー
+llm_circuit_breaker = create_circuit_breaker_from_env()
@@ -0,0 +1,205 @@
+"""レスポンスの圧縮（brotli / gzip）を行う ASGI ミドルウェア"""
+
+import functools
+import gzip
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from services.env import env_bool, env_int
+from services.metrics import metrics
+
+# 圧縮する Content-Type（Server-Sent Events は逐次配信を妨げないよう圧縮しない）
+COMPRESSIBLE_TYPES = (b"application/json", b"text/plain", b"text/html", b"text/css", b"application/javascript")
+
+
+@functools.lru_cache(maxsize=1)
+def _brotli():
+    """brotli モジュール（インストールされていない場合は None。brotli はオプションの依存関係）"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def choose_encoding(accept_encoding: str, brotli_available: bool) -> Optional[str]:
+    """
+    Accept-Encoding ヘッダーから使う圧縮形式を選ぶ
+
+    q 値が最も高いものを選び、同じ場合は brotli を優先する。q=0 の形式は使わない。
+
+    Returns:
+        Optional[str]: "br"、"gzip"、または圧縮しない場合は None
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            qualities[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in (("br",) if brotli_available else ()) + ("gzip",):
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    """本文を圧縮する"""
+    if encoding == "br":
+        return _brotli().compress(body, quality=brotli_quality)
+    # mtime を固定して、同じ本文からは常に同じ圧縮結果を得る
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _suffixed_etag(etag: bytes, encoding: str) -> bytes:
+    """圧縮した表現の ETag（強い ETag は表現ごとに異なる必要があるため接尾辞を付ける）"""
+    if etag.endswith(b'"'):
+        return etag[:-1] + f"-{encoding}".encode("latin-1") + b'"'
+    return etag
+
+
+@dataclass
+class CompressionConfig:
+    """レスポンスの圧縮の設定"""
+
+    enabled: bool = True
+    minimum_size: int = 1024  # これより小さい本文は圧縮しない（バイト）
+    gzip_level: int = 6
+    brotli_quality: int = 5
+
+    @classmethod
+    def from_env(cls) -> "CompressionConfig":
+        """
+        環境変数から設定を読み込む
+
+        - COMPRESSION: 圧縮を有効にする（デフォルト true）
+        - COMPRESSION_MIN_SIZE: 圧縮する本文の最小サイズ（デフォルト 1024 バイト）
+        - COMPRESSION_GZIP_LEVEL: gzip の圧縮レベル（1-9、デフォルト 6）
+        - COMPRESSION_BROTLI_QUALITY: brotli の品質（0-11、デフォルト 5）
+        """
+        return cls(
+            enabled=env_bool("COMPRESSION", True),
+            minimum_size=max(0, env_int("COMPRESSION_MIN_SIZE", 1024)),
+            gzip_level=min(9, max(1, env_int("COMPRESSION_GZIP_LEVEL", 6))),
+            brotli_quality=min(11, max(0, env_int("COMPRESSION_BROTLI_QUALITY", 5))),
+        )
+
+
+class CompressionMiddleware:
+    """
+    Accept-Encoding に応じてレスポンスを brotli（インストールされている場合）または gzip で圧縮する ASGI ミドルウェア
+
+    本文が minimum_size 以上の JSON・テキストのみ圧縮し、Server-Sent Events・圧縮済み・304 などの
+    本文のないレスポンスはそのまま返す。圧縮したレスポンスには `Vary: Accept-Encoding` を付け、
+    強い ETag には圧縮形式の接尾辞（`"...-gzip"`）を付ける（条件付きリクエストでは services.http_cache が取り除いて比較する）。
+    """
+
+    def __init__(self, app, config: Optional[CompressionConfig] = None):
+        self.app = app
+        self.config = config or CompressionConfig.from_env()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.config.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = scope.get("headers", [])
+        encoding = choose_encoding(
+            (_header(request_headers, b"accept-encoding") or b"").decode("latin-1"),
+            brotli_available=_brotli() is not None,
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        if_none_match = _header(request_headers, b"if-none-match") or b""
+
+        start_message = None
+        body_parts: List[bytes] = []
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                content_type = _header(headers, b"content-type") or b""
+                etag = _header(headers, b"etag")
+                if message["status"] == 304 and etag is not None:
+                    # クライアントが圧縮した表現の ETag で問い合わせた場合は同じ ETag を返す
+                    suffixed = _suffixed_etag(etag, encoding)
+                    if suffixed in if_none_match:
+                        headers = [(k, suffixed if k.lower() == b"etag" else v) for k, v in headers]
+                        message = {**message, "headers": headers}
+                if (
+                    message["status"] in (204, 304)
+                    or _header(headers, b"content-encoding") is not None
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(body_parts)
+            if len(body) < self.config.minimum_size:
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            compressed = compress(body, encoding, self.config.gzip_level, self.config.brotli_quality)
+            headers = []
+            vary = None
+            for key, value in start_message.get("headers", []):
+                name = key.lower()
+                if name == b"content-length":
+                    continue
+                if name == b"etag":
+                    value = _suffixed_etag(value, encoding)
+                if name == b"vary":
+                    vary = value
+                    continue
+                headers.append((key, value))
+            if vary is None:
+                vary = b"Accept-Encoding"
+            elif b"accept-encoding" not in vary.lower():
+                vary = vary + b", Accept-Encoding"
+            headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", vary),
+            ]
+            metrics.inc("http_compressed_responses_total", help="圧縮したレスポンスの数", encoding=encoding)
+            metrics.inc(
+                "http_compression_input_bytes_total", len(body), help="圧縮前の本文のバイト数", encoding=encoding
+            )
+            metrics.inc(
+                "http_compression_output_bytes_total", len(compressed), help="圧縮後の本文のバイト数", encoding=encoding
+            )
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,135 @@
+"""リクエストの期限（API Gateway・Lambda のタイムアウト）を LLM 呼び出しまで伝える"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+from services.env import env_float
+
+T = TypeVar("T")
+
+# API Gateway（HTTP API）の統合タイムアウトは 30 秒。レスポンスを返す時間を残して少し短くする
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 28.0
+
+# Lambda の残り時間からレスポンスを返すために確保しておく時間（秒）
+LAMBDA_SAFETY_MARGIN_SECONDS = 1.0
+
+# リクエストの期限（time.monotonic() の値）。期限のない処理（起動時・バックグラウンド）では None
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """リクエストの期限までに処理が終わらない（新しい試行を始める時間が残っていない）"""
+
+
+def remaining() -> Optional[float]:
+    """リクエストの期限までの残り時間（秒）を返す（期限がない場合は None）"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def min_attempt_seconds() -> float:
+    """新しい LLM 呼び出しを始めるのに必要な残り時間（秒、LLM_MIN_ATTEMPT_SECONDS）"""
+    return max(0.0, env_float("LLM_MIN_ATTEMPT_SECONDS", 3.0))
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """
+    この中で行う処理の期限を設定する
+
+    すでに期限が設定されている場合は、より早い方を使う。seconds が None の場合は何もしない。
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def check_deadline(operation: str) -> None:
+    """
+    新しい LLM 呼び出しを始める時間が残っているか確認する
+
+    Raises:
+        DeadlineExceeded: 残り時間が LLM_MIN_ATTEMPT_SECONDS より短い場合
+    """
+    left = remaining()
+    if left is not None and left < min_attempt_seconds():
+        raise DeadlineExceeded(f"{operation}: リクエストの残り時間（{max(0.0, left):.1f}秒）が足りません")
+
+
+async def within_deadline(operation: str, awaitable: Awaitable[T]) -> T:
+    """
+    awaitable をリクエストの残り時間をタイムアウトとして待つ
+
+    Raises:
+        DeadlineExceeded: 期限までに終わらなかった場合
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=max(0.0, left))
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(f"{operation}: リクエストの期限までに LLM の応答がありませんでした") from e
+
+
+async def aiter_within_deadline(operation: str, iterator: AsyncIterator[T]) -> AsyncIterator[T]:
+    """非同期イテレーターの各要素をリクエストの残り時間をタイムアウトとして待つ（ストリーミング用）"""
+    iterator = aiter(iterator)
+    try:
+        while True:
+            try:
+                item = await within_deadline(operation, anext(iterator))
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+def is_deadline_exceeded(error: BaseException) -> bool:
+    """例外またはその原因が DeadlineExceeded かどうか"""
+    while error is not None:
+        if isinstance(error, DeadlineExceeded):
+            return True
+        error = error.__cause__
+    return False
+
+
+class DeadlineMiddleware:
+    """
+    リクエストごとに期限を設定する ASGI ミドルウェア
+
+    期限は REQUEST_TIMEOUT_SECONDS（デフォルト 28 秒）後。Lambda（Mangum）で実行している場合は、
+    Lambda の残り時間から LAMBDA_SAFETY_MARGIN_SECONDS を引いた時間の方が短ければそちらを使う。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        seconds = env_float("REQUEST_TIMEOUT_SECONDS", DEFAULT_REQUEST_TIMEOUT_SECONDS)
+        timeout: Optional[float] = seconds if seconds > 0 else None
+        context = scope.get("aws.context")
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            lambda_left = context.get_remaining_time_in_millis() / 1000 - LAMBDA_SAFETY_MARGIN_SECONDS
+            timeout = lambda_left if timeout is None else min(timeout, lambda_left)
+
+        with deadline_scope(timeout):
+            await self.app(scope, receive, send)
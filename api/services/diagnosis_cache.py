@@ -0,0 +1,98 @@
+"""診断結果キャッシュ - 同一の回答内容に対する DiagnosisResponse を再利用する"""
+
+import hashlib
+import json
+from typing import List, Optional
+
+from models.diagnosis import DiagnosisResponse, QuestionAnswer
+from services.env import env_float, env_int, env_str
+from services.ttl_store import TTLStore, create_ttl_store
+
+
+def diagnosis_cache_key(question_answers: List[QuestionAnswer]) -> str:
+    """
+    質問文・選択肢・選択した選択肢のインデックスから、内容に基づくキャッシュキーを作成する
+
+    Args:
+        question_answers: 質問と回答のペアのリスト
+
+    Returns:
+        str: 正規化した JSON の SHA-256 ハッシュ（16進数）
+    """
+    canonical = [
+        [qa.question.question_text, list(qa.question.choices), qa.selected_choice_index]
+        for qa in question_answers
+    ]
+    payload = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiagnosisCache:
+    """内容アドレス方式の診断結果キャッシュ（バックエンドは TTLStore）"""
+
+    def __init__(self, store: Optional[TTLStore]):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stores = 0
+
+    @property
+    def enabled(self) -> bool:
+        """キャッシュが有効かどうか"""
+        return self.store is not None
+
+    def get(self, key: str) -> Optional[DiagnosisResponse]:
+        """キャッシュから診断結果を取得する（存在しない場合は None）"""
+        if self.store is None:
+            return None
+        value = self.store.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return DiagnosisResponse.model_validate_json(value)
+
+    def set(self, key: str, response: DiagnosisResponse) -> None:
+        """診断結果をキャッシュに保存する"""
+        if self.store is None:
+            return
+        self.store.set(key, response.model_dump_json())
+        self.stores += 1
+
+    def record_bypass(self) -> None:
+        """キャッシュを使わずに再計算したことを記録する"""
+        self.bypasses += 1
+
+    def stats(self) -> dict:
+        """キャッシュの統計情報を返す"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.store.backend if self.store is not None else "none",
+            "entries": len(self.store) if self.store is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bypasses": self.bypasses,
+            "stores": self.stores,
+        }
+
+
+def create_diagnosis_cache_from_env() -> DiagnosisCache:
+    """
+    環境変数から診断結果キャッシュを作成する
+
+    - DIAGNOSIS_CACHE_BACKEND: memory / sqlite / none（デフォルト memory）
+    - DIAGNOSIS_CACHE_TTL_SECONDS: 保持期間（デフォルト 3600 秒）
+    - DIAGNOSIS_CACHE_MAX_ENTRIES: 最大エントリ数（デフォルト 1024）
+    - DIAGNOSIS_CACHE_PATH: SQLite ファイルのパス（デフォルト /tmp/giravanz-cache.sqlite3）
+    """
+    store = create_ttl_store(
+        backend=env_str("DIAGNOSIS_CACHE_BACKEND", "memory"),
+        ttl_seconds=max(1.0, env_float("DIAGNOSIS_CACHE_TTL_SECONDS", 3600.0)),
+        max_entries=max(1, env_int("DIAGNOSIS_CACHE_MAX_ENTRIES", 1024)),
+        path=env_str("DIAGNOSIS_CACHE_PATH", "/tmp/giravanz-cache.sqlite3"),
+        namespace="diagnosis_cache",
+    )
+    return DiagnosisCache(store)
@@ -1,70 +1,253 @@
 """診断サービス - ユーザーの回答を分析して性格診断を行う"""
 
-import os
-from typing import List
-from langchain_google_genai import ChatGoogleGenerativeAI
-from prompts.diagnosis import get_diagnosis_prompt
-from models.diagnosis import DiagnosisResponse, QuestionAnswer, PrimaryDiagnosisResult
+import asyncio
+import time
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from prompts.diagnosis import CANNED_COMMENTS, get_diagnosis_comment_prompt, get_diagnosis_prompt
+from models.diagnosis import (
+    DiagnosisComment,
+    DiagnosisResponse,
+    PrimaryDiagnosisResult,
+    QuestionAnswer,
+)
+from services.affinity import NEN_TYPE_INDEX, calculate_affinities
+from services.deadline import aiter_within_deadline
+from services.env import env_str
+from services.hedging import llm_hedger
+from services.llm_registry import DEFAULT_MODEL, llm_registry
+from services.metrics import metrics, record_stage, stage, timed_ainvoke
+from services.retry import EmptyOutputError, llm_retry_policy
+from services.local_scoring import LocalScore, score_answers
 
-# 環境変数を読み込み（ローカル開発時のみ）
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    # Lambda環境では dotenv は不要
-    pass
+# 診断にある程度の多様性を持たせる
+DIAGNOSIS_TEMPERATURE = 0.7
 
+# 診断モード
+#   llm: 主系統・特質系スコア・コメントをすべて LLM が判定する
+#   hybrid: 選択肢のタグからローカルで採点し、LLM はコメントだけを生成する
+#   local: ローカルで採点し、コメントは定型文を使う（LLM を呼び出さない）
+# hybrid / local でも、選択肢のタグが不明な質問がある場合は llm と同じ処理になる
+DIAGNOSIS_MODES = ("llm", "hybrid", "local")
 
-def calculate_affinities(primary: str, specialist_score: int) -> List[int]:
+
+def get_diagnosis_mode() -> str:
+    """環境変数 DIAGNOSIS_MODE から診断モードを返す（デフォルト hybrid）"""
+    mode = env_str("DIAGNOSIS_MODE", "hybrid").lower()
+    if mode not in DIAGNOSIS_MODES:
+        print(f"警告: DIAGNOSIS_MODE={mode!r} は不明なモードです。hybrid を使用します")
+        return "hybrid"
+    return mode
+
+
+def get_diagnosis_chain():
+    """
+    診断用のチェーン（プロンプト | 構造化出力LLM）を取得する
+
+    チェーンはレジストリで一度だけ構築され、以降の呼び出しでは使い回される。
+
+    Raises:
+        ValueError: GOOGLE_API_KEY が設定されていない場合
+    """
+    return llm_registry.get_chain(
+        "diagnosis",
+        get_diagnosis_prompt,
+        PrimaryDiagnosisResult,
+        model=DEFAULT_MODEL,
+        temperature=DIAGNOSIS_TEMPERATURE,
+    )
+
+
+def get_diagnosis_streaming_chain():
+    """
+    診断用のストリーミングチェーン（生成途中の dict を逐次返す）を取得する
+
+    Raises:
+        ValueError: GOOGLE_API_KEY が設定されていない場合
+    """
+    return llm_registry.get_chain(
+        "diagnosis",
+        get_diagnosis_prompt,
+        PrimaryDiagnosisResult,
+        model=DEFAULT_MODEL,
+        temperature=DIAGNOSIS_TEMPERATURE,
+        streaming=True,
+    )
+
+
+def get_diagnosis_comment_chain(streaming: bool = False):
+    """
+    診断コメント生成用のチェーン（主系統と特質系スコアを渡してコメントだけを生成）を取得する
+
+    Args:
+        streaming: True の場合は生成途中の dict を逐次返すチェーンを返す
+
+    Raises:
+        ValueError: GOOGLE_API_KEY が設定されていない場合
+    """
+    return llm_registry.get_chain(
+        "diagnosis_comment",
+        get_diagnosis_comment_prompt,
+        DiagnosisComment,
+        model=DEFAULT_MODEL,
+        temperature=DIAGNOSIS_TEMPERATURE,
+        streaming=streaming,
+    )
+
+
+def format_question_answers(question_answers: List[QuestionAnswer]) -> str:
     """
-    primaryを基準に親和性スコアを計算
-    
+    質問と回答のペアをプロンプト用のテキストに整形する
+
     Args:
-        primary: 主系統の名前
-        specialist_score: 特質系のスコア（0-100）
-    
+        question_answers: 質問と回答のペアのリスト
+
     Returns:
-        List[int]: 6つの系統のスコア配列
-        
+        str: プロンプトに埋め込む質問・回答テキスト
+    """
+    qa_text = ""
+    for i, qa in enumerate(question_answers, 1):
+        qa_text += f"\n質問{i}: {qa.question.question_text}\n"
+        qa_text += f"選択肢: {qa.question.choices}\n"
+        selected_choice = qa.question.choices[qa.selected_choice_index]
+        qa_text += f"→ ユーザーの選択: {qa.selected_choice_index} ({selected_choice})\n"
+    return qa_text
+
+
+def _comment_inputs(question_answers: List[QuestionAnswer], local: LocalScore) -> dict:
+    """診断コメント生成プロンプトに渡す変数を作成する"""
+    return {
+        "primary": local.primary,
+        "specialist_score": local.specialist_score,
+        "question_answers": format_question_answers(question_answers),
+    }
+
+
+async def _agenerate_comment(question_answers: List[QuestionAnswer], local: LocalScore) -> str:
+    """
+    ローカル採点の結果をもとに、LLM で診断コメントだけを生成する
+
+    Raises:
+        ValueError: Google API キーが設定されていない場合
+        Exception: コメント生成に失敗した場合
+    """
+    chain = get_diagnosis_comment_chain()
+    with stage("diagnosis_comment", "input"):
+        inputs = _comment_inputs(question_answers, local)
+    semaphore = llm_registry.semaphore(DEFAULT_MODEL)
+
+    async def attempt() -> str:
+        queued = time.perf_counter()
+        async with semaphore:
+            record_stage("diagnosis_comment", "queue", time.perf_counter() - queued)
+            result: DiagnosisComment = await timed_ainvoke(chain, inputs, "diagnosis_comment")
+        if result is None:
+            raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+        return result.reason
+
+    try:
+        return await llm_retry_policy.arun(
+            "diagnosis_comment", lambda: llm_hedger.run("diagnosis_comment", attempt)
+        )
+    except Exception as e:
+        raise Exception(f"診断コメントの生成に失敗しました（{e.retry_attempts}回試行）: {str(e)}") from e
+
+
+async def _astream_comment(
+    question_answers: List[QuestionAnswer], local: LocalScore
+) -> AsyncIterator[str]:
+    """
+    ローカル採点の結果をもとに、LLM で診断コメントを生成しながら差分テキストを返す
+
+    最初の差分を返す前に失敗した場合のみリトライする。
+
+    Raises:
+        ValueError: Google API キーが設定されていない場合
+        Exception: コメント生成に失敗した場合
+    """
+    chain = get_diagnosis_comment_chain(streaming=True)
+    inputs = _comment_inputs(question_answers, local)
+    semaphore = llm_registry.semaphore(DEFAULT_MODEL)
+
+    sent = ""
+    attempt = 0
+    llm_retry_policy.record_request()
+    while True:
+        try:
+            llm_retry_policy.start_attempt("diagnosis_comment")
+            async with semaphore:
+                async for partial in aiter_within_deadline("diagnosis_comment", chain.astream(inputs)):
+                    reason = partial.get("reason") if isinstance(partial, dict) else None
+                    if reason and len(reason) > len(sent):
+                        yield reason[len(sent):]
+                        sent = reason
+            if not sent:
+                raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+            llm_retry_policy.record_outcome()
+            return
+        except Exception as e:
+            llm_retry_policy.record_outcome(e)
+            # 差分を返した後はリトライしない
+            delay = None if sent else llm_retry_policy.retry_delay("diagnosis_comment", e, attempt)
+            if delay is None:
+                raise Exception(f"診断コメントの生成に失敗しました（{attempt + 1}回試行）: {str(e)}") from e
+            print(f"エラーが発生しました（試行 {attempt + 1}）: {e}. {delay:.1f}秒後にリトライします...")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def _llm_scores(primary: Any, specialist_score: Any) -> List[int]:
+    """
+    LLM が判定した primary と specialist_score から6系統のスコアを計算する
+
     Raises:
-        ValueError: primaryが無効な系統名の場合
-    """
-    types = ["強化系", "変化系", "具現化系", "特質系", "操作系", "放出系"]
-    
-    if primary not in types:
-        raise ValueError(f"Invalid primary type: {primary}")
-    
-    primary_index = types.index(primary)
-    scores = [0] * 6
-    
-    # 円状配列での距離を計算
-    for i in range(6):
-        # 特質系(index=3)は常にLLMの値を使用
-        if i == 3:
-            scores[i] = specialist_score
-            continue
-        
-        # 円状配列での最短距離を計算
-        distance = min(
-            abs(i - primary_index),
-            6 - abs(i - primary_index)
+        EmptyOutputError: 無効な系統名・スコアの場合（出力の不備としてリトライする）
+    """
+    if primary not in NEN_TYPE_INDEX:
+        raise EmptyOutputError(f"LLMが無効な系統を返しました: {primary}")
+    return calculate_affinities(primary, specialist_score)
+
+
+def _confirmed_scores(partial: dict) -> Optional[List[int]]:
+    """
+    生成途中の診断結果から、primary と specialist_score が確定していればスコアを返す（未確定なら None）
+
+    reason の生成が始まり、primary が有効な系統名で、specialist_score が範囲内かつ最後のキーでない
+    （数字の途中ではない）場合に確定とみなす。無効な値は生成完了後の検証でリトライする。
+    """
+    if "reason" not in partial or list(partial)[-1] == "specialist_score":
+        return None
+    primary = partial.get("primary")
+    specialist_score = partial.get("specialist_score")
+    if primary not in NEN_TYPE_INDEX or not isinstance(specialist_score, int) or not 0 <= specialist_score <= 100:
+        return None
+    return calculate_affinities(primary, specialist_score)
+
+
+def _local_score_for_mode(question_answers: List[QuestionAnswer]) -> Tuple[str, Any]:
+    """
+    現在の診断モードと、ローカル採点の結果（llm モードまたは採点できない場合は None）を返す
+
+    hybrid / local モードで採点できない（選択肢のタグが不明な質問がある）場合は、LLM で診断する
+    ことをメトリクス（local_scoring_unavailable_total）とログに残す。
+    """
+    mode = get_diagnosis_mode()
+    if mode == "llm":
+        return mode, None
+    local = score_answers(question_answers)
+    if local is None:
+        # 別のインスタンスで生成された質問セットなど、このプロセスがタグを知らない質問が含まれる
+        metrics.inc(
+            "local_scoring_unavailable_total",
+            help="選択肢のタグが不明でローカル採点できず、LLM で診断した回数",
+            mode=mode,
         )
-        
-        if distance == 0:
-            scores[i] = 100
-        elif distance == 1:
-            scores[i] = 80
-        elif distance == 2:
-            scores[i] = 60
-        else:  # distance == 3
-            scores[i] = 40
-    
-    return scores
+        print(f"警告: 選択肢のタグが不明な質問があるため、LLM で診断します（DIAGNOSIS_MODE={mode}）")
+    return mode, local
 
 
 def diagnose_personality(question_answers: List[QuestionAnswer]) -> DiagnosisResponse:
     """
-    ユーザーの回答を分析して念能力の6系統を診断する
+    ユーザーの回答を分析して念能力の6系統を診断する（同期版は診断モードによらず LLM で判定する）
 
     Args:
         question_answers: 質問と回答のペアのリスト
@@ -76,68 +259,185 @@ def diagnose_personality(question_answers: List[QuestionAnswer]) -> DiagnosisRes
         ValueError: Google API キーが設定されていない場合
         Exception: 診断処理に失敗した場合
     """
-    # Google API キーの確認
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError(
-            "GOOGLE_API_KEY が設定されていません。.env ファイルを確認してください。"
+    # 構築済みのチェーンを取得（API キー未設定の場合は ValueError）
+    chain = get_diagnosis_chain()
+
+    # 質問と回答データを整形
+    qa_text = format_question_answers(question_answers)
+
+    def attempt() -> DiagnosisResponse:
+        result: PrimaryDiagnosisResult = chain.invoke({"question_answers": qa_text})
+        if result is None:
+            raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+        # primaryとspecialist_scoreからスコアを計算する（無効な系統名の場合はリトライ）
+        return DiagnosisResponse(
+            scores=_llm_scores(result.primary, result.specialist_score),
+            comment=result.reason
         )
 
-    # LLM の初期化
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        api_key=api_key,
-        temperature=0.7,  # 診断にある程度の多様性を持たせる
-    )
+    # 診断実行（リトライポリシーに従ってリトライ）
+    try:
+        return llm_retry_policy.run("diagnosis", attempt)
+    except Exception as e:
+        raise Exception(f"診断処理に失敗しました（{e.retry_attempts}回試行）: {str(e)}") from e
+
 
-    # プロンプトの取得と構造化出力の設定
-    prompt = get_diagnosis_prompt()
-    structured_llm = llm.with_structured_output(PrimaryDiagnosisResult)
+async def adiagnose_personality(question_answers: List[QuestionAnswer]) -> DiagnosisResponse:
+    """
+    diagnose_personality の非同期版（イベントループをブロックせずに LLM を呼び出す）
+
+    LLM 呼び出しはモデルごとのセマフォで同時実行数が制限される。
+    LLM_HEDGING が有効な場合、応答が遅い呼び出しは同じ呼び出しをもう1つ並行して実行する（services.hedging）。
+
+    Args:
+        question_answers: 質問と回答のペアのリスト
+
+    Returns:
+        DiagnosisResponse: 6系統のスコアと診断コメント
 
-    # チェーンの構築
-    chain = prompt | structured_llm
+    Raises:
+        ValueError: Google API キーが設定されていない場合
+        Exception: 診断処理に失敗した場合
+    """
+    # 選択肢のタグからローカルで採点できる場合は、LLM はコメント生成のみ（local モードでは不要）
+    with stage("diagnosis", "local_score"):
+        mode, local = _local_score_for_mode(question_answers)
+    if local is not None:
+        scores = calculate_affinities(local.primary, local.specialist_score)
+        if mode == "local":
+            comment = CANNED_COMMENTS[local.primary]
+        else:
+            comment = await _agenerate_comment(question_answers, local)
+        with stage("diagnosis", "postprocess"):
+            return DiagnosisResponse(scores=scores, comment=comment)
+
+    # 構築済みのチェーンを取得（API キー未設定の場合は ValueError）
+    chain = get_diagnosis_chain()
 
     # 質問と回答データを整形
-    qa_text = ""
-    for i, qa in enumerate(question_answers, 1):
-        qa_text += f"\n質問{i}: {qa.question.question_text}\n"
-        qa_text += f"選択肢: {qa.question.choices}\n"
-        selected_choice = qa.question.choices[qa.selected_choice_index]
-        qa_text += f"→ ユーザーの選択: {qa.selected_choice_index} ({selected_choice})\n"
+    with stage("diagnosis", "input"):
+        qa_text = format_question_answers(question_answers)
+    semaphore = llm_registry.semaphore(DEFAULT_MODEL)
 
-    # 診断実行（リトライ機能付き）
-    max_retries = 3
-    last_error = None
-    
-    for attempt in range(max_retries):
-        try:
-            result: PrimaryDiagnosisResult = chain.invoke({"question_answers": qa_text})
-            
-            # Noneが返ってきた場合はリトライ
-            if result is None:
-                last_error = Exception(f"LLMが構造化出力の生成に失敗しました（試行 {attempt + 1}/{max_retries}）")
-                if attempt < max_retries - 1:
-                    print(f"警告: {last_error}. リトライします...")
-                    continue
-                else:
-                    raise last_error
-            
-            # primaryとspecialist_scoreからスコアを計算
-            scores = calculate_affinities(result.primary, result.specialist_score)
-            
-            # DiagnosisResponseを構築して返す
+    async def attempt() -> DiagnosisResponse:
+        queued = time.perf_counter()
+        async with semaphore:
+            record_stage("diagnosis", "queue", time.perf_counter() - queued)
+            result: PrimaryDiagnosisResult = await timed_ainvoke(
+                chain, {"question_answers": qa_text}, "diagnosis"
+            )
+        if result is None:
+            raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+        # primaryとspecialist_scoreからスコアを計算する（無効な系統名の場合はリトライ）
+        with stage("diagnosis", "postprocess"):
             return DiagnosisResponse(
-                scores=scores,
+                scores=_llm_scores(result.primary, result.specialist_score),
                 comment=result.reason
             )
-            
+
+    # 診断実行（リトライポリシーに従ってリトライし、応答が遅い試行はヘッジする）
+    try:
+        return await llm_retry_policy.arun(
+            "diagnosis", lambda: llm_hedger.run("diagnosis", attempt)
+        )
+    except Exception as e:
+        raise Exception(f"診断処理に失敗しました（{e.retry_attempts}回試行）: {str(e)}") from e
+
+
+async def astream_diagnosis(
+    question_answers: List[QuestionAnswer],
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    診断しながら、スコアを先に、診断コメントを後から逐次返す非同期ジェネレーター
+
+    LLM の出力（部分的な JSON）を逐次パースし、primary と specialist_score が確定した時点
+    （reason の生成が始まった時点）で6系統のスコアを返し、その後 reason を差分ごとに返す。
+    スコアを返す前に失敗した場合のみリトライする（返した後の失敗はそのまま送出する）。
+
+    Args:
+        question_answers: 質問と回答のペアのリスト
+
+    Yields:
+        ("scores", List[int]): 6系統のスコア（1回のみ）
+        ("comment", str): 診断コメントの差分テキスト（複数回）
+        ("complete", DiagnosisResponse): 最後に1回、完全な診断結果
+
+    Raises:
+        ValueError: Google API キーが設定されていない場合
+        Exception: 診断処理に失敗した場合
+    """
+    # 選択肢のタグからローカルで採点できる場合は、スコアを即座に返してからコメントを生成する
+    mode, local = _local_score_for_mode(question_answers)
+    if local is not None:
+        scores = calculate_affinities(local.primary, local.specialist_score)
+        yield ("scores", scores)
+        if mode == "local":
+            comment = CANNED_COMMENTS[local.primary]
+            yield ("comment", comment)
+        else:
+            comment = ""
+            async for delta in _astream_comment(question_answers, local):
+                comment += delta
+                yield ("comment", delta)
+        yield ("complete", DiagnosisResponse(scores=scores, comment=comment))
+        return
+
+    # 構築済みのチェーンを取得（API キー未設定の場合は ValueError）
+    chain = get_diagnosis_streaming_chain()
+
+    # 質問と回答データを整形
+    qa_text = format_question_answers(question_answers)
+    semaphore = llm_registry.semaphore(DEFAULT_MODEL)
+
+    scores = None
+    attempt = 0
+    llm_retry_policy.record_request()
+
+    while True:
+        try:
+            latest = None
+            sent_comment = ""
+            llm_retry_policy.start_attempt("diagnosis")
+            async with semaphore:
+                async for partial in aiter_within_deadline("diagnosis", chain.astream({"question_answers": qa_text})):
+                    if not isinstance(partial, dict):
+                        continue
+                    latest = partial
+
+                    # primary と specialist_score が確定した時点でスコアを返す
+                    if scores is None:
+                        scores = _confirmed_scores(partial)
+                        if scores is not None:
+                            yield ("scores", scores)
+
+                    if scores is not None:
+                        reason = partial.get("reason") or ""
+                        if len(reason) > len(sent_comment):
+                            yield ("comment", reason[len(sent_comment):])
+                            sent_comment = reason
+
+            if latest is None:
+                raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+
+            # 生成完了後に全体を検証し、未送信の部分と完全な診断結果を返す
+            result = PrimaryDiagnosisResult.model_validate(latest)
+            final_scores = scores or _llm_scores(result.primary, result.specialist_score)
+            llm_retry_policy.record_outcome()
+            if scores is None:
+                scores = final_scores
+                yield ("scores", scores)
+            if len(result.reason) > len(sent_comment):
+                yield ("comment", result.reason[len(sent_comment):])
+
+            yield ("complete", DiagnosisResponse(scores=scores, comment=result.reason))
+            return
+
         except Exception as e:
-            last_error = e
-            if attempt < max_retries - 1:
-                print(f"エラーが発生しました（試行 {attempt + 1}/{max_retries}）: {e}. リトライします...")
-                continue
-            else:
-                raise Exception(f"診断処理に失敗しました（{max_retries}回試行）: {str(e)}") from e
-    
-    # ここには到達しないはずだが、念のため
-    raise Exception(f"診断処理に失敗しました: {last_error}")
+            llm_retry_policy.record_outcome(e)
+            # スコアを返した後はリトライしない
+            delay = None if scores is not None else llm_retry_policy.retry_delay("diagnosis", e, attempt)
+            if delay is None:
+                raise Exception(f"診断処理に失敗しました（{attempt + 1}回試行）: {str(e)}") from e
+            print(f"エラーが発生しました（試行 {attempt + 1}）: {e}. {delay:.1f}秒後にリトライします...")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,49 @@
+"""環境変数から設定値を読み込むためのユーティリティ"""
+
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    """環境変数を整数として読み込む（未設定・不正値の場合はデフォルト値）"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"警告: {name}={value!r} は整数ではありません。デフォルト値 {default} を使用します")
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """環境変数を小数として読み込む（未設定・不正値の場合はデフォルト値）"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"警告: {name}={value!r} は数値ではありません。デフォルト値 {default} を使用します")
+        return default
+
+
+def env_str(name: str, default: str) -> str:
+    """環境変数を文字列として読み込む（未設定・空文字の場合はデフォルト値）"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip()
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """環境変数を真偽値として読み込む（1/true/yes/on を真とする。未設定・不正値の場合はデフォルト値）"""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    normalized = value.strip().lower()
+    if normalized in ("1", "true", "yes", "on"):
+        return True
+    if normalized in ("0", "false", "no", "off"):
+        return False
+    print(f"警告: {name}={value!r} は真偽値ではありません。デフォルト値 {default} を使用します")
+    return default
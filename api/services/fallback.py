@@ -0,0 +1,77 @@
+"""Gemini の障害時（サーキットブレーカーが開いている間）に LLM の代わりに返す結果"""
+
+import random
+import threading
+from collections import deque
+from typing import Deque, List, Optional
+
+from models.diagnosis import DiagnosisResponse, QuestionAnswer
+from models.question import QuestionSet
+from prompts.diagnosis import CANNED_COMMENTS
+from prompts.fallback_questions import FALLBACK_QUESTION_SET
+from services.affinity import calculate_affinities
+from services.choice_tags import choice_tag_index
+from services.local_scoring import score_answers
+from services.metrics import metrics
+
+# 代替に使うため保持しておく、直近に生成した質問セットの数
+RECENT_QUESTION_SETS = 8
+
+
+class FallbackQuestions:
+    """
+    LLM を呼び出せない場合に返す質問セット
+
+    直近に生成した質問セットがあればその中からランダムに返し、なければ同梱の質問セットを返す。
+    どちらも選択肢のタグを登録するため、診断はローカル採点で行える。
+    """
+
+    def __init__(self, capacity: int = RECENT_QUESTION_SETS):
+        self._recent: Deque[QuestionSet] = deque(maxlen=capacity)
+        self._bundled: Optional[QuestionSet] = None
+        self._lock = threading.Lock()
+
+    def remember(self, question_set: QuestionSet) -> None:
+        """生成に成功した質問セットを保持する"""
+        with self._lock:
+            self._recent.append(question_set)
+
+    def get(self) -> QuestionSet:
+        """代替の質問セットを返す"""
+        with self._lock:
+            recent = list(self._recent)
+        if recent:
+            question_set = random.choice(recent)
+        else:
+            if self._bundled is None:
+                self._bundled = QuestionSet.model_validate(FALLBACK_QUESTION_SET)
+            question_set = self._bundled
+        choice_tag_index.register(question_set)
+        metrics.inc("llm_fallbacks_total", help="LLM の代わりに代替の結果を返した回数", operation="question_generation")
+        return question_set
+
+    def stats(self) -> dict:
+        """保持している質問セットの数を返す"""
+        with self._lock:
+            return {"recent": len(self._recent)}
+
+
+def fallback_diagnosis(question_answers: List[QuestionAnswer]) -> Optional[DiagnosisResponse]:
+    """
+    ローカル採点と定型コメントで診断する
+
+    Returns:
+        Optional[DiagnosisResponse]: 診断結果（選択肢のタグが不明で採点できない場合は None）
+    """
+    local = score_answers(question_answers)
+    if local is None:
+        return None
+    metrics.inc("llm_fallbacks_total", help="LLM の代わりに代替の結果を返した回数", operation="diagnosis")
+    return DiagnosisResponse(
+        scores=calculate_affinities(local.primary, local.specialist_score),
+        comment=CANNED_COMMENTS[local.primary],
+    )
+
+
+# プロセス全体で共有する代替の質問セット
+fallback_questions = FallbackQuestions()
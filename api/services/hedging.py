@@ -0,0 +1,155 @@
+"""LLM 呼び出しのヘッジ（一定時間内に返らない場合に同じ呼び出しをもう1つ並行して実行する）"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from services.env import env_bool, env_float, env_int
+from services.metrics import metrics
+from services.retry import RetryBudget
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """
+    LLM 呼び出しのヘッジ
+
+    最初の呼び出しが直近の所要時間の quantile（デフォルト p90）を過ぎても返らない場合に、
+    同じ呼び出しをもう1つ開始し、先に成功した方の結果を使う（もう一方はキャンセルする）。
+    ヘッジの回数は呼び出し全体の max_ratio 程度に抑え（RetryBudget と同じトークン方式）、コストの増加を制限する。
+
+    待ち時間は操作ごとに成功した呼び出しの所要時間から計算し、min_delay〜max_delay の範囲に収める。
+    サンプルが min_samples 件に満たない間は max_delay を使う。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        quantile: float = 0.9,
+        min_delay: float = 1.0,
+        max_delay: float = 10.0,
+        max_ratio: float = 0.1,
+        min_samples: int = 20,
+        window: int = 256,
+    ):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.budget = RetryBudget(ratio=max_ratio, min_per_second=0.0, max_tokens=2.0)
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record_latency(self, operation: str, seconds: float) -> None:
+        """成功した呼び出しの所要時間を記録する"""
+        with self._lock:
+            samples = self._latencies.setdefault(operation, deque(maxlen=self.window))
+            samples.append(seconds)
+
+    def threshold(self, operation: str) -> float:
+        """ヘッジを開始するまでの待ち時間（秒）を返す"""
+        with self._lock:
+            samples = sorted(self._latencies.get(operation, ()))
+        if len(samples) < self.min_samples:
+            return self.max_delay
+        value = samples[min(len(samples) - 1, int(self.quantile * len(samples)))]
+        return min(self.max_delay, max(self.min_delay, value))
+
+    async def run(self, operation: str, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        call を実行し、閾値を過ぎても返らない場合はヘッジする
+
+        ヘッジが無効な場合は call をそのまま実行する。どちらかが失敗しても、もう一方が実行中であれば
+        その結果を待つ。両方失敗した場合は後に失敗した方の例外を送出する。
+
+        Args:
+            operation: 処理の種類（メトリクスのラベル・待ち時間の計算単位）
+            call: 1回分の LLM 呼び出し（構造化出力が None の場合は例外を送出すること）
+        """
+        if not self.enabled:
+            return await call()
+
+        self.budget.record_request()
+        started = {}
+
+        def launch(name: str) -> asyncio.Task:
+            task = asyncio.ensure_future(call())
+            started[task] = (name, time.perf_counter())
+            return task
+
+        primary = launch("primary")
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.threshold(operation))
+            if not done:
+                if self.budget.try_spend():
+                    pending.add(launch("hedge"))
+                    metrics.inc("llm_hedges_total", help="LLM 呼び出しのヘッジを開始した回数", operation=operation)
+                else:
+                    metrics.inc(
+                        "llm_hedges_skipped_total",
+                        help="ヘッジの上限によりヘッジしなかった回数",
+                        operation=operation,
+                    )
+
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    name, task_started = started[task]
+                    self.record_latency(operation, time.perf_counter() - task_started)
+                    if len(started) > 1:
+                        metrics.inc(
+                            "llm_hedge_wins_total",
+                            help="ヘッジした呼び出しで先に成功した方（primary / hedge）",
+                            operation=operation,
+                            winner=name,
+                        )
+                    return task.result()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """操作ごとの現在の閾値とヘッジ予算の残量を返す"""
+        with self._lock:
+            operations = list(self._latencies)
+        return {
+            "enabled": self.enabled,
+            "threshold_seconds": {operation: self.threshold(operation) for operation in operations},
+            "budget": self.budget.stats(),
+        }
+
+
+def create_hedger_from_env() -> Hedger:
+    """
+    環境変数から LLM 呼び出しのヘッジ設定を作成する
+
+    - LLM_HEDGING: ヘッジを有効にする（デフォルト false）
+    - LLM_HEDGE_QUANTILE: ヘッジを開始する所要時間の分位点（デフォルト 0.9）
+    - LLM_HEDGE_MIN_DELAY / LLM_HEDGE_MAX_DELAY: 待ち時間の下限・上限（デフォルト 1 / 10 秒）
+    - LLM_HEDGE_MAX_RATIO: 呼び出し全体に対するヘッジの割合の上限（デフォルト 0.1）
+    - LLM_HEDGE_MIN_SAMPLES: 分位点を使い始めるサンプル数（デフォルト 20）
+    """
+    return Hedger(
+        enabled=env_bool("LLM_HEDGING", False),
+        quantile=min(0.99, max(0.5, env_float("LLM_HEDGE_QUANTILE", 0.9))),
+        min_delay=max(0.0, env_float("LLM_HEDGE_MIN_DELAY", 1.0)),
+        max_delay=max(0.0, env_float("LLM_HEDGE_MAX_DELAY", 10.0)),
+        max_ratio=max(0.0, env_float("LLM_HEDGE_MAX_RATIO", 0.1)),
+        min_samples=max(1, env_int("LLM_HEDGE_MIN_SAMPLES", 20)),
+    )
+
+
+# プロセス全体で共有するヘッジ設定（ヘッジの予算・所要時間のサンプルも共有する）
+llm_hedger = create_hedger_from_env()
@@ -0,0 +1,64 @@
+"""HTTP キャッシュ - 強い ETag・Cache-Control と条件付きリクエスト（If-None-Match）への 304 応答"""
+
+import hashlib
+from typing import Optional
+
+from fastapi.responses import Response
+
+# 圧縮したレスポンスの ETag に付ける接尾辞（services.compression で付与する。比較時には取り除く）
+ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def make_etag(*parts: object) -> str:
+    """
+    内容を表す値から強い ETag を作成する
+
+    Args:
+        parts: 内容を一意に決める値（データのバージョン、正規化したクエリなど）
+
+    Returns:
+        str: `"<SHA-256 の先頭 128 ビット>"` の形式の ETag
+    """
+    payload = "\x1f".join(str(part) for part in parts)
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _opaque_tag(tag: str) -> str:
+    """比較用に弱い ETag の接頭辞と圧縮の接尾辞を取り除く"""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match ヘッダーが ETag に一致するかどうか（RFC 9110 の弱い比較）
+
+    圧縮したレスポンスで返した ETag（接尾辞付き）も、圧縮前の ETag と一致するものとして扱う。
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == target for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str, cache_control: str) -> dict:
+    """ETag と Cache-Control のヘッダー"""
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """304 Not Modified のレスポンス（本文なし）"""
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
+
+
+def with_cache_headers(response: Response, etag: str, cache_control: str) -> Response:
+    """レスポンスに ETag と Cache-Control を付ける"""
+    response.headers.update(cache_headers(etag, cache_control))
+    return response
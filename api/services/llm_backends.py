@@ -0,0 +1,444 @@
+"""LLM バックエンドの切り替え - Gemini・オフラインのフェイク・記録・再生
+
+LLM_BACKEND で LLM レジストリが構築するチェーンを切り替える。
+
+- gemini: Gemini を呼び出す（デフォルト）
+- fake: API キー・ネットワークなしで、入力から決定的に生成した有効な構造化出力を返す。
+  所要時間（対数正規分布）と失敗率を環境変数で指定できる
+- record: Gemini を呼び出し、入力と出力を LLM_RECORDINGS_PATH（JSONL）に追記する
+- replay: LLM_RECORDINGS_PATH に記録した出力を返す（API キー・ネットワーク不要）
+
+fake・replay ではプロンプトの組み立てと出力のパースも実際のチェーンと同じ形で行うため、
+ロードテスト・プロファイリングを Gemini なしで実行できる。
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from models.diagnosis import NEN_TYPES
+from prompts.diagnosis import CANNED_COMMENTS
+from prompts.question_generation import THEMES
+from services.env import env_bool, env_float, env_int, env_str
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+LLM_BACKENDS = ("gemini", "fake", "record", "replay")
+
+# API キーを使わずにチェーンを構築するバックエンド
+OFFLINE_BACKENDS = ("fake", "replay")
+
+DEFAULT_RECORDINGS_PATH = Path(__file__).resolve().parent.parent / "recordings" / "llm-recordings.jsonl"
+
+# フェイクのストリーミングで出力を分割する数
+FAKE_STREAM_CHUNKS = 16
+
+# フェイクの選択肢の文言（念系統ごと）
+FAKE_CHOICE_PHRASES = {
+    "強化系": ["最後まで諦めずに走り続ける", "基礎練習をコツコツ積み重ねる", "真正面からぶつかっていく"],
+    "放出系": ["大きな声で仲間を鼓舞する", "思い切り遠くまでボールを蹴り出す", "周りを巻き込んで盛り上げる"],
+    "変化系": ["相手の裏をかくトリックを仕掛ける", "その場の気分でやり方を変える", "型にはまらないアレンジを加える"],
+    "操作系": ["作戦を立ててチーム全体を動かす", "データを集めて計画的に準備する", "道具や環境を細かく整える"],
+    "具現化系": ["理想のプレーを細部までイメージする", "完成度にとことんこだわる", "自分だけのスタイルを形にする"],
+    "特質系": ["なぜか審判と意気投合している", "ハーフタイムに謎の新技を思いつく", "芝生の声が聞こえる気がする"],
+}
+
+
+class FakeLLMError(Exception):
+    """フェイクバックエンドが意図的に発生させる失敗（一時的なエラーとして扱われる）"""
+
+
+class ReplayMissError(ValueError):
+    """再生する記録がない"""
+
+
+def get_llm_backend() -> str:
+    """LLM_BACKEND を返す（不明な値の場合は gemini）"""
+    backend = env_str("LLM_BACKEND", "gemini").lower()
+    if backend not in LLM_BACKENDS:
+        print(f"警告: LLM_BACKEND={backend!r} は不明なバックエンドです。gemini を使用します")
+        return "gemini"
+    return backend
+
+
+def _to_plain(value: Any) -> Any:
+    """構造化出力を JSON に変換できる値にする（レスポンスから除外されるフィールドも含める）"""
+    if isinstance(value, BaseModel):
+        return {name: _to_plain(getattr(value, name)) for name in type(value).model_fields}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_plain(item) for key, item in value.items()}
+    return value
+
+
+# ---------------------------------------------------------------------------
+# fake
+# ---------------------------------------------------------------------------
+
+
+def _fake_question_set(rng: random.Random) -> dict:
+    questions = []
+    for i, theme in enumerate(rng.sample(THEMES, 10)):
+        types = rng.sample(["強化系", "放出系", "変化系", rng.choice(["操作系", "具現化系"])], 3) + ["特質系"]
+        rng.shuffle(types)
+        questions.append(
+            {
+                "question_text": f"{theme}について、あなたに一番近いのはどれですか？（{i + 1}）",
+                "choices": [rng.choice(FAKE_CHOICE_PHRASES[nen_type]) for nen_type in types],
+                "choice_types": types,
+            }
+        )
+    return {"questions": questions}
+
+
+def _fake_diagnosis(rng: random.Random) -> dict:
+    primary = rng.choice(NEN_TYPES)
+    specialist_score = rng.randint(91, 100) if primary == "特質系" else rng.randint(20, 90)
+    return {"primary": primary, "specialist_score": specialist_score, "reason": CANNED_COMMENTS[primary]}
+
+
+def _fake_comment(rng: random.Random, prompt_text: str) -> dict:
+    match = re.search(r"主系統: (\S+)", prompt_text)
+    primary = match.group(1) if match and match.group(1) in CANNED_COMMENTS else rng.choice(NEN_TYPES)
+    return {"reason": CANNED_COMMENTS[primary]}
+
+
+FAKE_OUTPUTS: Dict[str, Callable[[random.Random, str], dict]] = {
+    "QuestionSet": lambda rng, _text: _fake_question_set(rng),
+    "PrimaryDiagnosisResult": lambda rng, _text: _fake_diagnosis(rng),
+    "DiagnosisComment": _fake_comment,
+}
+
+
+def fake_output(schema_name: str, prompt_text: str) -> dict:
+    """
+    プロンプトの内容から決定的に構造化出力を生成する（同じプロンプトには同じ出力を返す）
+
+    Raises:
+        ValueError: フェイクが対応していないスキーマの場合
+    """
+    generate = FAKE_OUTPUTS.get(schema_name)
+    if generate is None:
+        raise ValueError(f"フェイクバックエンドは {schema_name} に対応していません")
+    seed = int.from_bytes(hashlib.sha256(prompt_text.encode("utf-8")).digest()[:8], "big")
+    return generate(random.Random(seed), prompt_text)
+
+
+class FakeLatency:
+    """
+    フェイクの所要時間と失敗
+
+    所要時間は中央値 median、対数標準偏差 sigma の対数正規分布に従い、failure_rate の確率で失敗する。
+    乱数は seed で初期化するため、同じ順序の呼び出しには同じ所要時間を返す。
+    """
+
+    def __init__(self, median: float = 0.0, sigma: float = 0.5, failure_rate: float = 0.0, seed: int = 0):
+        self.median = median
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakeLatency":
+        """
+        環境変数から作成する
+
+        - LLM_FAKE_LATENCY_MEDIAN: 所要時間の中央値（秒、デフォルト 0 = 待たない）
+        - LLM_FAKE_LATENCY_SIGMA: 所要時間の対数標準偏差（デフォルト 0.5。大きいほど裾が長い）
+        - LLM_FAKE_FAILURE_RATE: 失敗する確率（デフォルト 0）
+        - LLM_FAKE_SEED: 乱数のシード（デフォルト 0）
+        """
+        return cls(
+            median=max(0.0, env_float("LLM_FAKE_LATENCY_MEDIAN", 0.0)),
+            sigma=max(0.0, env_float("LLM_FAKE_LATENCY_SIGMA", 0.5)),
+            failure_rate=min(1.0, max(0.0, env_float("LLM_FAKE_FAILURE_RATE", 0.0))),
+            seed=env_int("LLM_FAKE_SEED", 0),
+        )
+
+    def draw(self) -> Tuple[float, bool]:
+        """1回分の (所要時間, 失敗するか) を返す"""
+        with self._lock:
+            delay = self.median * self._rng.lognormvariate(0.0, self.sigma) if self.median > 0 else 0.0
+            return delay, self._rng.random() < self.failure_rate
+
+
+_fake_chat_model_class = None
+
+
+def _get_fake_chat_model_class():
+    """フェイクのチャットモデルのクラスを返す（LangChain は最初に使うときに読み込む）"""
+    global _fake_chat_model_class
+    if _fake_chat_model_class is not None:
+        return _fake_chat_model_class
+
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage, AIMessageChunk
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class FakeStructuredChatModel(BaseChatModel):
+        """スキーマに合った JSON を返すフェイクのチャットモデル"""
+
+        schema_name: str
+        latency: Any
+
+        @property
+        def _llm_type(self) -> str:
+            return "fake-structured"
+
+        def _respond(self, messages) -> str:
+            prompt_text = "\n".join(str(message.content) for message in messages)
+            return json.dumps(fake_output(self.schema_name, prompt_text), ensure_ascii=False)
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            delay, failed = self.latency.draw()
+            time.sleep(delay)
+            if failed:
+                raise FakeLLMError("503 UNAVAILABLE: フェイクバックエンドの失敗")
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._respond(messages)))])
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            delay, failed = self.latency.draw()
+            await asyncio.sleep(delay)
+            if failed:
+                raise FakeLLMError("503 UNAVAILABLE: フェイクバックエンドの失敗")
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._respond(messages)))])
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            # 所要時間の3割を最初のトークンまで、残りを各チャンクに割り当てる
+            delay, failed = self.latency.draw()
+            await asyncio.sleep(delay * 0.3)
+            if failed:
+                raise FakeLLMError("503 UNAVAILABLE: フェイクバックエンドの失敗")
+            content = self._respond(messages)
+            size = max(1, -(-len(content) // FAKE_STREAM_CHUNKS))
+            for start in range(0, len(content), size):
+                await asyncio.sleep(delay * 0.7 / FAKE_STREAM_CHUNKS)
+                piece = content[start:start + size]
+                if run_manager is not None:
+                    await run_manager.on_llm_new_token(piece)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    _fake_chat_model_class = FakeStructuredChatModel
+    return _fake_chat_model_class
+
+
+def build_fake_chain(prompt_factory: Callable[[], "ChatPromptTemplate"], schema: Type[BaseModel], streaming: bool):
+    """
+    `prompt | フェイクのチャットモデル | パーサー` のチェーンを構築する
+
+    streaming の場合は JsonOutputParser で生成途中の dict を逐次返し、それ以外は schema のインスタンスを返す
+    （Gemini の構造化出力チェーンと同じ）。所要時間の設定はチェーンを構築したときの環境変数を使う。
+    """
+    from langchain_core.output_parsers import JsonOutputParser, PydanticOutputParser
+
+    model = _get_fake_chat_model_class()(schema_name=schema.__name__, latency=FakeLatency.from_env())
+    parser = JsonOutputParser() if streaming else PydanticOutputParser(pydantic_object=schema)
+    return prompt_factory() | model | parser
+
+
+# ---------------------------------------------------------------------------
+# record / replay
+# ---------------------------------------------------------------------------
+
+
+def recording_key(prompt_name: str, schema: Type[BaseModel], streaming: bool, variables: dict) -> str:
+    """記録のキー（プロンプト名・スキーマ・ストリーミングの有無・プロンプト変数のハッシュ）"""
+    payload = json.dumps(
+        {"prompt": prompt_name, "schema": schema.__name__, "streaming": streaming, "variables": variables},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RecordingStore:
+    """
+    LLM の入力と出力の記録（JSONL、1行に1回の呼び出し）
+
+    再生時にキーが一致する記録がない場合は、同じプロンプト・スキーマの記録からキーのハッシュで1つ選ぶ
+    （質問生成のようにプロンプト変数にランダムなシードを含む呼び出しも再生できるようにする）。
+    LLM_REPLAY_STRICT=true の場合は一致する記録がなければ失敗する。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._records: Optional[Dict[str, dict]] = None
+        self._by_prompt: Dict[Tuple[str, str, bool], List[dict]] = {}
+
+    def _load_locked(self) -> Dict[str, dict]:
+        if self._records is None:
+            self._records = {}
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            self._index_locked(json.loads(line))
+        return self._records
+
+    def _index_locked(self, record: dict) -> None:
+        self._records[record["key"]] = record
+        group = (record["prompt"], record["schema"], record["streaming"])
+        self._by_prompt.setdefault(group, []).append(record)
+
+    def append(self, record: dict) -> None:
+        """記録を追記する"""
+        with self._lock:
+            self._load_locked()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._index_locked(record)
+
+    def lookup(self, key: str, prompt_name: str, schema_name: str, streaming: bool, strict: bool) -> dict:
+        """
+        再生する記録を返す
+
+        Raises:
+            ReplayMissError: 再生できる記録がない場合
+        """
+        with self._lock:
+            records = self._load_locked()
+            record = records.get(key)
+            if record is None and not strict:
+                candidates = self._by_prompt.get((prompt_name, schema_name, streaming), [])
+                if candidates:
+                    record = candidates[int(key[:8], 16) % len(candidates)]
+        if record is None:
+            raise ReplayMissError(f"{prompt_name}（{schema_name}）の記録がありません: {self.path}")
+        return record
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load_locked())
+
+
+_stores: Dict[Path, RecordingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_recording_store() -> RecordingStore:
+    """LLM_RECORDINGS_PATH の記録を返す（パスごとに1つ）"""
+    path = Path(env_str("LLM_RECORDINGS_PATH", str(DEFAULT_RECORDINGS_PATH)))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = RecordingStore(path)
+        return store
+
+
+class RecordingChain:
+    """チェーンの呼び出しをそのまま行い、入力と出力（ストリーミングの場合は最後の dict）を記録する"""
+
+    def __init__(self, chain, prompt_name: str, schema: Type[BaseModel], streaming: bool, store: RecordingStore):
+        self.chain = chain
+        self.prompt_name = prompt_name
+        self.schema = schema
+        self.streaming = streaming
+        self.store = store
+
+    def _record(self, variables: dict, output: Any, elapsed: float) -> None:
+        if output is None:
+            return
+        self.store.append(
+            {
+                "key": recording_key(self.prompt_name, self.schema, self.streaming, variables),
+                "prompt": self.prompt_name,
+                "schema": self.schema.__name__,
+                "streaming": self.streaming,
+                "variables": _to_plain(variables),
+                "output": _to_plain(output),
+                "elapsed": round(elapsed, 3),
+            }
+        )
+
+    def invoke(self, variables: dict, config=None):
+        started = time.perf_counter()
+        result = self.chain.invoke(variables, config=config)
+        self._record(variables, result, time.perf_counter() - started)
+        return result
+
+    async def ainvoke(self, variables: dict, config=None):
+        started = time.perf_counter()
+        result = await self.chain.ainvoke(variables, config=config)
+        self._record(variables, result, time.perf_counter() - started)
+        return result
+
+    async def astream(self, variables: dict, config=None) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        latest = None
+        async for partial in self.chain.astream(variables, config=config):
+            latest = partial
+            yield partial
+        self._record(variables, latest, time.perf_counter() - started)
+
+
+class ReplayChain:
+    """
+    記録した出力を返すチェーン
+
+    LLM_REPLAY_REALTIME=true の場合は、記録したときの所要時間だけ待ってから返す。
+    """
+
+    def __init__(self, prompt_name: str, schema: Type[BaseModel], streaming: bool, store: RecordingStore):
+        self.prompt_name = prompt_name
+        self.schema = schema
+        self.streaming = streaming
+        self.store = store
+
+    def _lookup(self, variables: dict) -> Tuple[Any, float]:
+        record = self.store.lookup(
+            recording_key(self.prompt_name, self.schema, self.streaming, variables),
+            self.prompt_name,
+            self.schema.__name__,
+            self.streaming,
+            strict=env_bool("LLM_REPLAY_STRICT", False),
+        )
+        delay = record.get("elapsed", 0.0) if env_bool("LLM_REPLAY_REALTIME", False) else 0.0
+        output = record["output"] if self.streaming else self.schema.model_validate(record["output"])
+        return output, delay
+
+    def invoke(self, variables: dict, config=None):
+        output, delay = self._lookup(variables)
+        time.sleep(delay)
+        return output
+
+    async def ainvoke(self, variables: dict, config=None):
+        output, delay = self._lookup(variables)
+        await asyncio.sleep(delay)
+        return output
+
+    async def astream(self, variables: dict, config=None) -> AsyncIterator[Any]:
+        output, delay = self._lookup(variables)
+        await asyncio.sleep(delay)
+        yield output
+
+
+def build_offline_chain(
+    backend: str,
+    prompt_name: str,
+    prompt_factory: Callable[[], "ChatPromptTemplate"],
+    schema: Type[BaseModel],
+    streaming: bool,
+):
+    """fake / replay バックエンドのチェーンを構築する"""
+    if backend == "fake":
+        return build_fake_chain(prompt_factory, schema, streaming)
+    return ReplayChain(prompt_name, schema, streaming, get_recording_store())
+
+
+def wrap_recording(chain, prompt_name: str, schema: Type[BaseModel], streaming: bool):
+    """record バックエンドのため、チェーンを記録付きのチェーンで包む"""
+    return RecordingChain(chain, prompt_name, schema, streaming, get_recording_store())
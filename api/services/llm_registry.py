@@ -0,0 +1,238 @@
+"""LLM クライアント・チェーンのレジストリ - プロセス内で一度だけ構築して再利用する"""
+
+import asyncio
+import os
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+# LangChain・Gemini のモジュールは読み込みに時間がかかるため、最初にクライアントを構築するときに読み込む
+# （Lambda のコールドスタートで LLM を使わないリクエストが待たされないようにする）
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+# 環境変数を読み込み（ローカル開発時のみ）
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    # Lambda環境では dotenv は不要
+    pass
+
+from services.llm_backends import OFFLINE_BACKENDS, get_llm_backend  # noqa: E402
+from services.secrets import secret_store  # noqa: E402  (.env の設定を反映するため読み込み後にインポート)
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# モデルごとの同時実行数のデフォルト値
+DEFAULT_MAX_CONCURRENCY = 32
+
+LLMKey = Tuple[str, float]
+ChainKey = Tuple[str, float, Type[BaseModel], str, bool, str]
+
+
+def get_max_concurrency(model: str) -> int:
+    """
+    モデルごとの LLM 同時実行数の上限を返す
+
+    LLM_MAX_CONCURRENCY_<モデル名>（英数字以外は "_" に置換した大文字、
+    例: LLM_MAX_CONCURRENCY_GEMINI_2_5_FLASH）が優先され、
+    なければ LLM_MAX_CONCURRENCY、どちらもなければ DEFAULT_MAX_CONCURRENCY を使用する。
+    """
+    model_env = "LLM_MAX_CONCURRENCY_" + re.sub(r"[^0-9A-Za-z]", "_", model).upper()
+    for name in (model_env, "LLM_MAX_CONCURRENCY"):
+        value = os.getenv(name)
+        if value:
+            try:
+                return max(1, int(value))
+            except ValueError:
+                print(f"警告: {name}={value!r} は整数ではありません")
+    return DEFAULT_MAX_CONCURRENCY
+
+
+def get_api_key() -> str:
+    """
+    Google API キーをシークレットストアから取得する
+
+    Returns:
+        str: API キー
+
+    Raises:
+        ValueError: GOOGLE_API_KEY が設定されていない場合
+    """
+    api_key = secret_store.get("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError(
+            "GOOGLE_API_KEY が設定されていません。"
+            ".env ファイルを作成して API キーを設定してください。"
+        )
+    return api_key
+
+
+class LLMRegistry:
+    """
+    LLM クライアントと構造化出力チェーンのプロセス全体のレジストリ
+
+    クライアントは (model, temperature)、チェーンは (model, temperature, 出力スキーマ, プロンプト名)
+    をキーとして一度だけ構築する。クライアントを使い回すことで内部の HTTP コネクションも再利用される。
+    API キーが変わった場合（ローテーション）はすべて破棄して新しいキーで再構築する。
+    LLM_BACKEND が fake / replay の場合は API キーを使わずにオフラインのチェーンを構築する（services.llm_backends）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._api_key: Optional[str] = None
+        self._llms: Dict[LLMKey, "ChatGoogleGenerativeAI"] = {}
+        self._chains: Dict[ChainKey, Any] = {}
+        self._semaphores: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+        self.builds = 0  # クライアント・チェーンを構築した回数
+        self.rotations = 0  # API キーの変更を検知して再構築した回数
+
+    def _sync_api_key(self, api_key: str) -> None:
+        """API キーが変わっていればキャッシュを破棄する（ロック内で呼び出すこと）"""
+        if self._api_key != api_key:
+            if self._api_key is not None:
+                self.rotations += 1
+                print("API キーの変更を検知しました。LLM クライアントを再構築します")
+            self._llms.clear()
+            self._chains.clear()
+            self._api_key = api_key
+
+    def _get_llm_locked(self, model: str, temperature: float) -> "ChatGoogleGenerativeAI":
+        """LLM クライアントを取得する（ロック内で呼び出すこと）"""
+        key = (model, temperature)
+        llm = self._llms.get(key)
+        if llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            llm = ChatGoogleGenerativeAI(
+                model=model,
+                temperature=temperature,
+                google_api_key=self._api_key,
+            )
+            self._llms[key] = llm
+            self.builds += 1
+        return llm
+
+    def get_llm(self, model: str = DEFAULT_MODEL, temperature: float = 0.7) -> "ChatGoogleGenerativeAI":
+        """
+        LLM クライアントを取得する（未構築の場合のみ構築）
+
+        Raises:
+            ValueError: GOOGLE_API_KEY が設定されていない場合
+        """
+        api_key = get_api_key()
+        with self._lock:
+            self._sync_api_key(api_key)
+            return self._get_llm_locked(model, temperature)
+
+    def get_chain(
+        self,
+        prompt_name: str,
+        prompt_factory: Callable[[], "ChatPromptTemplate"],
+        schema: Type[BaseModel],
+        model: str = DEFAULT_MODEL,
+        temperature: float = 0.7,
+        streaming: bool = False,
+    ):
+        """
+        `prompt | llm.with_structured_output(schema)` のチェーンを取得する（未構築の場合のみ構築）
+
+        Args:
+            prompt_name: プロンプトの識別名（キャッシュキーに使用）
+            prompt_factory: プロンプトテンプレートを返す関数
+            schema: 構造化出力のスキーマ
+            model: モデル名
+            temperature: 温度パラメータ
+            streaming: True の場合は JSON モードで出力させ、astream で生成途中の
+                dict（部分的な JSON）を逐次受け取れるチェーンを返す
+
+        Raises:
+            ValueError: GOOGLE_API_KEY が設定されていない場合（LLM_BACKEND が gemini / record の場合）
+        """
+        backend = get_llm_backend()
+        key = (model, temperature, schema, prompt_name, streaming, backend)
+        if backend in OFFLINE_BACKENDS:
+            with self._lock:
+                chain = self._chains.get(key)
+                if chain is None:
+                    from services.llm_backends import build_offline_chain
+
+                    chain = build_offline_chain(backend, prompt_name, prompt_factory, schema, streaming)
+                    self._chains[key] = chain
+                    self.builds += 1
+                return chain
+
+        api_key = get_api_key()
+        with self._lock:
+            self._sync_api_key(api_key)
+            chain = self._chains.get(key)
+            if chain is None:
+                llm = self._get_llm_locked(model, temperature)
+                if streaming:
+                    # dict のスキーマを渡すと JsonOutputParser が使われ、部分的な JSON を逐次パースできる
+                    structured_llm = llm.with_structured_output(
+                        schema.model_json_schema(), method="json_schema"
+                    )
+                else:
+                    structured_llm = llm.with_structured_output(schema)
+                chain = prompt_factory() | structured_llm
+                if backend == "record":
+                    from services.llm_backends import wrap_recording
+
+                    chain = wrap_recording(chain, prompt_name, schema, streaming)
+                self._chains[key] = chain
+                self.builds += 1
+            return chain
+
+    def semaphore(self, model: str = DEFAULT_MODEL) -> asyncio.Semaphore:
+        """
+        モデルごとの同時実行数を制限するセマフォを取得する（イベントループ上で呼び出すこと）
+
+        セマフォはイベントループに紐づくため、ループが変わった場合は作り直す。
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._semaphores.get(model)
+            if entry is None or entry[0] is not loop:
+                entry = (loop, asyncio.Semaphore(get_max_concurrency(model)))
+                self._semaphores[model] = entry
+            return entry[1]
+
+    def warmup(self) -> None:
+        """API で使用するチェーンを事前に構築する（API キー未設定の場合は警告のみ）"""
+        # 循環インポートを避けるためここでインポートする
+        from services.question_generator import get_question_chain
+        from services.diagnosis_service import get_diagnosis_chain
+
+        try:
+            get_question_chain()
+            get_diagnosis_chain()
+        except Exception as e:
+            # API キー未設定・シークレットの取得失敗など（最初のリクエストで再度取得を試みる）
+            print(f"警告: LLM チェーンの事前構築をスキップしました: {e}")
+
+    def clear(self) -> None:
+        """構築済みのクライアント・チェーンをすべて破棄する"""
+        with self._lock:
+            self._llms.clear()
+            self._chains.clear()
+            self._api_key = None
+
+    def stats(self) -> dict:
+        """レジストリの統計情報を返す"""
+        with self._lock:
+            return {
+                "backend": get_llm_backend(),
+                "llms": len(self._llms),
+                "chains": len(self._chains),
+                "builds": self.builds,
+                "rotations": self.rotations,
+            }
+
+
+# プロセス全体で共有するレジストリ
+llm_registry = LLMRegistry()
@@ -0,0 +1,78 @@
+"""ローカル採点エンジン - 選択肢の念系統タグから LLM を使わずに主系統と特質系スコアを決める"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from models.diagnosis import NEN_TYPES, QuestionAnswer
+from services.choice_tags import choice_tag_index
+
+SPECIALIST_TYPE = "特質系"
+
+
+@dataclass
+class LocalScore:
+    """ローカル採点の結果"""
+
+    primary: str
+    specialist_score: int
+    counts: Dict[str, int]
+
+
+def count_selected_types(question_answers: List[QuestionAnswer]) -> Optional[Dict[str, int]]:
+    """
+    選ばれた選択肢の念系統を集計する
+
+    Returns:
+        Optional[Dict[str, int]]: 系統ごとの選択数（タグが不明な質問が1つでもあれば None）
+    """
+    counts = {nen_type: 0 for nen_type in NEN_TYPES}
+    for qa in question_answers:
+        tags = choice_tag_index.lookup(qa.question)
+        if tags is None:
+            return None
+        counts[tags[qa.selected_choice_index]] += 1
+    return counts
+
+
+def score_counts(counts: Dict[str, int]) -> LocalScore:
+    """
+    系統ごとの選択数から主系統と特質系スコアを決める
+
+    - primary: 最も多く選ばれた系統。同数の場合は円環上の両隣の選択数の合計が多い系統、
+      それも同じ場合は NEN_TYPES の順序で先の系統
+    - specialist_score: primary が特質系でない場合は、特質系の選択率を 20〜90 の範囲で 20 + 80 × 選択率
+      （90 を上限）とする。primary が特質系の場合は選択率を 91〜100 に割り当てる
+      （LLM の診断と同じく 91 以上は特質系が主系統の場合のみで、6系統のスコアで特質系が最大になる）
+    """
+    size = len(NEN_TYPES)
+
+    def rank(index: int):
+        neighbours = counts[NEN_TYPES[(index - 1) % size]] + counts[NEN_TYPES[(index + 1) % size]]
+        return (counts[NEN_TYPES[index]], neighbours, -index)
+
+    primary = NEN_TYPES[max(range(size), key=rank)]
+
+    total = sum(counts.values())
+    share = counts[SPECIALIST_TYPE] / total if total else 0.0
+    if primary == SPECIALIST_TYPE:
+        specialist_score = min(100, max(91, round(91 + 9 * share)))
+    else:
+        specialist_score = min(90, round(20 + 80 * share))
+
+    return LocalScore(primary=primary, specialist_score=specialist_score, counts=dict(counts))
+
+
+def score_answers(question_answers: List[QuestionAnswer]) -> Optional[LocalScore]:
+    """
+    回答をローカルで採点する
+
+    Args:
+        question_answers: 質問と回答のペアのリスト
+
+    Returns:
+        Optional[LocalScore]: 採点結果（選択肢のタグが不明な質問がある場合は None）
+    """
+    counts = count_selected_types(question_answers)
+    if counts is None:
+        return None
+    return score_counts(counts)
@@ -0,0 +1,317 @@
+"""メトリクス - 処理段階ごとの所要時間の計測、Server-Timing ヘッダー、Prometheus 形式の出力"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+METRIC_PREFIX = "giravanz_"
+
+# Prometheus の summary として出力する分位点
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 分位点の計算に使う直近のサンプル数（ラベルの組み合わせごと）
+RESERVOIR_SIZE = 1024
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Summary:
+    """直近のサンプルから分位点を計算する（件数・合計は全期間）"""
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE):
+        self.samples: Deque[float] = deque(maxlen=reservoir_size)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self) -> Dict[float, float]:
+        """分位点ごとの値を返す（サンプルがない場合は NaN）"""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: math.nan for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    プロセス内のメトリクスを保持し、Prometheus のテキスト形式で出力する
+
+    - summary: 所要時間などの分布（p50 / p95 / p99、合計、件数）
+    - counter: 累積の回数
+    - stats: 各コンポーネントの stats() が返す数値を gauge として出力する
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, Summary]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._stats: List[Tuple[str, Callable[[], dict]]] = []
+
+    def observe(self, name: str, value: float, help: str = "", **labels: Any) -> None:
+        """summary に値を記録する"""
+        key = _label_key(labels)
+        with self._lock:
+            self._help.setdefault(name, ("summary", help))
+            series = self._summaries.setdefault(name, {})
+            summary = series.get(key)
+            if summary is None:
+                summary = series[key] = Summary()
+            summary.observe(value)
+
+    def inc(self, name: str, value: float = 1.0, help: str = "", **labels: Any) -> None:
+        """counter を加算する"""
+        key = _label_key(labels)
+        with self._lock:
+            self._help.setdefault(name, ("counter", help))
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def register_stats(self, prefix: str, stats: Callable[[], dict]) -> None:
+        """stats() の数値（入れ子の dict は "_" でつなぐ、真偽値は 0/1）を gauge として出力する"""
+        self._stats.append((prefix, stats))
+
+    def summary_snapshot(self, name: str) -> Dict[LabelKey, Dict[str, float]]:
+        """summary の現在の値（分位点・件数・合計）を返す"""
+        with self._lock:
+            series = dict(self._summaries.get(name, {}))
+        return {
+            key: {**{f"p{int(q * 100)}": v for q, v in s.quantiles().items()}, "count": s.count, "sum": s.sum}
+            for key, s in series.items()
+        }
+
+    def clear(self) -> None:
+        """記録した値をすべて破棄する（登録した stats は残す）"""
+        with self._lock:
+            self._summaries.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """Prometheus のテキスト形式（text/plain; version=0.0.4）で出力する"""
+        lines: List[str] = []
+        with self._lock:
+            summaries = {name: dict(series) for name, series in self._summaries.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            help_texts = dict(self._help)
+
+        for name, series in sorted(summaries.items()):
+            full = METRIC_PREFIX + name
+            lines.append(f"# HELP {full} {help_texts[name][1]}")
+            lines.append(f"# TYPE {full} summary")
+            for key, summary in sorted(series.items()):
+                for q, value in summary.quantiles().items():
+                    lines.append(f"{full}{_format_labels(key, ('quantile', str(q)))} {_format_value(value)}")
+                lines.append(f"{full}_sum{_format_labels(key)} {_format_value(summary.sum)}")
+                lines.append(f"{full}_count{_format_labels(key)} {summary.count}")
+
+        for name, series in sorted(counters.items()):
+            full = METRIC_PREFIX + name
+            lines.append(f"# HELP {full} {help_texts[name][1]}")
+            lines.append(f"# TYPE {full} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{full}{_format_labels(key)} {_format_value(value)}")
+
+        for prefix, stats in self._stats:
+            try:
+                values = _flatten_stats(stats())
+            except Exception as e:
+                print(f"警告: {prefix} の統計情報を取得できませんでした: {e}")
+                continue
+            for key, value in values:
+                full = f"{METRIC_PREFIX}{prefix}_{key}"
+                lines.append(f"# TYPE {full} gauge")
+                lines.append(f"{full} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _flatten_stats(stats: dict, prefix: str = "") -> List[Tuple[str, float]]:
+    """stats() の dict から数値だけを取り出す（文字列・None は出力しない）"""
+    values: List[Tuple[str, float]] = []
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.extend(_flatten_stats(value, name + "_"))
+        elif isinstance(value, bool):
+            values.append((name, 1.0 if value else 0.0))
+        elif isinstance(value, (int, float)):
+            values.append((name, float(value)))
+    return values
+
+
+# プロセス全体で共有するメトリクス
+metrics = MetricsRegistry()
+
+# リクエストごとの処理段階の所要時間（ServerTimingMiddleware が設定する）
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def record_stage(operation: str, stage: str, seconds: float) -> None:
+    """
+    処理段階の所要時間を記録する（集計と、リクエスト中であれば Server-Timing ヘッダー）
+
+    Args:
+        operation: 処理の種類（question_generation、diagnosis など）
+        stage: 処理段階（prompt、llm、parse など）
+        seconds: 所要時間（秒）
+    """
+    metrics.observe(
+        "stage_duration_seconds",
+        seconds,
+        help="処理段階ごとの所要時間（秒）",
+        operation=operation,
+        stage=stage,
+    )
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage(operation: str, name: str) -> Iterator[None]:
+    """囲んだ処理の所要時間を処理段階として記録する"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(operation, name, time.perf_counter() - started)
+
+
+_llm_timing_handler = None
+
+
+def _llm_timing_handler_class():
+    """LLM の開始・終了時刻を記録する LangChain のコールバック（langchain_core は初回に読み込む）"""
+    global _llm_timing_handler
+    if _llm_timing_handler is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class LLMTimingHandler(BaseCallbackHandler):
+            run_inline = True
+
+            def __init__(self):
+                self.llm_started: Optional[float] = None
+                self.llm_ended: Optional[float] = None
+
+            def on_chat_model_start(self, *args, **kwargs):
+                if self.llm_started is None:
+                    self.llm_started = time.perf_counter()
+
+            def on_llm_start(self, *args, **kwargs):
+                self.on_chat_model_start()
+
+            def on_llm_end(self, *args, **kwargs):
+                self.llm_ended = time.perf_counter()
+
+        _llm_timing_handler = LLMTimingHandler
+    return _llm_timing_handler
+
+
+async def timed_ainvoke(chain, variables: dict, operation: str):
+    """
+    チェーンを ainvoke し、所要時間を prompt（プロンプトの組み立て）・llm（Gemini の呼び出し）・
+    parse（構造化出力のパース）に分けて記録する
+
+    失敗した場合や結果が None の場合は、その試行の所要時間を retry として記録する
+    （呼び出し側がリトライしたかどうかにかかわらず、結果に使われなかった時間）。
+    コールバックに対応していないチェーンの場合は、全体を llm として記録する。
+    """
+    handler = _llm_timing_handler_class()()
+    started = time.perf_counter()
+    try:
+        result = await chain.ainvoke(variables, config={"callbacks": [handler]})
+    except BaseException:
+        record_stage(operation, "retry", time.perf_counter() - started)
+        raise
+    ended = time.perf_counter()
+
+    if result is None:
+        record_stage(operation, "retry", ended - started)
+    elif handler.llm_started is not None and handler.llm_ended is not None:
+        record_stage(operation, "prompt", handler.llm_started - started)
+        record_stage(operation, "llm", handler.llm_ended - handler.llm_started)
+        record_stage(operation, "parse", ended - handler.llm_ended)
+    else:
+        record_stage(operation, "llm", ended - started)
+    return result
+
+
+class ServerTimingMiddleware:
+    """
+    リクエストごとの処理段階の所要時間を Server-Timing ヘッダーで返す ASGI ミドルウェア
+
+    エンドポイントが記録した段階（record_stage / stage）と total を `llm;dur=812.3` の形式で返し、
+    リクエスト全体の所要時間をルート・ステータスごとに集計する。
+    Server-Sent Events はヘッダーの送信時点で処理が終わっていないため、ヘッダーは付けない。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                is_stream = any(
+                    k.lower() == b"content-type" and v.startswith(b"text/event-stream") for k, v in headers
+                )
+                if not is_stream:
+                    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+                    entries.append(f"total;dur={(time.perf_counter() - started) * 1000:.1f}")
+                    headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            metrics.observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - started,
+                help="リクエストの処理時間（秒）",
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
@@ -0,0 +1,225 @@
+"""選手マッチング - 診断スコアと選手のスコアベクトルの近傍探索"""
+
+import hashlib
+import heapq
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models.diagnosis import NEN_TYPES
+from models.matching import Player, PlayerMatch
+from services.env import env_str
+from services.serialization import load_json_file
+
+MATCH_METRICS = ("cosine", "l1")
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# PLAYERS_DIAGNOSIS_PATH が未設定の場合に探すパス（Lambda パッケージ、ローカル開発の順）
+DEFAULT_PLAYERS_DIAGNOSIS_PATHS = (
+    os.path.join(API_DIR, "data", "players-diagnosis.json"),
+    os.path.join(os.path.dirname(API_DIR), "script", "player-diagnosis", "players-diagnosis.json"),
+)
+
+# 浮動小数点の誤差で順位が入れ替わらないよう、距離はこの桁数で丸めて比較する
+DISTANCE_DIGITS = 9
+
+
+@dataclass(frozen=True)
+class PlayerEntry:
+    """インデックスに登録した選手（スコアベクトルは事前に正規化しておく）"""
+
+    id: str
+    name: str
+    position: str
+    primary: str
+    scores: Tuple[int, ...]
+    comment: str
+    unit: Tuple[float, ...]
+
+
+def _unit_vector(values: Sequence[float]) -> Tuple[float, ...]:
+    """L2 ノルムで正規化したベクトルを返す（ゼロベクトルはそのまま）"""
+    norm = math.sqrt(sum(v * v for v in values))
+    if norm == 0:
+        return tuple(0.0 for _ in values)
+    return tuple(v / norm for v in values)
+
+
+def parse_vector(text: str, name: str) -> List[float]:
+    """
+    カンマ区切りの6つの数値を解析する
+
+    Args:
+        text: "80,100,80,40,60,100" の形式の文字列
+        name: エラーメッセージ用のパラメータ名
+
+    Returns:
+        List[float]: 6つの数値
+
+    Raises:
+        ValueError: 数値でない、または6つでない場合
+    """
+    try:
+        values = [float(v) for v in text.split(",")]
+    except ValueError:
+        raise ValueError(f"{name} はカンマ区切りの数値で指定してください: {text}")
+    if len(values) != len(NEN_TYPES):
+        raise ValueError(f"{name} は{len(NEN_TYPES)}個の数値で指定してください（{len(values)}個）")
+    if any(not math.isfinite(v) or v < 0 for v in values):
+        raise ValueError(f"{name} は0以上の数値で指定してください: {text}")
+    return values
+
+
+class PlayerIndex:
+    """
+    選手のスコアベクトルのインメモリインデックス
+
+    起動時に players-diagnosis.json から1回だけ構築し、ポジションごとの選手リストと
+    正規化済みベクトルを保持する。選手数は数十人なので全件走査で十分に速い。
+    """
+
+    def __init__(self, entries: Optional[List[PlayerEntry]] = None, source: Optional[str] = None):
+        self.entries: List[PlayerEntry] = []
+        self.by_position: Dict[str, List[PlayerEntry]] = {}
+        self.source = source
+        self._version: Optional[str] = None
+        for entry in entries or []:
+            self.add(entry)
+
+    @property
+    def loaded(self) -> bool:
+        """選手が1人以上登録されているかどうか"""
+        return bool(self.entries)
+
+    def add(self, entry: PlayerEntry) -> None:
+        """選手を登録する"""
+        self.entries.append(entry)
+        self.by_position.setdefault(entry.position, []).append(entry)
+        self._version = None
+
+    @property
+    def version(self) -> str:
+        """登録した選手の内容のハッシュ（ETag 用。選手データが変わると変わる）"""
+        if self._version is None:
+            digest = hashlib.sha256()
+            for e in self.entries:
+                digest.update(repr((e.id, e.name, e.position, e.primary, e.scores, e.comment)).encode("utf-8"))
+            self._version = digest.hexdigest()
+        return self._version
+
+    def players(self) -> List[Player]:
+        """登録した選手の一覧を返す"""
+        return [
+            Player(id=e.id, name=e.name, position=e.position, primary=e.primary, scores=list(e.scores), comment=e.comment)
+            for e in self.entries
+        ]
+
+    @classmethod
+    def from_records(cls, records: List[dict], source: Optional[str] = None) -> "PlayerIndex":
+        """
+        診断結果のリスト（players-diagnosis.json の内容）からインデックスを作成する
+
+        スコアが6つ揃っていない選手は登録しない。
+        """
+        entries = []
+        for record in records:
+            scores = record.get("scores") or []
+            if len(scores) != len(NEN_TYPES):
+                print(f"警告: 選手 {record.get('id')} のスコアが不正なためスキップします")
+                continue
+            entries.append(
+                PlayerEntry(
+                    id=str(record.get("id")),
+                    name=record.get("name", ""),
+                    position=record.get("position", ""),
+                    primary=record.get("primary", ""),
+                    scores=tuple(int(s) for s in scores),
+                    comment=record.get("comment", ""),
+                    unit=_unit_vector(scores),
+                )
+            )
+        return cls(entries, source=source)
+
+    @classmethod
+    def load(cls, path: str) -> "PlayerIndex":
+        """JSON ファイルからインデックスを作成する"""
+        return cls.from_records(load_json_file(path), source=path)
+
+    def search(
+        self,
+        scores: Sequence[float],
+        k: int = 3,
+        metric: str = "cosine",
+        positions: Optional[Sequence[str]] = None,
+        weights: Optional[Sequence[float]] = None,
+    ) -> List[PlayerMatch]:
+        """
+        診断スコアに近い選手を上位 k 人まで返す
+
+        距離が同じ選手は選手IDの昇順で並べる（結果は常に同じになる）。
+
+        Args:
+            scores: 診断の6系統スコア
+            k: 返す人数
+            metric: "cosine"（1 - コサイン類似度）または "l1"（重み付きマンハッタン距離）
+            positions: 対象とするポジション（未指定の場合は全選手）
+            weights: l1 の系統ごとの重み（未指定の場合はすべて 1）
+
+        Returns:
+            List[PlayerMatch]: 距離が近い順の選手リスト
+
+        Raises:
+            ValueError: 不明な距離の種類の場合
+        """
+        if metric not in MATCH_METRICS:
+            raise ValueError(f"metric は {' / '.join(MATCH_METRICS)} のいずれかを指定してください: {metric}")
+
+        if positions:
+            candidates = [e for p in dict.fromkeys(positions) for e in self.by_position.get(p, [])]
+        else:
+            candidates = self.entries
+
+        if metric == "cosine":
+            query = _unit_vector(scores)
+
+            def distance(entry: PlayerEntry) -> float:
+                return 1.0 - sum(q * u for q, u in zip(query, entry.unit))
+        else:
+            w = weights or [1.0] * len(NEN_TYPES)
+
+            def distance(entry: PlayerEntry) -> float:
+                return sum(wi * abs(q - s) for wi, q, s in zip(w, scores, entry.scores))
+
+        scored = ((round(distance(e), DISTANCE_DIGITS), e.id, e) for e in candidates)
+        nearest = heapq.nsmallest(k, scored, key=lambda item: (item[0], item[1]))
+        return [
+            PlayerMatch(
+                id=e.id,
+                name=e.name,
+                position=e.position,
+                primary=e.primary,
+                scores=list(e.scores),
+                comment=e.comment,
+                distance=d,
+            )
+            for d, _, e in nearest
+        ]
+
+
+def load_player_index_from_env() -> PlayerIndex:
+    """
+    環境変数 PLAYERS_DIAGNOSIS_PATH（未設定の場合はデフォルトのパス）からインデックスを作成する
+
+    ファイルが見つからない場合は空のインデックスを返す（マッチングは利用できない）。
+    """
+    configured = env_str("PLAYERS_DIAGNOSIS_PATH", "")
+    paths = (configured,) if configured else DEFAULT_PLAYERS_DIAGNOSIS_PATHS
+    for path in paths:
+        if os.path.exists(path):
+            index = PlayerIndex.load(path)
+            print(f"選手インデックスを構築しました: {len(index.entries)}人 ({path})")
+            return index
+    print(f"警告: 選手の診断結果が見つかりません（{', '.join(paths)}）。マッチングは利用できません")
+    return PlayerIndex()
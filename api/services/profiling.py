@@ -0,0 +1,111 @@
+"""コールドスタートのプロファイラ - モジュールごとの読み込み時間と初期化フェーズの所要時間を計測する"""
+
+import builtins
+import importlib.util
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from services.env import env_bool
+
+
+class ColdStartProfiler:
+    """
+    Lambda の初期化（コールドスタート）の内訳を計測する
+
+    install() 以降の import 文をフックして、新しく読み込まれたモジュールごとに
+    累積時間（依存モジュールを含む）と自身の時間を記録する。phase() で囲んだ
+    初期化処理の所要時間も記録し、finish() でまとめて出力する。
+    無効の場合はフックを入れず、phase() も計測するだけで何も出力しない。
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started_at = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.imports: Dict[str, Tuple[float, float]] = {}  # モジュール名 -> (累積時間, 自身の時間)
+        self._stack: List[float] = []
+        self._original_import = None
+
+    def install(self) -> None:
+        """import のフックを有効にする（無効の場合は何もしない）"""
+        if not self.enabled or self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self) -> None:
+        """import のフックを外す"""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        key = name
+        if level:
+            try:
+                key = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__"))
+            except (ImportError, ValueError):
+                pass
+        if not key or key in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        started = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            if key in sys.modules and key not in self.imports:
+                self.imports[key] = (elapsed, elapsed - children)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """囲んだ処理の所要時間を初期化フェーズとして記録する"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases.append((name, elapsed))
+            if self.enabled:
+                print(f"[cold-start] {name}: {elapsed * 1000:.1f}ms")
+
+    def module_costs(self, top: Optional[int] = None) -> List[dict]:
+        """自身の読み込み時間が長い順のモジュール一覧を返す"""
+        costs = [
+            {"module": name, "self_ms": self_time * 1000, "cumulative_ms": cumulative * 1000}
+            for name, (cumulative, self_time) in self.imports.items()
+        ]
+        costs.sort(key=lambda c: c["self_ms"], reverse=True)
+        return costs[:top] if top is not None else costs
+
+    def report(self, top: int = 15) -> dict:
+        """計測結果（経過時間・フェーズ・モジュール）を返す"""
+        return {
+            "elapsed_ms": (time.perf_counter() - self.started_at) * 1000,
+            "phases": [{"phase": name, "ms": seconds * 1000} for name, seconds in self.phases],
+            "modules": self.module_costs(top),
+        }
+
+    def finish(self, top: int = 15) -> None:
+        """import のフックを外し、有効な場合は計測結果を出力する"""
+        self.uninstall()
+        if not self.enabled:
+            return
+        report = self.report(top)
+        print(f"[cold-start] 初期化完了: {report['elapsed_ms']:.1f}ms（モジュール {len(self.imports)} 個）")
+        for cost in report["modules"]:
+            print(
+                f"[cold-start]   {cost['self_ms']:8.1f}ms self / {cost['cumulative_ms']:8.1f}ms cumulative"
+                f"  {cost['module']}"
+            )
+
+
+# プロセス全体で共有するプロファイラ（COLD_START_PROFILE=1 で有効）
+cold_start_profiler = ColdStartProfiler(enabled=env_bool("COLD_START_PROFILE", False))
@@ -1,19 +1,59 @@
 """質問生成サービス"""
 
-import os
-import random
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import time
+from typing import AsyncIterator, Union
 
-from models.question import QuestionSet
-from prompts.question_generation import get_question_generation_prompt
+from models.question import Question, QuestionSet
+from prompts.question_generation import (
+    get_question_generation_prompt,
+    get_question_generation_variables,
+)
+from services.choice_tags import choice_tag_index
+from services.deadline import aiter_within_deadline
+from services.fallback import fallback_questions
+from services.hedging import llm_hedger
+from services.llm_registry import DEFAULT_MODEL, llm_registry
+from services.metrics import record_stage, stage, timed_ainvoke
+from services.retry import EmptyOutputError, llm_retry_policy
 
-# 環境変数をロード（ローカル開発時のみ）
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    # Lambda環境では dotenv は不要
-    pass
+# 創造的で多様な質問生成のため temperature は高めに設定
+QUESTION_TEMPERATURE = 0.9
+
+
+def get_question_chain():
+    """
+    質問生成用のチェーン（プロンプト | 構造化出力LLM）を取得する
+
+    チェーンはレジストリで一度だけ構築され、以降の呼び出しでは使い回される。
+
+    Raises:
+        ValueError: GOOGLE_API_KEY が設定されていない場合
+    """
+    return llm_registry.get_chain(
+        "question_generation",
+        get_question_generation_prompt,
+        QuestionSet,
+        model=DEFAULT_MODEL,
+        temperature=QUESTION_TEMPERATURE,
+    )
+
+
+def get_question_streaming_chain():
+    """
+    質問生成用のストリーミングチェーン（生成途中の dict を逐次返す）を取得する
+
+    Raises:
+        ValueError: GOOGLE_API_KEY が設定されていない場合
+    """
+    return llm_registry.get_chain(
+        "question_generation",
+        get_question_generation_prompt,
+        QuestionSet,
+        model=DEFAULT_MODEL,
+        temperature=QUESTION_TEMPERATURE,
+        streaming=True,
+    )
 
 
 def generate_questions(seed: int = None) -> QuestionSet:
@@ -30,62 +70,144 @@ def generate_questions(seed: int = None) -> QuestionSet:
         ValueError: GOOGLE_API_KEY が設定されていない場合
         Exception: LLM呼び出しに失敗した場合
     """
-    # API キーの確認
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError(
-            "GOOGLE_API_KEY が設定されていません。"
-            ".env ファイルを作成して API キーを設定してください。"
+    # 構築済みのチェーンを取得（API キー未設定の場合は ValueError）
+    chain = get_question_chain()
+
+    # プロンプト変数を作成（シードを渡して毎回異なるテーマを選択）
+    variables = get_question_generation_variables(seed=seed)
+
+    def attempt() -> QuestionSet:
+        question_set = chain.invoke(variables)
+        if question_set is None:
+            raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+        return question_set
+
+    # 質問セットを生成（リトライポリシーに従ってリトライ）
+    try:
+        question_set = llm_retry_policy.run("question_generation", attempt)
+    except Exception as e:
+        raise Exception(f"質問生成に失敗しました（{e.retry_attempts}回試行）: {str(e)}") from e
+
+    # 選択肢のタグは診断時のローカル採点用に登録し、障害時の代替用に保持しておく
+    choice_tag_index.register(question_set)
+    fallback_questions.remember(question_set)
+    return question_set
+
+
+async def agenerate_questions(seed: int = None) -> QuestionSet:
+    """
+    generate_questions の非同期版（イベントループをブロックせずに LLM を呼び出す）
+
+    LLM 呼び出しはモデルごとのセマフォで同時実行数が制限される。
+    LLM_HEDGING が有効な場合、応答が遅い呼び出しは同じ呼び出しをもう1つ並行して実行する（services.hedging）。
+
+    Args:
+        seed: ランダムシード（指定すると毎回異なる質問を生成）
+
+    Returns:
+        QuestionSet: 10個の質問を含む質問セット
+
+    Raises:
+        ValueError: GOOGLE_API_KEY が設定されていない場合
+        Exception: LLM呼び出しに失敗した場合
+    """
+    # 構築済みのチェーンを取得（API キー未設定の場合は ValueError）
+    chain = get_question_chain()
+
+    # プロンプト変数を作成（シードを渡して毎回異なるテーマを選択）
+    with stage("question_generation", "input"):
+        variables = get_question_generation_variables(seed=seed)
+    semaphore = llm_registry.semaphore(DEFAULT_MODEL)
+
+    async def attempt() -> QuestionSet:
+        queued = time.perf_counter()
+        async with semaphore:
+            record_stage("question_generation", "queue", time.perf_counter() - queued)
+            question_set = await timed_ainvoke(chain, variables, "question_generation")
+        if question_set is None:
+            raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+        return question_set
+
+    # 質問セットを生成（リトライポリシーに従ってリトライし、応答が遅い試行はヘッジする）
+    try:
+        question_set = await llm_retry_policy.arun(
+            "question_generation", lambda: llm_hedger.run("question_generation", attempt)
         )
+    except Exception as e:
+        raise Exception(f"質問生成に失敗しました（{e.retry_attempts}回試行）: {str(e)}") from e
 
-    # シードが指定されていない場合はランダムに生成
-    if seed is None:
-        seed = random.randint(1, 1000000)
+    # 選択肢のタグは診断時のローカル採点用に登録し、障害時の代替用に保持しておく
+    with stage("question_generation", "postprocess"):
+        choice_tag_index.register(question_set)
+        fallback_questions.remember(question_set)
+    return question_set
 
-    # LLM の初期化（temperatureを高めに設定して多様性を確保）
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        temperature=0.9,  # 創造的で多様な質問生成のため高めに設定
-        google_api_key=api_key,
-    )
 
-    # 構造化出力を使用
-    structured_llm = llm.with_structured_output(QuestionSet)
+async def astream_questions(seed: int = None) -> AsyncIterator[Union[Question, QuestionSet]]:
+    """
+    質問を生成しながら、確定した Question を1つずつ返す非同期ジェネレーター
 
-    # プロンプトを取得（シードを渡して毎回異なるテーマを選択）
-    prompt = get_question_generation_prompt(seed=seed)
+    LLM の出力（部分的な JSON）を逐次パースし、次の質問の生成が始まった時点で
+    1つ前の質問を確定とみなして検証し、Question として返す。最後に完全な QuestionSet を返す。
+    最初の質問を返す前に失敗した場合のみリトライする（返した後の失敗はそのまま送出する）。
 
-    # チェーンを構築
-    chain = prompt | structured_llm
+    Args:
+        seed: ランダムシード（指定すると毎回異なる質問を生成）
+
+    Yields:
+        Question: 確定した質問（先頭から順に）
+        QuestionSet: 最後に1回、10個の質問を含む完全な質問セット
+
+    Raises:
+        ValueError: GOOGLE_API_KEY が設定されていない場合
+        Exception: LLM呼び出しまたは検証に失敗した場合
+    """
+    # 構築済みのチェーンを取得（API キー未設定の場合は ValueError）
+    chain = get_question_streaming_chain()
+
+    # プロンプト変数を作成（シードを渡して毎回異なるテーマを選択）
+    variables = get_question_generation_variables(seed=seed)
+    semaphore = llm_registry.semaphore(DEFAULT_MODEL)
 
-    # 質問セットを生成（リトライ機能付き）
-    max_retries = 3
-    last_error = None
-    
-    for attempt in range(max_retries):
+    emitted = 0
+    attempt = 0
+    llm_retry_policy.record_request()
+
+    while True:
         try:
-            question_set = chain.invoke({})
-            
-            # Noneが返ってきた場合はリトライ
-            if question_set is None:
-                last_error = Exception(f"LLMが構造化出力の生成に失敗しました（試行 {attempt + 1}/{max_retries}）")
-                if attempt < max_retries - 1:
-                    print(f"警告: {last_error}. リトライします...")
-                    continue
-                else:
-                    raise last_error
-            
-            # 正常な結果が返ってきた場合
-            return question_set
-            
-        except Exception as e:
-            last_error = e
-            if attempt < max_retries - 1:
-                print(f"エラーが発生しました（試行 {attempt + 1}/{max_retries}）: {e}. リトライします...")
-                continue
-            else:
-                raise Exception(f"質問生成に失敗しました（{max_retries}回試行）: {str(e)}") from e
-    
-    # ここには到達しないはずだが、念のため
-    raise Exception(f"質問生成に失敗しました: {last_error}")
+            latest = None
+            llm_retry_policy.start_attempt("question_generation")
+            async with semaphore:
+                async for partial in aiter_within_deadline("question_generation", chain.astream(variables)):
+                    latest = partial
+                    questions = partial.get("questions") if isinstance(partial, dict) else None
+                    if not questions:
+                        continue
+
+                    # 末尾の質問はまだ生成途中の可能性があるため、それより前の質問だけを確定させる
+                    while emitted < len(questions) - 1:
+                        yield Question.model_validate(questions[emitted])
+                        emitted += 1
 
+            if latest is None:
+                raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+
+            # 生成完了後に全体を検証し、残りの質問と完全な質問セットを返す
+            question_set = QuestionSet.model_validate(latest)
+            llm_retry_policy.record_outcome()
+            choice_tag_index.register(question_set)
+            fallback_questions.remember(question_set)
+            for question in question_set.questions[emitted:]:
+                yield question
+            yield question_set
+            return
+
+        except Exception as e:
+            llm_retry_policy.record_outcome(e)
+            # 質問を返した後はリトライしない（同じ質問を重複して返さないため）
+            delay = None if emitted else llm_retry_policy.retry_delay("question_generation", e, attempt)
+            if delay is None:
+                raise Exception(f"質問生成に失敗しました（{attempt + 1}回試行）: {str(e)}") from e
+            print(f"エラーが発生しました（試行 {attempt + 1}）: {e}. {delay:.1f}秒後にリトライします...")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,208 @@
+"""質問セットプール - 生成済みの QuestionSet を保持し、バックグラウンドで補充する"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+from models.question import QuestionSet
+from services.env import env_float, env_int
+from services.question_generator import agenerate_questions
+
+
+@dataclass
+class PoolConfig:
+    """質問セットプールの設定"""
+
+    size: int = 0  # 目標とするプールの深さ（0 の場合はプール無効）
+    low_water: int = 0  # この数以下になったら補充を開始する
+    refill_concurrency: int = 2  # 補充時に同時に実行する生成数
+    max_age_seconds: float = 3600.0  # これより古い質問セットは破棄する
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        """
+        環境変数から設定を読み込む
+
+        - QUESTION_POOL_SIZE: プールの深さ（デフォルト 0 = 無効）
+        - QUESTION_POOL_LOW_WATER: 補充開始のしきい値（デフォルト size の半分）
+        - QUESTION_POOL_REFILL_CONCURRENCY: 補充の同時実行数（デフォルト 2）
+        - QUESTION_POOL_MAX_AGE_SECONDS: 質問セットの最大保持時間（デフォルト 3600 秒）
+        """
+        size = max(0, env_int("QUESTION_POOL_SIZE", 0))
+        low_water = env_int("QUESTION_POOL_LOW_WATER", size // 2)
+        return cls(
+            size=size,
+            low_water=min(max(0, low_water), max(0, size - 1)),
+            refill_concurrency=max(1, env_int("QUESTION_POOL_REFILL_CONCURRENCY", 2)),
+            max_age_seconds=max(0.0, env_float("QUESTION_POOL_MAX_AGE_SECONDS", 3600.0)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """プールが有効かどうか"""
+        return self.size > 0
+
+
+class QuestionPool:
+    """
+    生成済みの質問セットを保持するインプロセスのプール
+
+    get() はプールから質問セットを即座に取り出し、残量が low_water 以下になると
+    バックグラウンドで size まで補充する。プールが空の場合のみ LLM を直接呼び出す。
+    """
+
+    def __init__(
+        self,
+        config: PoolConfig,
+        generator: Callable[[], Awaitable[QuestionSet]] = agenerate_questions,
+    ):
+        self.config = config
+        self._generator = generator
+        self._items: Deque[Tuple[float, QuestionSet]] = deque()
+        self._refill_task: Optional[asyncio.Task] = None
+
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.refilled = 0
+        self.refill_failures = 0
+        self._refill_latency_total = 0.0
+        self._refill_latency_max = 0.0
+        self._refill_latency_last = 0.0
+
+    @property
+    def depth(self) -> int:
+        """現在プールにある質問セットの数"""
+        return len(self._items)
+
+    @property
+    def refilling(self) -> bool:
+        """補充処理が実行中かどうか"""
+        return self._refill_task is not None and not self._refill_task.done()
+
+    def start(self) -> None:
+        """プールの初回充填を開始する（イベントループ上で呼び出すこと）"""
+        if self.config.enabled:
+            self._schedule_refill()
+
+    async def stop(self) -> None:
+        """実行中の補充処理を停止する"""
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        self._refill_task = None
+
+    async def get(self) -> QuestionSet:
+        """
+        プールから質問セットを1つ取り出す
+
+        プールが空の場合は LLM を直接呼び出して生成する。
+
+        Returns:
+            QuestionSet: 10個の質問を含む質問セット
+
+        Raises:
+            ValueError: GOOGLE_API_KEY が設定されていない場合
+            Exception: LLM呼び出しに失敗した場合
+        """
+        self._evict_expired()
+
+        if self._items:
+            _, question_set = self._items.popleft()
+            self.hits += 1
+            self._maybe_refill()
+            return question_set
+
+        self.misses += 1
+        self._maybe_refill()
+        return await self._generator()
+
+    def _evict_expired(self) -> None:
+        """最大保持時間を過ぎた質問セットを破棄する"""
+        if self.config.max_age_seconds <= 0:
+            return
+        now = time.monotonic()
+        while self._items and now - self._items[0][0] > self.config.max_age_seconds:
+            self._items.popleft()
+            self.expired += 1
+
+    def _maybe_refill(self) -> None:
+        """残量が low_water 以下なら補充を開始する"""
+        if self.depth <= self.config.low_water:
+            self._schedule_refill()
+
+    def _schedule_refill(self) -> None:
+        """補充タスクを起動する（既に実行中なら何もしない）"""
+        if self.refilling:
+            return
+        # リクエストの期限・処理時間の記録を引き継がないよう、空のコンテキストで実行する
+        self._refill_task = asyncio.get_running_loop().create_task(
+            self._refill(), context=contextvars.Context()
+        )
+
+    async def _refill(self) -> None:
+        """プールが目標の深さに達するまで質問セットを生成する"""
+        while self.depth < self.config.size:
+            batch = min(self.config.refill_concurrency, self.config.size - self.depth)
+            results = await asyncio.gather(
+                *(self._generate_one() for _ in range(batch)),
+                return_exceptions=True,
+            )
+
+            succeeded = 0
+            for result in results:
+                if isinstance(result, QuestionSet):
+                    self._items.append((time.monotonic(), result))
+                    succeeded += 1
+                elif isinstance(result, asyncio.CancelledError):
+                    raise result
+                else:
+                    self.refill_failures += 1
+                    print(f"警告: 質問セットの補充に失敗しました: {result}")
+
+            # 1件も成功しなかった場合は LLM 側の障害とみなし、次の get() まで補充を止める
+            if succeeded == 0:
+                return
+
+    async def _generate_one(self) -> QuestionSet:
+        """質問セットを1つ生成し、所要時間を記録する"""
+        started = time.perf_counter()
+        question_set = await self._generator()
+        elapsed = time.perf_counter() - started
+
+        self.refilled += 1
+        self._refill_latency_total += elapsed
+        self._refill_latency_last = elapsed
+        self._refill_latency_max = max(self._refill_latency_max, elapsed)
+        return question_set
+
+    def stats(self) -> dict:
+        """プールの統計情報を返す"""
+        requests = self.hits + self.misses
+        return {
+            "enabled": self.config.enabled,
+            "depth": self.depth,
+            "target_depth": self.config.size,
+            "low_water": self.config.low_water,
+            "refill_concurrency": self.config.refill_concurrency,
+            "max_age_seconds": self.config.max_age_seconds,
+            "refilling": self.refilling,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "expired": self.expired,
+            "refilled": self.refilled,
+            "refill_failures": self.refill_failures,
+            "refill_latency_seconds": {
+                "last": self._refill_latency_last,
+                "avg": self._refill_latency_total / self.refilled if self.refilled else 0.0,
+                "max": self._refill_latency_max,
+            },
+        }
@@ -0,0 +1,128 @@
+"""質問セットのセッション - 配信した質問セットを ID で保持し、診断時に回答のインデックスだけで引き当てる"""
+
+import hashlib
+import json
+from typing import List, Optional
+
+from models.diagnosis import QuestionAnswer
+from models.question import QuestionSet
+from services.env import env_float, env_int, env_str
+from services.ttl_store import TTLStore, create_ttl_store
+
+# 質問セット ID の長さ（SHA-256 の16進数の先頭 128 ビット）
+SET_ID_LENGTH = 32
+
+
+def question_set_id(question_set: QuestionSet) -> str:
+    """
+    質問文と選択肢から、内容に基づく質問セット ID を作成する
+
+    同じ内容の質問セット（プールや代替の質問セットを複数のクライアントに返した場合など）は同じ ID になる。
+    """
+    canonical = [[q.question_text, list(q.choices)] for q in question_set.questions]
+    payload = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:SET_ID_LENGTH]
+
+
+def _serialize(question_set: QuestionSet) -> str:
+    """選択肢のタグ（レスポンスからは除外される）も含めて JSON にする"""
+    return json.dumps(
+        {
+            "questions": [
+                {"question_text": q.question_text, "choices": list(q.choices), "choice_types": q.choice_types}
+                for q in question_set.questions
+            ]
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+class QuestionSetStore:
+    """
+    配信した質問セットを保持するストア（バックエンドは TTLStore）
+
+    クライアントは診断時に質問セット ID と選択肢のインデックスだけを送ればよく、
+    質問文・選択肢の改ざんも防げる。選択肢のタグも保持するため、ローカル採点にも使える。
+    """
+
+    def __init__(self, store: Optional[TTLStore]):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @property
+    def enabled(self) -> bool:
+        """ストアが有効かどうか"""
+        return self.store is not None
+
+    def save(self, question_set: QuestionSet) -> Optional[str]:
+        """
+        質問セットを保存する
+
+        Returns:
+            Optional[str]: 質問セット ID（ストアが無効な場合は None）
+        """
+        if self.store is None:
+            return None
+        set_id = question_set_id(question_set)
+        self.store.set(set_id, _serialize(question_set))
+        self.stores += 1
+        return set_id
+
+    def get(self, set_id: str) -> Optional[QuestionSet]:
+        """質問セットを取得する（存在しない・期限切れの場合は None）"""
+        if self.store is None:
+            return None
+        value = self.store.get(set_id)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return QuestionSet.model_validate_json(value)
+
+    def stats(self) -> dict:
+        """ストアの統計情報を返す"""
+        return {
+            "enabled": self.enabled,
+            "backend": self.store.backend if self.store is not None else "none",
+            "entries": len(self.store) if self.store is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+        }
+
+
+def to_question_answers(question_set: QuestionSet, answers: List[int]) -> List[QuestionAnswer]:
+    """
+    質問セットと選択肢のインデックスから質問と回答のペアを作成する
+
+    Raises:
+        ValueError: 回答の数が質問の数と一致しない場合
+    """
+    if len(answers) != len(question_set.questions):
+        raise ValueError(f"回答の数（{len(answers)}）が質問の数（{len(question_set.questions)}）と一致しません")
+    return [
+        QuestionAnswer(question=question, selected_choice_index=index)
+        for question, index in zip(question_set.questions, answers)
+    ]
+
+
+def create_question_set_store_from_env() -> QuestionSetStore:
+    """
+    環境変数から質問セットのストアを作成する
+
+    - QUESTION_SET_STORE_BACKEND: memory / sqlite / none（デフォルト memory）
+    - QUESTION_SET_TTL_SECONDS: 保持期間（デフォルト 6 時間）
+    - QUESTION_SET_MAX_ENTRIES: 最大エントリ数（デフォルト 10000）
+    - QUESTION_SET_STORE_PATH: SQLite ファイルのパス（デフォルト /tmp/giravanz-cache.sqlite3）
+    """
+    store = create_ttl_store(
+        backend=env_str("QUESTION_SET_STORE_BACKEND", "memory"),
+        ttl_seconds=max(1.0, env_float("QUESTION_SET_TTL_SECONDS", 6 * 3600.0)),
+        max_entries=max(1, env_int("QUESTION_SET_MAX_ENTRIES", 10000)),
+        path=env_str("QUESTION_SET_STORE_PATH", "/tmp/giravanz-cache.sqlite3"),
+        namespace="question_sets",
+    )
+    return QuestionSetStore(store)
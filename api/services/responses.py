@@ -0,0 +1,39 @@
+"""API のレスポンスクラス - orjson でのレンダリングと、検証済みモデルの高速なレスポンス化"""
+
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from services.serialization import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson でレンダリングする JSONResponse（アプリのデフォルトのレスポンスクラス）"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(model: BaseModel, response: Optional[Response] = None) -> Response:
+    """
+    サービスが返した検証済みの Pydantic モデルをそのままレスポンスにする
+
+    FastAPI は response_model があるとモデルを dict に変換して再検証してから JSON にするが、
+    自前で作成・検証したモデルではこれを省き、dict にして orjson で直接 JSON にする
+    （exclude=True のフィールドはモデルの定義どおり含まれない。model_dump_json より速い）。
+
+    Args:
+        model: レスポンスにするモデル
+        response: エンドポイントに注入された Response（設定したヘッダー・ステータスコードを引き継ぐ）
+    """
+    result = Response(
+        content=dumps(model.model_dump()),
+        status_code=(response.status_code or 200) if response is not None else 200,
+        media_type="application/json",
+    )
+    if response is not None:
+        result.raw_headers.extend(
+            (name, value) for name, value in response.raw_headers if name not in (b"content-length", b"content-type")
+        )
+    return result
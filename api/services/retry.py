@@ -0,0 +1,351 @@
+"""LLM 呼び出しのリトライポリシー - エラーの分類、上限付き指数バックオフ（ジッター付き）、リトライ予算"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, is_circuit_open, llm_circuit_breaker
+from services.deadline import (
+    DeadlineExceeded,
+    check_deadline,
+    is_deadline_exceeded,
+    min_attempt_seconds,
+    remaining,
+    within_deadline,
+)
+from services.env import env_float, env_int
+from services.metrics import metrics
+
+T = TypeVar("T")
+
+# エラーの分類
+RATE_LIMITED = "rate_limited"  # 429 / クォータ超過（長めに待ってリトライ）
+TRANSIENT = "transient"  # 5xx・タイムアウト・接続エラーなど（リトライ）
+INVALID_OUTPUT = "invalid_output"  # 構造化出力が None・検証エラー（リトライ）
+FATAL = "fatal"  # 認証エラー・不正なリクエスト・プログラムの誤り（リトライしない）
+
+_RATE_LIMITED_PATTERN = re.compile(r"\b429\b|RESOURCE_EXHAUSTED|quota|rate limit", re.IGNORECASE)
+_TRANSIENT_PATTERN = re.compile(
+    r"\b(500|502|503|504)\b|UNAVAILABLE|INTERNAL|DEADLINE_EXCEEDED|timed? ?out|overloaded", re.IGNORECASE
+)
+_FATAL_PATTERN = re.compile(
+    r"\b(400|401|403|404)\b|PERMISSION_DENIED|UNAUTHENTICATED|INVALID_ARGUMENT|API key not valid",
+    re.IGNORECASE,
+)
+_RETRY_AFTER_PATTERN = re.compile(r"retry in ([0-9.]+)\s*s|retryDelay['\"]?:\s*['\"]?([0-9.]+)s", re.IGNORECASE)
+
+# 構造化出力の検証・パースの失敗とみなす例外のクラス名（ライブラリを読み込まずに判定する）
+_INVALID_OUTPUT_TYPES = {"ValidationError", "OutputParserException", "JSONDecodeError"}
+
+
+class EmptyOutputError(Exception):
+    """LLM が構造化出力を返さなかった（None が返った）、または出力の値が無効だった"""
+
+
+def _exception_chain(error: BaseException) -> Iterator[BaseException]:
+    """例外と、その原因（__cause__ / __context__）を順に返す"""
+    seen = set()
+    while error is not None and id(error) not in seen and len(seen) < 8:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """HTTP ステータスコードを持つ例外からコードを取り出す"""
+    for value in (
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+    ):
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    return None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    LLM 呼び出しの例外を分類する
+
+    例外の原因（ラップされた元の例外）もたどり、ステータスコード・例外の型・メッセージの順に判定する。
+    判定できない例外は一時的なエラー（TRANSIENT）として扱う。
+
+    Returns:
+        str: RATE_LIMITED / TRANSIENT / INVALID_OUTPUT / FATAL のいずれか
+    """
+    for exc in _exception_chain(error):
+        if isinstance(exc, EmptyOutputError) or type(exc).__name__ in _INVALID_OUTPUT_TYPES:
+            return INVALID_OUTPUT
+        if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+            return TRANSIENT
+        status = _status_code(exc)
+        if status == 429:
+            return RATE_LIMITED
+        if status is not None and (status == 408 or status >= 500):
+            return TRANSIENT
+        if status is not None and 400 <= status < 500:
+            return FATAL
+
+    message = " ".join(str(exc) for exc in _exception_chain(error))
+    if _RATE_LIMITED_PATTERN.search(message):
+        return RATE_LIMITED
+    if _FATAL_PATTERN.search(message):
+        return FATAL
+    if _TRANSIENT_PATTERN.search(message):
+        return TRANSIENT
+    if isinstance(error, (TypeError, AttributeError, NotImplementedError, ValueError)):
+        return FATAL
+    return TRANSIENT
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """エラーメッセージに含まれる待ち時間の指定（"Please retry in 12.3s" など）を返す"""
+    for exc in _exception_chain(error):
+        match = _RETRY_AFTER_PATTERN.search(str(exc))
+        if match:
+            return float(match.group(1) or match.group(2))
+    return None
+
+
+class RetryBudget:
+    """
+    プロセス全体のリトライ予算
+
+    最初の試行ごとに ratio ずつ、さらに時間経過で min_per_second ずつトークンが貯まり（上限 max_tokens）、
+    リトライのたびに1つ消費する。障害時にリトライが呼び出し全体の ratio 程度に抑えられ、
+    Gemini が不調なときに負荷を増幅しない。
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_request(self) -> None:
+        """最初の試行を記録する（予算が ratio だけ増える）"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """リトライ1回分の予算を消費する（足りない場合は False）"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            self.exhausted += 1
+            return False
+
+    def stats(self) -> dict:
+        """予算の残量と、予算不足でリトライしなかった回数を返す"""
+        with self._lock:
+            self._refill()
+            return {"tokens": self._tokens, "max_tokens": self.max_tokens, "exhausted": self.exhausted}
+
+
+class RetryPolicy:
+    """
+    LLM 呼び出しのリトライポリシー
+
+    エラーを分類し、リトライ可能な場合のみ、上限付きの指数バックオフ（equal jitter）で待ってから再試行する。
+    RATE_LIMITED は待ち時間を rate_limit_multiplier 倍にし、エラーに待ち時間の指定があればそれ以上待つ。
+    リクエストの期限（services.deadline）が設定されている場合は、各試行を残り時間でタイムアウトさせ、
+    待ち時間の後に LLM_MIN_ATTEMPT_SECONDS 以上残らない場合はリトライしない。
+    サーキットブレーカーが指定されている場合は、各試行の結果を記録し、開いている間は試行せずに即座に失敗させる。
+    リトライ回数・諦めた回数は metrics に記録する。
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        rate_limit_multiplier: float = 4.0,
+        budget: Optional[RetryBudget] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_multiplier = rate_limit_multiplier
+        self.budget = budget
+        self.breaker = breaker
+
+    def backoff(self, attempt: int, error_class: str = TRANSIENT) -> float:
+        """attempt 回目（0 始まり）の失敗後の待ち時間（上限の半分 + 0〜半分のジッター）"""
+        base = self.base_delay * (self.rate_limit_multiplier if error_class == RATE_LIMITED else 1.0)
+        cap = min(self.max_delay, base * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def record_request(self) -> None:
+        """最初の試行を記録する（リトライ予算に加算する）"""
+        if self.budget is not None:
+            self.budget.record_request()
+
+    def start_attempt(self, operation: str) -> None:
+        """
+        試行を始める前に、リクエストの残り時間とサーキットブレーカーを確認する
+
+        Raises:
+            DeadlineExceeded: 新しい試行を始める時間が残っていない場合
+            CircuitOpenError: サーキットブレーカーが開いている場合
+        """
+        check_deadline(operation)
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError(f"{operation}: Gemini の障害のため LLM の呼び出しを停止しています")
+
+    def record_outcome(self, error: Optional[BaseException] = None) -> None:
+        """
+        試行の結果をサーキットブレーカーに記録する
+
+        RATE_LIMITED・TRANSIENT（LLM のタイムアウトを含む）を失敗、それ以外（LLM が応答した）を成功とする。
+        start_attempt で試行を始めなかった場合は記録しない。
+        """
+        if self.breaker is None:
+            return
+        if isinstance(error, CircuitOpenError) or (isinstance(error, DeadlineExceeded) and error.__cause__ is None):
+            return
+        if error is not None and classify_error(error) in (RATE_LIMITED, TRANSIENT):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def retry_delay(self, operation: str, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        attempt 回目（0 始まり）の試行が error で失敗した後、リトライするまでの待ち時間を返す
+
+        Args:
+            operation: 処理の種類（メトリクスのラベル）
+            error: 発生した例外
+            attempt: 失敗した試行の番号（0 始まり）
+
+        Returns:
+            Optional[float]: 待ち時間（秒）。リトライしない場合は None
+        """
+        error_class = classify_error(error)
+        delay = self.backoff(attempt, error_class)
+        if error_class == RATE_LIMITED:
+            hinted = retry_after_seconds(error)
+            if hinted is not None:
+                delay = max(delay, min(hinted, self.max_delay))
+        left = remaining()
+
+        if is_circuit_open(error):
+            reason = "circuit_open"
+        elif error_class == FATAL:
+            reason = "fatal"
+        elif is_deadline_exceeded(error) or (left is not None and left - delay < min_attempt_seconds()):
+            reason = "deadline"
+        elif attempt + 1 >= self.max_attempts:
+            reason = "exhausted"
+        elif self.budget is not None and not self.budget.try_spend():
+            reason = "budget"
+        else:
+            metrics.inc(
+                "llm_retries_total",
+                help="LLM 呼び出しのリトライ回数",
+                operation=operation,
+                error_class=error_class,
+            )
+            return delay
+
+        metrics.inc(
+            "llm_retry_giveups_total",
+            help="LLM 呼び出しのリトライを諦めた回数（circuit_open / fatal / deadline / exhausted / budget）",
+            operation=operation,
+            error_class=error_class,
+            reason=reason,
+        )
+        return None
+
+    async def arun(self, operation: str, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        call をリトライ付きで実行する
+
+        Raises:
+            Exception: リトライしない（できない）エラーが発生した場合、最後の例外をそのまま送出する
+                （試行回数を retry_attempts 属性に設定する）
+        """
+        self.record_request()
+        attempt = 0
+        while True:
+            try:
+                self.start_attempt(operation)
+                result = await within_deadline(operation, call())
+                self.record_outcome()
+                return result
+            except Exception as e:
+                self.record_outcome(e)
+                delay = self.retry_delay(operation, e, attempt)
+                if delay is None:
+                    e.retry_attempts = attempt + 1
+                    raise
+                print(
+                    f"エラーが発生しました（{operation}, 試行 {attempt + 1}/{self.max_attempts}, "
+                    f"{classify_error(e)}）: {e}. {delay:.1f}秒後にリトライします..."
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def run(self, operation: str, call: Callable[[], T]) -> T:
+        """arun の同期版（待ち時間は time.sleep で待つ。試行のタイムアウトはしない）"""
+        self.record_request()
+        attempt = 0
+        while True:
+            try:
+                self.start_attempt(operation)
+                result = call()
+                self.record_outcome()
+                return result
+            except Exception as e:
+                self.record_outcome(e)
+                delay = self.retry_delay(operation, e, attempt)
+                if delay is None:
+                    e.retry_attempts = attempt + 1
+                    raise
+                print(
+                    f"エラーが発生しました（{operation}, 試行 {attempt + 1}/{self.max_attempts}, "
+                    f"{classify_error(e)}）: {e}. {delay:.1f}秒後にリトライします..."
+                )
+                time.sleep(delay)
+                attempt += 1
+
+
+def create_retry_policy_from_env() -> RetryPolicy:
+    """
+    環境変数から LLM 呼び出しのリトライポリシーを作成する
+
+    - LLM_RETRY_MAX_ATTEMPTS: 最大試行回数（デフォルト 3）
+    - LLM_RETRY_BASE_DELAY: バックオフの基準時間（デフォルト 0.5 秒）
+    - LLM_RETRY_MAX_DELAY: バックオフの上限（デフォルト 8 秒）
+    - LLM_RETRY_BUDGET_RATIO: 最初の試行1回あたりに貯まるリトライ予算（デフォルト 0.2）
+    - LLM_RETRY_BUDGET_MIN_PER_SECOND: 時間経過で貯まるリトライ予算（デフォルト 0.5 回/秒）
+    """
+    return RetryPolicy(
+        max_attempts=max(1, env_int("LLM_RETRY_MAX_ATTEMPTS", 3)),
+        base_delay=max(0.0, env_float("LLM_RETRY_BASE_DELAY", 0.5)),
+        max_delay=max(0.0, env_float("LLM_RETRY_MAX_DELAY", 8.0)),
+        budget=RetryBudget(
+            ratio=max(0.0, env_float("LLM_RETRY_BUDGET_RATIO", 0.2)),
+            min_per_second=max(0.0, env_float("LLM_RETRY_BUDGET_MIN_PER_SECOND", 0.5)),
+            max_tokens=10.0,
+        ),
+        breaker=llm_circuit_breaker,
+    )
+
+
+# プロセス全体で共有するリトライポリシー（リトライ予算も共有する）
+llm_retry_policy = create_retry_policy_from_env()
@@ -0,0 +1,217 @@
+"""シークレットの取得 - 取得元（環境変数 / ローカルファイル / AWS Secrets Manager）と TTL 付きキャッシュ"""
+
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from services.env import env_float, env_str
+
+# Lambda で使用するシークレット名のデフォルト値（terraform の secrets モジュールと同じ）
+DEFAULT_SECRET_NAME = "giravanz-match/dev/google-api-key"
+
+
+class SecretProvider(ABC):
+    """シークレットの取得元の基底クラス"""
+
+    name = "base"
+
+    @abstractmethod
+    def fetch(self) -> Dict[str, str]:
+        """シークレットをすべて取得する（失敗した場合は例外を送出する）"""
+        raise NotImplementedError
+
+
+class EnvSecretProvider(SecretProvider):
+    """環境変数から取得する（ローカル開発・テスト用。.env は llm_registry で読み込み済み）"""
+
+    name = "env"
+
+    def fetch(self) -> Dict[str, str]:
+        return dict(os.environ)
+
+
+class FileSecretProvider(SecretProvider):
+    """
+    JSON ファイルから取得する（Secrets Manager のローカル代替）
+
+    ファイルの形式は Secrets Manager の SecretString と同じ `{"GOOGLE_API_KEY": "..."}`。
+    取得のたびに読み直すので、ファイルを書き換えるとローテーションを再現できる。
+    """
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self) -> Dict[str, str]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+class AwsSecretsManagerProvider(SecretProvider):
+    """AWS Secrets Manager から取得する"""
+
+    name = "aws"
+
+    def __init__(self, secret_id: str, region_name: str):
+        self.secret_id = secret_id
+        self.region_name = region_name
+        self._client = None
+
+    def fetch(self) -> Dict[str, str]:
+        if self._client is None:
+            # boto3 は読み込みに時間がかかるため、最初に取得するときに読み込む
+            import boto3
+
+            self._client = boto3.session.Session().client(
+                service_name="secretsmanager", region_name=self.region_name
+            )
+        response = self._client.get_secret_value(SecretId=self.secret_id)
+        return json.loads(response["SecretString"])
+
+
+class SecretStore:
+    """
+    シークレットの TTL 付きキャッシュ
+
+    最初に get() されたときに取得元から取得する（import 時には取得しない）。
+    取得から ttl_seconds を過ぎると、キャッシュの値を返しつつバックグラウンドで再取得する。
+    さらに max_stale_seconds を過ぎた値は使わず、その場で再取得する。
+    再取得に失敗した場合は、期限内であれば古い値を使い続ける。
+    ttl_seconds が 0 以下の場合はキャッシュせず、毎回取得元から取得する。
+    """
+
+    def __init__(self, provider: SecretProvider, ttl_seconds: float, max_stale_seconds: Optional[float] = None):
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = ttl_seconds if max_stale_seconds is None else max_stale_seconds
+        self._lock = threading.Lock()
+        self._values: Optional[Dict[str, str]] = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self.fetches = 0
+        self.failures = 0
+
+    def _fetch(self) -> Dict[str, str]:
+        """取得元から取得してキャッシュを更新する"""
+        try:
+            values = self.provider.fetch()
+        except Exception:
+            self.failures += 1
+            raise
+        with self._lock:
+            self._values = values
+            self._fetched_at = time.monotonic()
+            self.fetches += 1
+        return values
+
+    def _refresh_in_background(self) -> None:
+        """バックグラウンドで再取得する（失敗した場合は古い値を使い続ける）"""
+        try:
+            self._fetch()
+        except Exception as e:
+            print(f"警告: シークレットの再取得に失敗しました（{self.provider.name}）: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self, name: str) -> Optional[str]:
+        """
+        シークレットを取得する
+
+        Args:
+            name: シークレットのキー（例: GOOGLE_API_KEY）
+
+        Returns:
+            Optional[str]: 値（存在しない場合は None）
+
+        Raises:
+            Exception: キャッシュに使える値がなく、取得元からの取得に失敗した場合
+        """
+        if self.ttl_seconds <= 0:
+            return self._fetch().get(name)
+
+        with self._lock:
+            values = self._values
+            age = time.monotonic() - self._fetched_at
+            start_refresh = (
+                values is not None
+                and self.ttl_seconds <= age < self.ttl_seconds + self.max_stale_seconds
+                and not self._refreshing
+            )
+            if start_refresh:
+                self._refreshing = True
+
+        if values is None or age >= self.ttl_seconds + self.max_stale_seconds:
+            try:
+                values = self._fetch()
+            except Exception:
+                if values is None:
+                    raise
+                print(f"警告: シークレットの再取得に失敗したため、期限切れの値を使用します（{self.provider.name}）")
+        elif start_refresh:
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+        return values.get(name)
+
+    def invalidate(self) -> None:
+        """キャッシュを破棄する（次の get() で再取得する）"""
+        with self._lock:
+            self._values = None
+
+    def stats(self) -> dict:
+        """キャッシュの統計情報を返す"""
+        with self._lock:
+            age = time.monotonic() - self._fetched_at if self._values is not None else None
+        return {
+            "provider": self.provider.name,
+            "ttl_seconds": self.ttl_seconds,
+            "age_seconds": age,
+            "fetches": self.fetches,
+            "failures": self.failures,
+        }
+
+
+def create_secret_provider(name: str) -> SecretProvider:
+    """
+    取得元の名前から SecretProvider を作成する
+
+    Args:
+        name: "env"、"file"、"aws" のいずれか
+
+    Raises:
+        ValueError: 不明な取得元の場合
+    """
+    name = name.lower()
+    if name == "env":
+        return EnvSecretProvider()
+    if name == "file":
+        return FileSecretProvider(env_str("SECRETS_FILE", ".secrets.json"))
+    if name == "aws":
+        return AwsSecretsManagerProvider(
+            secret_id=env_str("SECRET_NAME", DEFAULT_SECRET_NAME),
+            region_name=env_str("AWS_REGION", env_str("AWS_DEFAULT_REGION", "ap-northeast-1")),
+        )
+    raise ValueError(f"Unknown secrets provider: {name}")
+
+
+def create_secret_store_from_env() -> SecretStore:
+    """
+    環境変数からシークレットストアを作成する（この時点では取得しない）
+
+    - SECRETS_PROVIDER: env / file / aws（デフォルトは Lambda 上では aws、それ以外は env）
+    - SECRETS_FILE: file の場合の JSON ファイルのパス（デフォルト .secrets.json）
+    - SECRETS_TTL_SECONDS: キャッシュの保持期間（デフォルト 300 秒、env の場合は 0 = キャッシュしない）
+    - SECRET_NAME: aws の場合のシークレット名
+    """
+    default_provider = "aws" if "AWS_LAMBDA_FUNCTION_NAME" in os.environ else "env"
+    provider = create_secret_provider(env_str("SECRETS_PROVIDER", default_provider))
+    default_ttl = 0.0 if provider.name == "env" else 300.0
+    return SecretStore(provider, ttl_seconds=env_float("SECRETS_TTL_SECONDS", default_ttl))
+
+
+# プロセス全体で共有するシークレットストア
+secret_store = create_secret_store_from_env()
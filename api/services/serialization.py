@@ -0,0 +1,52 @@
+"""JSON のシリアライズ - orjson があれば使い、なければ標準ライブラリの json にフォールバックする"""
+
+import json
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson は依存関係に含まれるが、ない環境でも動くようにする
+    orjson = None
+
+# orjson を使っているかどうか（ベンチマーク・統計情報用）
+HAS_ORJSON = orjson is not None
+
+
+def dumps(data: Any, indent: bool = False) -> bytes:
+    """
+    JSON の UTF-8 バイト列にする（非 ASCII 文字はエスケープしない）
+
+    Args:
+        data: JSON に変換できるデータ
+        indent: True の場合は2スペースでインデントする（json.dump(..., indent=2) と同じ形式）
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_str(data: Any) -> str:
+    """JSON の文字列にする（非 ASCII 文字はエスケープしない）"""
+    return dumps(data).decode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """JSON のバイト列・文字列を読み込む"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json_file(path: Union[str, Path]) -> Any:
+    """JSON ファイルを読み込む"""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_json_file(path: Union[str, Path], data: Any, indent: bool = True) -> None:
+    """JSON ファイルに書き出す（デフォルトは json.dump(..., ensure_ascii=False, indent=2) と同じ形式）"""
+    with open(path, "wb") as f:
+        f.write(dumps(data, indent=indent))
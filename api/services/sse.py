@@ -0,0 +1,26 @@
+"""Server-Sent Events（SSE）のユーティリティ"""
+
+from typing import Any
+
+from services.serialization import dumps_str
+
+# SSE レスポンスに付与するヘッダー（プロキシでのバッファリングとキャッシュを無効化）
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    SSE の1イベント分の文字列を作成する
+
+    Args:
+        event: イベント名
+        data: JSON に変換できるデータ
+
+    Returns:
+        str: `event: ...` と `data: ...` を含むイベント文字列
+    """
+    payload = dumps_str(data)
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -0,0 +1,202 @@
+"""TTL・LRU 付きのキーバリューストア（インプロセス / ローカル SQLite）"""
+
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class TTLStore(ABC):
+    """
+    文字列のキーと値を保持する TTL・LRU 付きストアの基底クラス
+
+    保持期間（ttl_seconds）を過ぎたエントリは取得できなくなり、
+    エントリ数が max_entries を超えると最も長く参照されていないものから削除される。
+    """
+
+    backend = "base"
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """値を取得する（存在しない・期限切れの場合は None）"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """値を保存する"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """値を削除する"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        """すべての値を削除する"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryTTLStore(TTLStore):
+    """プロセス内のメモリに保持するストア（uvicorn などの常駐プロセス向け）"""
+
+    backend = "memory"
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        super().__init__(ttl_seconds, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteTTLStore(TTLStore):
+    """
+    ローカルの SQLite ファイルに保持するストア
+
+    Lambda では /tmp 以下に置くことで、同じ実行環境（ウォームスタート）の呼び出し間で
+    値を引き継げる。1つのファイルに複数のストアを置けるよう、テーブルは namespace ごとに分ける。
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, namespace: str = "entries"):
+        super().__init__(ttl_seconds, max_entries)
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", namespace):
+            raise ValueError(f"Invalid namespace: {namespace}")
+        self.path = path
+        self._table = namespace
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table} ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self._table}_accessed_at ON {self._table} (accessed_at)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                self._conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                f"UPDATE {self._table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_seconds, now),
+            )
+            # 期限切れを掃除し、上限を超えた分は参照が古いものから削除する
+            self._conn.execute(f"DELETE FROM {self._table} WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                f"DELETE FROM {self._table} WHERE key IN ("
+                f" SELECT key FROM {self._table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self._table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self._table} WHERE expires_at > ?", (time.time(),)
+            ).fetchone()
+            return count
+
+
+def create_ttl_store(
+    backend: str,
+    ttl_seconds: float,
+    max_entries: int,
+    path: str,
+    namespace: str,
+) -> Optional[TTLStore]:
+    """
+    バックエンド名からストアを作成する
+
+    Args:
+        backend: "memory"、"sqlite"、"none"（無効）のいずれか
+        ttl_seconds: 保持期間（秒）
+        max_entries: 最大エントリ数
+        path: SQLite ファイルのパス（sqlite の場合のみ使用）
+        namespace: SQLite のテーブル名（sqlite の場合のみ使用）
+
+    Returns:
+        Optional[TTLStore]: ストア（"none" の場合は None）
+
+    Raises:
+        ValueError: 不明なバックエンド名の場合
+    """
+    backend = backend.lower()
+    if backend in ("none", "off", "disabled"):
+        return None
+    if backend == "memory":
+        return MemoryTTLStore(ttl_seconds, max_entries)
+    if backend == "sqlite":
+        return SQLiteTTLStore(path, ttl_seconds, max_entries, namespace=namespace)
+    raise ValueError(f"Unknown store backend: {backend}")
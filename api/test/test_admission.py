@@ -0,0 +1,229 @@
+"""アドミッション制御（レート制限・待ち行列・429）のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_admission.py
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from services.admission import (
+    CLIENT_RATE,
+    QUEUE_FULL,
+    QUEUE_TIMEOUT,
+    AdmissionConfig,
+    AdmissionController,
+    AdmissionMiddleware,
+    AdmissionRejected,
+    TokenBucket,
+)
+
+
+def _controller(**overrides) -> AdmissionController:
+    """テスト用の設定（指定しない制限は無制限）"""
+    config = {"rate": 0.0, "max_concurrent": 0, "client_rate": 0.0, "max_queue": 8, "max_wait_seconds": 1.0}
+    config.update(overrides)
+    return AdmissionController(AdmissionConfig(**config))
+
+
+async def _rejected(coro) -> AdmissionRejected:
+    try:
+        await coro
+    except AdmissionRejected as e:
+        return e
+    raise AssertionError("拒否されませんでした")
+
+
+def test_token_bucket():
+    """バーストまでは即座に取得でき、空になると補充までの時間を返すこと"""
+    bucket = TokenBucket(rate=10.0, burst=3)
+    assert all(bucket.try_take() for _ in range(3))
+    assert not bucket.try_take()
+    assert 0 < bucket.wait_time() <= 0.1
+    time.sleep(0.12)
+    assert bucket.try_take()
+
+    unlimited = TokenBucket(rate=0.0, burst=1)
+    assert all(unlimited.try_take() for _ in range(100))
+
+
+def test_client_rate_rejects_without_waiting():
+    """クライアントのレートを超えたリクエストは待たせずに拒否し、他のクライアントには影響しないこと"""
+    controller = _controller(client_rate=1.0, client_burst=2)
+
+    async def run():
+        await controller.acquire("10.0.0.1")
+        await controller.acquire("10.0.0.1")
+        started = time.perf_counter()
+        error = await _rejected(controller.acquire("10.0.0.1"))
+        elapsed = time.perf_counter() - started
+        await controller.acquire("10.0.0.2")
+        return error, elapsed
+
+    error, elapsed = asyncio.run(run())
+    assert error.reason == CLIENT_RATE
+    assert 0 < error.retry_after <= 1.0
+    assert elapsed < 0.05
+    stats = controller.stats()
+    assert stats["rejected"][CLIENT_RATE] == 1
+    assert stats["admitted"] == 3
+    assert stats["clients"] == 2
+
+
+def test_client_buckets_are_bounded():
+    """保持するクライアント数が上限を超えたら古いものから削除すること"""
+    controller = _controller(client_rate=1.0, max_clients=3)
+
+    async def run():
+        for i in range(10):
+            await controller.acquire(f"10.0.0.{i}")
+            controller.release()
+
+    asyncio.run(run())
+    assert controller.stats()["clients"] == 3
+
+
+def test_queue_admits_in_order_after_release():
+    """同時処理数の上限に達したら待ち行列で待ち、枠が空いた順に受け付けること"""
+    controller = _controller(max_concurrent=1)
+    order = []
+
+    async def request(name: str, hold: float):
+        await controller.acquire(name)
+        order.append(name)
+        try:
+            await asyncio.sleep(hold)
+        finally:
+            controller.release()
+
+    async def run():
+        first = asyncio.create_task(request("a", 0.05))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(request(name, 0.01)) for name in ("b", "c")]
+        await asyncio.sleep(0.01)
+        depth = controller.stats()["queue_depth"]
+        await asyncio.gather(first, *rest)
+        return depth
+
+    depth = asyncio.run(run())
+    assert depth == 2
+    assert order == ["a", "b", "c"]
+    stats = controller.stats()
+    assert stats["in_flight"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_queue_full_and_timeout():
+    """待ち行列が満杯なら即座に、待ち時間の上限を超えたら 429 相当で拒否すること"""
+    controller = _controller(max_concurrent=1, max_queue=1, max_wait_seconds=0.05)
+
+    async def run():
+        await controller.acquire("a")
+        waiting = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+        full = await _rejected(controller.acquire("c"))
+        timeout = await _rejected(waiting)
+        return full, timeout
+
+    full, timeout = asyncio.run(run())
+    assert full.reason == QUEUE_FULL
+    assert timeout.reason == QUEUE_TIMEOUT
+    assert full.retry_after > 0
+    stats = controller.stats()
+    assert stats["rejected"][QUEUE_FULL] == 1
+    assert stats["rejected"][QUEUE_TIMEOUT] == 1
+    assert stats["in_flight"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_global_rate_waits_for_tokens():
+    """全体のトークンが空の場合は待ち行列で補充を待ってから受け付けること"""
+    controller = _controller(rate=20.0, burst=1)
+
+    async def run():
+        await controller.acquire("a")
+        started = time.perf_counter()
+        await controller.acquire("b")
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+    assert 0.02 <= elapsed < 0.5
+    assert controller.stats()["admitted"] == 2
+
+
+def test_middleware_returns_429_with_retry_after():
+    """LLM を使うパスのみ制限し、拒否した場合は Retry-After 付きの 429 を返すこと"""
+    app = FastAPI()
+    calls = []
+
+    @app.post("/api/diagnosis")
+    async def diagnosis():
+        calls.append("diagnosis")
+        return {"ok": True}
+
+    @app.get("/api/players")
+    async def players():
+        return {"players": []}
+
+    controller = _controller(client_rate=0.5, client_burst=1, trust_forwarded_for=True)
+    wrapped = AdmissionMiddleware(app, controller)
+
+    async def run():
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                await client.post("/api/diagnosis"),
+                await client.post("/api/diagnosis"),
+                await client.post("/api/diagnosis", headers={"X-Forwarded-For": "203.0.113.7, 10.0.0.1"}),
+                await client.get("/api/players"),
+                await client.get("/api/players"),
+            ]
+
+    first, limited, forwarded, players, players_again = asyncio.run(run())
+    assert first.status_code == 200
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "2"
+    assert "detail" in limited.json()
+    assert forwarded.status_code == 200
+    assert players.status_code == 200 and players_again.status_code == 200
+    assert calls == ["diagnosis", "diagnosis"]
+    assert controller.stats()["in_flight"] == 0
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_token_bucket,
+        test_client_rate_rejects_without_waiting,
+        test_client_buckets_are_bounded,
+        test_queue_admits_in_order_after_release,
+        test_queue_full_and_timeout,
+        test_global_rate_waits_for_tokens,
+        test_middleware_returns_429_with_retry_after,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
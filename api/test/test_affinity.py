@@ -0,0 +1,147 @@
+"""親和性スコア計算のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_affinity.py
+"""
+
+import os
+import random
+import sys
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.diagnosis import NEN_TYPES
+from services.affinity import RING_DISTANCE, calculate_affinities, calculate_affinities_batch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def reference_affinities(primary: str, specialist_score: int):
+    """共通化する前の実装（1要素ずつ距離を計算する）"""
+    types = ["強化系", "変化系", "具現化系", "特質系", "操作系", "放出系"]
+
+    if primary not in types:
+        raise ValueError(f"Invalid primary type: {primary}")
+
+    primary_index = types.index(primary)
+    scores = [0] * 6
+
+    for i in range(6):
+        if i == 3:
+            scores[i] = specialist_score
+            continue
+
+        distance = min(abs(i - primary_index), 6 - abs(i - primary_index))
+
+        if distance == 0:
+            scores[i] = 100
+        elif distance == 1:
+            scores[i] = 80
+        elif distance == 2:
+            scores[i] = 60
+        else:
+            scores[i] = 40
+
+    return scores
+
+
+def test_matches_reference_for_all_inputs():
+    """すべての主系統・特質系スコア（0-100）で従来の実装と一致すること"""
+    for primary in NEN_TYPES:
+        for specialist_score in range(101):
+            assert calculate_affinities(primary, specialist_score) == reference_affinities(
+                primary, specialist_score
+            ), (primary, specialist_score)
+
+
+def test_ring_distance_properties():
+    """円環上の距離が対称で、0〜3 の範囲に収まること"""
+    for i in range(6):
+        assert RING_DISTANCE[i][i] == 0
+        for j in range(6):
+            assert RING_DISTANCE[i][j] == RING_DISTANCE[j][i]
+            assert 0 <= RING_DISTANCE[i][j] <= 3
+
+
+def test_invalid_primary():
+    """無効な系統名は ValueError になること"""
+    for primary in ("", "念系", "強化"):
+        try:
+            calculate_affinities(primary, 50)
+        except ValueError:
+            continue
+        raise AssertionError(f"ValueError が発生しませんでした: {primary}")
+
+
+def test_batch_matches_scalar():
+    """一括計算の各行がスカラー版と一致すること（ランダムな入力で検証）"""
+    if np is None:
+        print("  NumPy がインストールされていないためスキップ")
+        return
+
+    rng = random.Random(12)
+    for size in (0, 1, 7, 1000):
+        primaries = [rng.choice(NEN_TYPES) for _ in range(size)]
+        specialist_scores = [rng.randint(0, 100) for _ in range(size)]
+
+        matrix = calculate_affinities_batch(primaries, specialist_scores)
+        assert matrix.shape == (size, 6)
+        expected = [reference_affinities(p, s) for p, s in zip(primaries, specialist_scores)]
+        assert matrix.tolist() == expected
+
+        # インデックスで指定しても同じ結果になること
+        indices = [NEN_TYPES.index(p) for p in primaries]
+        assert calculate_affinities_batch(np.array(indices), np.array(specialist_scores)).tolist() == expected
+
+
+def test_batch_rejects_invalid_input():
+    """無効な系統名・インデックス・長さの違いは ValueError になること"""
+    if np is None:
+        print("  NumPy がインストールされていないためスキップ")
+        return
+
+    cases = [
+        (["強化系", "念系"], [10, 20]),
+        ([0, 6], [10, 20]),
+        ([-1], [10]),
+        (["強化系"], [10, 20]),
+    ]
+    for primaries, specialist_scores in cases:
+        try:
+            calculate_affinities_batch(primaries, specialist_scores)
+        except ValueError:
+            continue
+        raise AssertionError(f"ValueError が発生しませんでした: {primaries}")
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_matches_reference_for_all_inputs,
+        test_ring_distance_properties,
+        test_invalid_primary,
+        test_batch_matches_scalar,
+        test_batch_rejects_invalid_input,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
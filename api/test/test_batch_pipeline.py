@@ -0,0 +1,187 @@
+"""選手診断スクリプトのバッチ処理パイプライン（レート制限・リトライ・処理時間の集計）のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_batch_pipeline.py
+"""
+
+import asyncio
+import sys
+import os
+from types import SimpleNamespace
+
+# 親ディレクトリ（api）と選手診断スクリプトのディレクトリをPythonパスに追加
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_DIR = os.path.join(os.path.dirname(API_DIR), "script", "player-diagnosis")
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+import batch_pipeline
+from batch_pipeline import LatencyStats, TokenBucket, run_pipeline
+from services.retry import EmptyOutputError
+
+
+class FakeClock:
+    """time.monotonic と asyncio.sleep の代わり（sleep は待たずに時刻を進めて記録する）"""
+
+    def __init__(self, now: float = 100.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_burst_and_refill():
+    """capacity まではすぐに取得でき、空になったら rate に応じた時間だけ待ち、capacity を超えて貯まらないこと"""
+    clock = FakeClock()
+    original_time, original_asyncio = batch_pipeline.time, batch_pipeline.asyncio
+    batch_pipeline.time = SimpleNamespace(monotonic=clock.monotonic)
+    batch_pipeline.asyncio = SimpleNamespace(Lock=asyncio.Lock, sleep=clock.sleep)
+
+    async def acquire(bucket: TokenBucket, count: int) -> None:
+        for _ in range(count):
+            await bucket.acquire()
+
+    try:
+        bucket = TokenBucket(rate=2.0, capacity=3)
+
+        # バースト: capacity 個までは待たない
+        asyncio.run(acquire(bucket, 3))
+        assert clock.sleeps == []
+
+        # 空になったら1トークン分（1 / rate 秒）待つ
+        asyncio.run(acquire(bucket, 1))
+        assert clock.sleeps == [0.5]
+        assert clock.now == 100.5
+
+        # 1秒で rate 個補充される
+        clock.now += 1.0
+        asyncio.run(acquire(bucket, 2))
+        assert clock.sleeps == [0.5]
+        asyncio.run(acquire(bucket, 1))
+        assert clock.sleeps == [0.5, 0.5]
+
+        # 長く空けても capacity 個までしか貯まらない
+        clock.now += 60.0
+        asyncio.run(acquire(bucket, 4))
+        assert clock.sleeps == [0.5, 0.5, 0.5]
+    finally:
+        batch_pipeline.time, batch_pipeline.asyncio = original_time, original_asyncio
+
+
+def test_retries_take_tokens():
+    """リトライも含め、worker を呼び出すたびにトークンを1つ取得すること"""
+    acquired = []
+    original_acquire = TokenBucket.acquire
+
+    async def counting_acquire(self, tokens: float = 1.0) -> None:
+        acquired.append(tokens)
+        await original_acquire(self, tokens)
+
+    calls = {}
+
+    async def worker(item: str) -> str:
+        calls[item] = calls.get(item, 0) + 1
+        if item == "flaky" and calls[item] < 3:
+            raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+        return item.upper()
+
+    TokenBucket.acquire = counting_acquire
+    try:
+        results, failures, _ = asyncio.run(
+            run_pipeline(
+                ["ok", "flaky"],
+                worker=worker,
+                label=str,
+                concurrency=2,
+                requests_per_minute=6000,
+                max_retries=3,
+                base_delay=0.001,
+            )
+        )
+    finally:
+        TokenBucket.acquire = original_acquire
+
+    assert results == ["OK", "FLAKY"]
+    assert failures == []
+    assert calls == {"ok": 1, "flaky": 3}
+    assert len(acquired) == sum(calls.values())
+
+
+def test_pipeline_retry_and_failure_accounting():
+    """リトライ可能なエラーは再試行し、致命的なエラーと試行回数の上限に達したものを失敗として返すこと"""
+    calls = {}
+    saved = []
+
+    async def worker(item: str) -> str:
+        calls[item] = calls.get(item, 0) + 1
+        if item == "flaky" and calls[item] < 2:
+            raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+        if item == "invalid":
+            raise EmptyOutputError("LLMが無効な系統を返しました: 強化")
+        if item == "fatal":
+            raise ValueError("GOOGLE_API_KEY が設定されていません")
+        return item.upper()
+
+    items = ["ok", "flaky", "invalid", "fatal"]
+    results, failures, latency = asyncio.run(
+        run_pipeline(
+            items,
+            worker=worker,
+            label=str,
+            concurrency=4,
+            requests_per_minute=6000,
+            max_retries=3,
+            base_delay=0.001,
+            on_result=lambda item, result: saved.append((item, result)),
+        )
+    )
+
+    assert results == ["OK", "FLAKY", None, None]
+    assert calls == {"ok": 1, "flaky": 2, "invalid": 3, "fatal": 1}
+    assert sorted(item for item, _ in failures) == ["fatal", "invalid"]
+    assert all(isinstance(error, Exception) for _, error in failures)
+    assert sorted(saved) == [("flaky", "FLAKY"), ("ok", "OK")]
+    assert latency.summary()["count"] == 2
+
+
+def test_latency_summary():
+    """件数・平均・p50・p95・最大を返し、記録がない場合は 0 を返すこと"""
+    assert LatencyStats().summary() == {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+    stats = LatencyStats()
+    for seconds in [5.0, 1.0, 3.0, 2.0, 4.0]:
+        stats.record(seconds)
+    assert stats.summary() == {"count": 5, "mean": 3.0, "p50": 3.0, "p95": 4.0, "max": 5.0}
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_token_bucket_burst_and_refill,
+        test_retries_take_tokens,
+        test_pipeline_retry_and_failure_accounting,
+        test_latency_summary,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""サーキットブレーカーと障害時の代替結果のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_circuit_breaker.py
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main as api_main
+from models.diagnosis import QuestionAnswer
+from prompts.diagnosis import CANNED_COMMENTS
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from services.fallback import FallbackQuestions, fallback_diagnosis
+from services.metrics import metrics
+from services.retry import EmptyOutputError, RetryPolicy
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    options = dict(failure_rate=0.5, window=4, min_calls=4, open_seconds=0.05)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def test_opens_after_failure_rate():
+    """直近の失敗率がしきい値を超えると開き、呼び出しを拒否すること"""
+    breaker = _breaker()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    """開いてから一定時間後は1回だけ試行を許可し、成功すれば閉じ、失敗すれば再び開くこと"""
+    breaker = _breaker(min_calls=1)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["opened"] == 2
+
+
+def test_open_breaker_fails_fast():
+    """ブレーカーが開いている間は LLM を呼び出さず、リトライもしないこと"""
+    metrics.clear()
+    breaker = _breaker(min_calls=2, open_seconds=60)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, breaker=breaker)
+    calls = []
+
+    async def failing_call():
+        calls.append(1)
+        raise RuntimeError("503 UNAVAILABLE")
+
+    try:
+        asyncio.run(policy.arun("test", failing_call))
+    except CircuitOpenError as e:
+        # 2回失敗した時点で開き、3回目は呼び出さない
+        assert e.retry_attempts == 3
+    else:
+        raise AssertionError("CircuitOpenError が送出されませんでした")
+    assert len(calls) == 2
+    assert 'reason="circuit_open"' in metrics.render()
+
+
+def test_invalid_output_does_not_open_breaker():
+    """構造化出力の失敗（LLM は応答している）は障害として数えないこと"""
+    breaker = _breaker(min_calls=2)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001, breaker=breaker)
+
+    async def invalid_call():
+        raise EmptyOutputError("empty")
+
+    try:
+        asyncio.run(policy.arun("test", invalid_call))
+    except EmptyOutputError:
+        pass
+    assert breaker.state == CLOSED
+
+
+def test_fallback_questions_and_diagnosis():
+    """同梱の質問セットを返し、その回答はローカル採点と定型コメントで診断できること"""
+    fallback = FallbackQuestions()
+    question_set = fallback.get()
+    assert len(question_set.questions) == 10
+
+    question_answers = [QuestionAnswer(question=q, selected_choice_index=0) for q in question_set.questions]
+    result = fallback_diagnosis(question_answers)
+    assert result is not None
+    assert max(result.scores) == 100
+    assert result.comment in CANNED_COMMENTS.values()
+
+    # 生成済みの質問セットがあればそちらを返す
+    fallback.remember(question_set.model_copy())
+    assert fallback.stats()["recent"] == 1
+
+
+def test_endpoints_fall_back_when_open():
+    """ブレーカーが開いている場合、エンドポイントは代替の結果を X-Fallback ヘッダー付きで返すこと"""
+
+    async def open_circuit(*_args, **_kwargs):
+        try:
+            raise CircuitOpenError("open")
+        except CircuitOpenError as e:
+            raise Exception("失敗しました") from e
+
+    # LLM 呼び出しがサーキットブレーカーで拒否された状態にする（プールは使わない）
+    originals = (api_main.agenerate_questions, api_main.adiagnose_personality)
+    pool_size = api_main.question_pool.config.size
+    api_main.agenerate_questions = api_main.adiagnose_personality = open_circuit
+    api_main.question_pool.config.size = 0
+
+    async def run():
+        transport = httpx.ASGITransport(app=api_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            questions = await client.get("/api/questions/generate")
+            question_answers = [
+                {"question": question, "selected_choice_index": 1}
+                for question in questions.json()["questions"]
+            ]
+            diagnosis = await client.post(
+                "/api/diagnosis",
+                json={"question_answers": question_answers},
+                headers={"X-Diagnosis-Cache": "bypass"},
+            )
+            return questions, diagnosis
+
+    try:
+        questions, diagnosis = asyncio.run(run())
+    finally:
+        api_main.agenerate_questions, api_main.adiagnose_personality = originals
+        api_main.question_pool.config.size = pool_size
+
+    assert questions.status_code == 200
+    assert questions.headers["x-fallback"] == "circuit-open"
+    assert diagnosis.status_code == 200
+    assert diagnosis.headers["x-fallback"] == "circuit-open"
+    assert diagnosis.json()["comment"] in CANNED_COMMENTS.values()
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_opens_after_failure_rate,
+        test_half_open_probe_closes_or_reopens,
+        test_open_breaker_fails_fast,
+        test_invalid_output_does_not_open_breaker,
+        test_fallback_questions_and_diagnosis,
+        test_endpoints_fall_back_when_open,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
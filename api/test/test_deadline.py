@@ -0,0 +1,200 @@
+"""リクエストの期限のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_deadline.py
+"""
+
+import asyncio
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.deadline import (
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    aiter_within_deadline,
+    check_deadline,
+    deadline_scope,
+    is_deadline_exceeded,
+    remaining,
+)
+from services.metrics import metrics
+from services.retry import RetryPolicy
+
+
+class FakeLambdaContext:
+    """Lambda の context（残り時間のみ）"""
+
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+def _with_min_attempt(seconds: str):
+    """LLM_MIN_ATTEMPT_SECONDS を一時的に設定するデコレーター"""
+
+    def decorator(test):
+        def wrapper():
+            original = os.environ.get("LLM_MIN_ATTEMPT_SECONDS")
+            os.environ["LLM_MIN_ATTEMPT_SECONDS"] = seconds
+            try:
+                test()
+            finally:
+                if original is None:
+                    del os.environ["LLM_MIN_ATTEMPT_SECONDS"]
+                else:
+                    os.environ["LLM_MIN_ATTEMPT_SECONDS"] = original
+
+        wrapper.__name__ = test.__name__
+        return wrapper
+
+    return decorator
+
+
+def test_nested_scope_keeps_earlier_deadline():
+    """期限を入れ子で設定した場合は早い方を使い、抜けると元に戻ること"""
+    assert remaining() is None
+    with deadline_scope(10.0):
+        with deadline_scope(60.0):
+            assert remaining() <= 10.0
+        with deadline_scope(1.0):
+            assert remaining() <= 1.0
+        assert 1.0 < remaining() <= 10.0
+    assert remaining() is None
+
+
+@_with_min_attempt("0.5")
+def test_check_deadline_requires_min_attempt_time():
+    """残り時間が LLM_MIN_ATTEMPT_SECONDS より短い場合は新しい試行を始めないこと"""
+    check_deadline("test")
+    with deadline_scope(1.0):
+        check_deadline("test")
+    with deadline_scope(0.2):
+        try:
+            check_deadline("test")
+        except DeadlineExceeded:
+            pass
+        else:
+            raise AssertionError("DeadlineExceeded が送出されませんでした")
+
+
+@_with_min_attempt("0")
+def test_attempt_is_cancelled_at_deadline():
+    """試行が期限を過ぎた場合はキャンセルしてリトライしないこと"""
+    metrics.clear()
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+    calls = []
+
+    async def slow_call():
+        calls.append(1)
+        await asyncio.sleep(1.0)
+
+    async def run():
+        with deadline_scope(0.05):
+            await policy.arun("test", slow_call)
+
+    try:
+        asyncio.run(run())
+    except DeadlineExceeded as e:
+        assert e.retry_attempts == 1
+    else:
+        raise AssertionError("DeadlineExceeded が送出されませんでした")
+    assert len(calls) == 1
+    assert 'reason="deadline"' in metrics.render()
+
+
+@_with_min_attempt("0.5")
+def test_no_retry_when_backoff_outlives_deadline():
+    """待ち時間の後に十分な時間が残らない場合はリトライしないこと"""
+    # 待ち時間は 0.1〜0.2 秒。残り 0.6 秒では待った後に 0.5 秒残らない
+    policy = RetryPolicy(max_attempts=3, base_delay=0.2)
+    with deadline_scope(0.6):
+        assert policy.retry_delay("test", TimeoutError(), 0) is None
+    with deadline_scope(5.0):
+        assert policy.retry_delay("test", TimeoutError(), 0) is not None
+
+
+def test_stream_items_are_bounded_by_deadline():
+    """ストリーミングでも次の要素を期限まで待たないこと"""
+
+    async def stream():
+        yield 1
+        await asyncio.sleep(1.0)
+        yield 2
+
+    async def run():
+        items = []
+        with deadline_scope(0.05):
+            async for item in aiter_within_deadline("test", stream()):
+                items.append(item)
+        return items
+
+    try:
+        asyncio.run(run())
+    except DeadlineExceeded:
+        pass
+    else:
+        raise AssertionError("DeadlineExceeded が送出されませんでした")
+
+
+def test_wrapped_deadline_is_detected():
+    """サービスがラップした例外からも期限切れを判定できること"""
+    try:
+        try:
+            raise DeadlineExceeded("期限切れ")
+        except DeadlineExceeded as e:
+            raise Exception("診断処理に失敗しました") from e
+    except Exception as wrapped:
+        assert is_deadline_exceeded(wrapped)
+    assert not is_deadline_exceeded(Exception("other"))
+
+
+def test_middleware_uses_lambda_remaining_time():
+    """Lambda の残り時間が REQUEST_TIMEOUT_SECONDS より短い場合はそちらを期限にすること"""
+    observed = []
+
+    async def app(scope, receive, send):
+        observed.append(remaining())
+
+    middleware = DeadlineMiddleware(app)
+    scope = {"type": "http", "aws.context": FakeLambdaContext(remaining_ms=5000)}
+    asyncio.run(middleware(scope, None, None))
+    asyncio.run(middleware({"type": "http"}, None, None))
+
+    assert 3.5 < observed[0] <= 4.0
+    assert 27.5 < observed[1] <= 28.0
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_nested_scope_keeps_earlier_deadline,
+        test_check_deadline_requires_min_attempt_time,
+        test_attempt_is_cancelled_at_deadline,
+        test_no_retry_when_backoff_outlives_deadline,
+        test_stream_items_are_bounded_by_deadline,
+        test_wrapped_deadline_is_detected,
+        test_middleware_uses_lambda_remaining_time,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,9 @@
 実行方法:
     cd api
     .venv/bin/python test/test_diagnosis.py
+
+    # API キーなしで実行する場合（決定的な fake の出力を使う）
+    LLM_BACKEND=fake .venv/bin/python test/test_diagnosis.py
 """
 
 import json
@@ -0,0 +1,124 @@
+"""診断結果キャッシュのテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_diagnosis_cache.py
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.diagnosis import DiagnosisResponse, QuestionAnswer
+from services.diagnosis_cache import DiagnosisCache, diagnosis_cache_key
+from services.ttl_store import MemoryTTLStore, SQLiteTTLStore, TTLStore
+from test_diagnosis import create_sample_questions
+
+
+def _question_answers(indices):
+    """サンプルの質問と回答インデックスから回答リストを作成する"""
+    return [
+        QuestionAnswer(question=q, selected_choice_index=idx)
+        for q, idx in zip(create_sample_questions(), indices)
+    ]
+
+
+def test_cache_key_is_content_addressed():
+    """同じ内容なら同じキー、回答が1つでも違えば別のキーになること"""
+    first = diagnosis_cache_key(_question_answers([0] * 10))
+    second = diagnosis_cache_key(_question_answers([0] * 10))
+    changed = diagnosis_cache_key(_question_answers([0] * 9 + [1]))
+    assert first == second
+    assert first != changed
+
+
+def _check_store(store):
+    """TTL と LRU の動作を確認する"""
+    store.set("a", "1")
+    store.set("b", "2")
+    assert store.get("a") == "1"  # a を参照して b を最も古くする
+    store.set("c", "3")
+    assert store.get("b") is None
+    assert store.get("a") == "1" and store.get("c") == "3"
+    assert len(store) == 2
+
+    store.ttl_seconds = 0.05
+    store.set("d", "4")
+    time.sleep(0.1)
+    assert store.get("d") is None
+
+
+def test_memory_store_ttl_and_lru():
+    """メモリストアの TTL と LRU"""
+    _check_store(MemoryTTLStore(ttl_seconds=60, max_entries=2))
+
+
+def test_sqlite_store_ttl_and_lru():
+    """SQLite ストアの TTL と LRU、およびファイルを開き直しても値が残ること"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        _check_store(SQLiteTTLStore(path, ttl_seconds=60, max_entries=2))
+
+        SQLiteTTLStore(path, ttl_seconds=60, max_entries=2).set("persist", "yes")
+        assert SQLiteTTLStore(path, ttl_seconds=60, max_entries=2).get("persist") == "yes"
+
+
+def test_incomplete_store_cannot_be_instantiated():
+    """メソッドを実装していないストアは作成時に失敗すること"""
+
+    class IncompleteStore(TTLStore):
+        def get(self, key):
+            return None
+
+    try:
+        IncompleteStore(ttl_seconds=60, max_entries=2)
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("TypeError が発生しませんでした")
+
+
+def test_diagnosis_cache_counts_hits_and_misses():
+    """診断結果の保存・取得とヒット・ミスの集計"""
+    cache = DiagnosisCache(MemoryTTLStore(ttl_seconds=60, max_entries=8))
+    key = diagnosis_cache_key(_question_answers([0] * 10))
+    response = DiagnosisResponse(scores=[100, 80, 60, 50, 60, 80], comment="テスト")
+
+    assert cache.get(key) is None
+    cache.set(key, response)
+    assert cache.get(key) == response
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_cache_key_is_content_addressed,
+        test_memory_store_ttl_and_lru,
+        test_sqlite_store_ttl_and_lru,
+        test_incomplete_store_cannot_be_instantiated,
+        test_diagnosis_cache_counts_hits_and_misses,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""診断ストリーミング（SSE）のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_diagnosis_stream.py
+"""
+
+import asyncio
+import json
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import services.diagnosis_service as diagnosis_service
+from models.diagnosis import DiagnosisResponse, QuestionAnswer
+from services.retry import llm_retry_policy
+from test_diagnosis import create_sample_questions
+
+REASON = "ほっほっほ、お主は努力の人じゃのう💪 心の強さが光っておるわい。"
+
+
+class PartialJsonChain:
+    """LLM の代わりに、生成途中の診断結果 dict を少しずつ返すチェーン"""
+
+    async def astream(self, _input):
+        yield {"primary": "強化"}
+        yield {"primary": "強化系", "specialist_score": 4}
+        yield {"primary": "強化系", "specialist_score": 45}
+        for end in range(0, len(REASON) + 1, 8):
+            yield {"primary": "強化系", "specialist_score": 45, "reason": REASON[:end]}
+        yield {"primary": "強化系", "specialist_score": 45, "reason": REASON}
+
+
+class ScriptedChain:
+    """試行ごとに、指定した部分的な診断結果を返し、例外が指定されていれば送出するチェーン"""
+
+    def __init__(self, attempts):
+        self.attempts = list(attempts)
+        self.calls = 0
+
+    async def astream(self, _input):
+        self.calls += 1
+        for item in self.attempts.pop(0):
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def _question_answers():
+    return [QuestionAnswer(question=q, selected_choice_index=0) for q in create_sample_questions()]
+
+
+def _run_stream(chain):
+    """チェーンを差し替えて astream_diagnosis を実行し、(イベントのリスト, 送出された例外) を返す"""
+    original = diagnosis_service.get_diagnosis_streaming_chain
+    original_delay = llm_retry_policy.base_delay
+    diagnosis_service.get_diagnosis_streaming_chain = lambda: chain
+    llm_retry_policy.base_delay = 0.001
+    events = []
+
+    async def run():
+        async for item in diagnosis_service.astream_diagnosis(_question_answers()):
+            events.append(item)
+
+    try:
+        asyncio.run(run())
+        return events, None
+    except Exception as e:
+        return events, e
+    finally:
+        diagnosis_service.get_diagnosis_streaming_chain = original
+        llm_retry_policy.base_delay = original_delay
+
+
+def _complete_attempt():
+    return [
+        {"primary": "強化系", "specialist_score": 45},
+        {"primary": "強化系", "specialist_score": 45, "reason": REASON[:8]},
+        {"primary": "強化系", "specialist_score": 45, "reason": REASON},
+    ]
+
+
+def test_stream_emits_scores_before_comment():
+    """スコアが最初に1回だけ返り、その後コメントの差分、最後に完全な結果が返ること"""
+    question_answers = [
+        QuestionAnswer(question=q, selected_choice_index=0) for q in create_sample_questions()
+    ]
+    original = diagnosis_service.get_diagnosis_streaming_chain
+    diagnosis_service.get_diagnosis_streaming_chain = lambda: PartialJsonChain()
+
+    async def run():
+        return [
+            item async for item in diagnosis_service.astream_diagnosis(question_answers)
+        ]
+
+    try:
+        events = asyncio.run(run())
+    finally:
+        diagnosis_service.get_diagnosis_streaming_chain = original
+
+    names = [name for name, _ in events]
+    assert names[0] == "scores" and names.count("scores") == 1
+    assert names[-1] == "complete"
+    assert set(names[1:-1]) == {"comment"}
+
+    scores = events[0][1]
+    assert scores == [100, 80, 60, 45, 60, 80]
+    assert "".join(payload for name, payload in events if name == "comment") == REASON
+
+    final = events[-1][1]
+    assert isinstance(final, DiagnosisResponse)
+    assert final.scores == scores and final.comment == REASON
+
+
+def test_stream_retries_error_before_scores():
+    """スコアを返す前に失敗した場合はリトライし、スコアは1回だけ返ること"""
+    chain = ScriptedChain([
+        [{"primary": "強化"}, TimeoutError("stream timed out")],
+        _complete_attempt(),
+    ])
+    events, error = _run_stream(chain)
+
+    assert error is None
+    assert chain.calls == 2
+    names = [name for name, _ in events]
+    assert names.count("scores") == 1 and names[0] == "scores"
+    assert events[0][1] == [100, 80, 60, 45, 60, 80]
+    assert events[-1][1].comment == REASON
+
+
+def test_stream_error_after_scores_is_not_retried():
+    """スコアを返した後に失敗した場合はリトライせず、SSE では error イベントを返すこと"""
+    chain = ScriptedChain([
+        [
+            {"primary": "強化系", "specialist_score": 45, "reason": REASON[:8]},
+            ConnectionError("connection reset"),
+        ],
+    ])
+    events, error = _run_stream(chain)
+
+    assert chain.calls == 1
+    assert [name for name, _ in events] == ["scores", "comment"]
+    assert error is not None and "connection reset" in str(error)
+
+    # SSE のエンドポイントでは、送信済みのスコアの後に error イベントを返す
+    import main as api_main
+
+    chain = ScriptedChain([
+        [
+            {"primary": "強化系", "specialist_score": 45, "reason": REASON[:8]},
+            ConnectionError("connection reset"),
+        ],
+    ])
+    original = diagnosis_service.get_diagnosis_streaming_chain
+    diagnosis_service.get_diagnosis_streaming_chain = lambda: chain
+    body = {"question_answers": [qa.model_dump() for qa in _question_answers()]}
+
+    async def request():
+        transport = httpx.ASGITransport(app=api_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/api/diagnosis/stream", json=body, headers={"X-Diagnosis-Cache": "bypass"}
+            )
+
+    try:
+        response = asyncio.run(request())
+    finally:
+        diagnosis_service.get_diagnosis_streaming_chain = original
+
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert chain.calls == 1
+    assert [name for name, _ in events] == ["scores", "comment", "error"]
+    assert "connection reset" in events[-1][1]["detail"]
+
+
+def test_stream_waits_for_confirmed_scores():
+    """primary・specialist_score が確定する前（数字の途中・無効な系統名）にはスコアを返さないこと"""
+    chain = ScriptedChain([
+        [
+            # reason が先に生成され、specialist_score が数字の途中の場合
+            {"primary": "強化系", "reason": REASON[:4]},
+            {"primary": "強化系", "reason": REASON[:8], "specialist_score": 4},
+            {"primary": "強化系", "reason": REASON, "specialist_score": 45},
+        ],
+    ])
+    events, error = _run_stream(chain)
+
+    assert error is None
+    assert [name for name, _ in events] == ["scores", "comment", "complete"]
+    assert events[0][1] == [100, 80, 60, 45, 60, 80]
+    assert events[1][1] == REASON
+
+    # 無効な系統名はスコアを返さずにリトライすること
+    chain = ScriptedChain([
+        [
+            {"primary": "強化", "specialist_score": 45, "reason": REASON[:8]},
+            {"primary": "強化", "specialist_score": 45, "reason": REASON},
+        ],
+        _complete_attempt(),
+    ])
+    events, error = _run_stream(chain)
+
+    assert error is None
+    assert chain.calls == 2
+    names = [name for name, _ in events]
+    assert names.count("scores") == 1 and names[0] == "scores"
+    assert events[0][1] == [100, 80, 60, 45, 60, 80]
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_stream_emits_scores_before_comment,
+        test_stream_retries_error_before_scores,
+        test_stream_error_after_scores_is_not_retried,
+        test_stream_waits_for_confirmed_scores,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
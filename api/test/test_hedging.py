@@ -0,0 +1,139 @@
+"""LLM 呼び出しのヘッジのテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_hedging.py
+"""
+
+import asyncio
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.hedging import Hedger
+from services.metrics import metrics
+
+
+class SlowThenFastCall:
+    """1回目の呼び出しだけ遅い LLM 呼び出し（キャンセルされたかどうかを記録する）"""
+
+    def __init__(self, slow: float, fast: float, fail_first: bool = False):
+        self.slow = slow
+        self.fast = fast
+        self.fail_first = fail_first
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        number = self.calls
+        try:
+            await asyncio.sleep(self.slow if number == 1 else self.fast)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if number == 1 and self.fail_first:
+            raise RuntimeError("503 unavailable")
+        return f"call-{number}"
+
+
+def _hedger(**kwargs) -> Hedger:
+    options = dict(enabled=True, min_delay=0.01, max_delay=0.05, max_ratio=1.0, min_samples=5)
+    options.update(kwargs)
+    return Hedger(**options)
+
+
+def test_disabled_hedger_calls_once():
+    """ヘッジが無効な場合は1回だけ呼び出すこと"""
+    call = SlowThenFastCall(slow=0.1, fast=0.0)
+    assert asyncio.run(Hedger(enabled=False).run("test", call)) == "call-1"
+    assert call.calls == 1
+
+
+def test_slow_call_is_hedged_and_loser_cancelled():
+    """閾値を過ぎても返らない場合はヘッジし、先に返った結果を使ってもう一方をキャンセルすること"""
+    metrics.clear()
+    call = SlowThenFastCall(slow=1.0, fast=0.01)
+    assert asyncio.run(_hedger().run("test", call)) == "call-2"
+    assert call.calls == 2
+    assert call.cancelled == 1
+
+    rendered = metrics.render()
+    assert 'giravanz_llm_hedges_total{operation="test"} 1' in rendered
+    assert 'giravanz_llm_hedge_wins_total{operation="test",winner="hedge"} 1' in rendered
+
+
+def test_fast_call_is_not_hedged():
+    """閾値より早く返る場合はヘッジしないこと"""
+    call = SlowThenFastCall(slow=0.0, fast=0.0)
+    assert asyncio.run(_hedger(max_delay=0.5).run("test", call)) == "call-1"
+    assert call.calls == 1
+
+
+def test_failed_call_waits_for_other():
+    """一方が失敗しても、もう一方が成功すればその結果を使うこと"""
+    call = SlowThenFastCall(slow=0.08, fast=0.2, fail_first=True)
+    assert asyncio.run(_hedger().run("test", call)) == "call-2"
+
+
+def test_hedge_rate_is_capped():
+    """ヘッジの予算を使い切った場合はヘッジしないこと"""
+    hedger = _hedger(max_ratio=0.0)
+
+    async def run_many():
+        results = []
+        for _ in range(4):
+            call = SlowThenFastCall(slow=0.08, fast=0.0)
+            results.append((await hedger.run("test", call), call.calls))
+        return results
+
+    results = asyncio.run(run_many())
+    # 初期の予算（2回分）を使い切った後はヘッジしない
+    assert [calls for _, calls in results] == [2, 2, 1, 1]
+    assert hedger.budget.stats()["exhausted"] == 2
+
+
+def test_threshold_follows_latency_quantile():
+    """サンプルが貯まると閾値が所要時間の分位点になり、上限・下限に収まること"""
+    hedger = Hedger(enabled=True, quantile=0.9, min_delay=0.5, max_delay=5.0, min_samples=10)
+    assert hedger.threshold("test") == 5.0
+    for i in range(1, 11):
+        hedger.record_latency("test", float(i) / 2)
+    assert hedger.threshold("test") == 5.0
+    for _ in range(100):
+        hedger.record_latency("test", 1.0)
+    assert hedger.threshold("test") == 1.0
+    for _ in range(300):
+        hedger.record_latency("test", 0.1)
+    assert hedger.threshold("test") == 0.5
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_disabled_hedger_calls_once,
+        test_slow_call_is_hedged_and_loser_cancelled,
+        test_fast_call_is_not_hedged,
+        test_failed_call_waits_for_other,
+        test_hedge_rate_is_capped,
+        test_threshold_follows_latency_quantile,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""レスポンスの圧縮と HTTP キャッシュ（ETag・304）のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_http_cache.py
+"""
+
+import asyncio
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+import main as api_main
+from models.question import QuestionSet
+from prompts.fallback_questions import FALLBACK_QUESTION_SET
+from services.compression import CompressionConfig, CompressionMiddleware, choose_encoding
+from services.http_cache import etag_matches, make_etag
+from services.player_matching import PlayerIndex
+
+
+def _player_index() -> PlayerIndex:
+    """圧縮のしきい値を超える大きさの選手データ"""
+    return PlayerIndex.from_records(
+        [
+            {
+                "id": f"{i:02d}",
+                "name": f"選手{i}",
+                "position": ("GK", "DF", "MF", "FW")[i % 4],
+                "primary": "強化系",
+                "scores": [100, 80, 60, 40 + i % 20, 60, 80],
+                "comment": "恵まれた体躯を生かしたパワフルかつ安定感のあるプレーが持ち味。" * 3,
+            }
+            for i in range(30)
+        ]
+    )
+
+
+def _request(app, requests):
+    """ASGI アプリにリクエストを順に送る（requests は (method, path, headers) のリスト）"""
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.request(method, path, headers=headers) for method, path, headers in requests]
+
+    return asyncio.run(run())
+
+
+def test_choose_encoding():
+    """q 値に従って圧縮形式を選び、同じ場合は brotli を優先すること"""
+    assert choose_encoding("gzip, deflate, br", brotli_available=True) == "br"
+    assert choose_encoding("gzip, deflate, br", brotli_available=False) == "gzip"
+    assert choose_encoding("br;q=0.5, gzip", brotli_available=True) == "gzip"
+    assert choose_encoding("gzip;q=0, identity", brotli_available=False) is None
+    assert choose_encoding("*", brotli_available=False) == "gzip"
+    assert choose_encoding("", brotli_available=True) is None
+
+
+def test_etag_matches():
+    """弱い比較・複数指定・*・圧縮の接尾辞付きの ETag を扱えること"""
+    etag = make_etag("players", "v1")
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag != make_etag("players", "v2")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches(etag[:-1] + '-gzip"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_compression_threshold_and_streams():
+    """しきい値以上の本文のみ圧縮し、Server-Sent Events は圧縮しないこと"""
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse("サッカー" * 1000)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    async def stream():
+        async def events():
+            yield "event: question\ndata: {}\n\n" * 200
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    wrapped = CompressionMiddleware(app, CompressionConfig(minimum_size=500))
+    large, small, stream, identity = _request(
+        wrapped,
+        [
+            ("GET", "/large", {"Accept-Encoding": "gzip"}),
+            ("GET", "/small", {"Accept-Encoding": "gzip"}),
+            ("GET", "/stream", {"Accept-Encoding": "gzip"}),
+            ("GET", "/large", {"Accept-Encoding": "identity"}),
+        ],
+    )
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["vary"] == "Accept-Encoding"
+    assert int(large.headers["content-length"]) < len("サッカー".encode("utf-8") * 1000) // 10
+    assert large.text == "サッカー" * 1000
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in stream.headers
+    assert "content-encoding" not in identity.headers
+
+
+def test_players_etag_and_not_modified():
+    """選手一覧に ETag・Cache-Control を付け、一致する If-None-Match には 304 を返すこと"""
+    original = api_main.player_index
+    api_main.player_index = _player_index()
+    try:
+        first, = _request(api_main.app, [("GET", "/api/players", {"Accept-Encoding": "gzip"})])
+        etag = first.headers["etag"]
+        revalidated, identity = _request(
+            api_main.app,
+            [
+                ("GET", "/api/players", {"Accept-Encoding": "gzip", "If-None-Match": etag}),
+                ("GET", "/api/players", {"Accept-Encoding": "identity", "If-None-Match": etag}),
+            ],
+        )
+    finally:
+        api_main.player_index = original
+
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert etag.endswith('-gzip"')
+    assert first.headers["cache-control"] == api_main.PLAYERS_CACHE_CONTROL
+    assert len(first.json()["players"]) == 30
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.content == b""
+    assert identity.status_code == 304
+
+
+def test_match_not_modified_without_search():
+    """マッチング結果の条件付きリクエストには探索せずに 304 を返すこと"""
+    index = _player_index()
+    original = api_main.player_index
+    api_main.player_index = index
+    path = "/api/match?scores=80,100,80,40,60,100&k=3&position=FW"
+    try:
+        first, other = _request(
+            api_main.app,
+            [("GET", path, {}), ("GET", path.replace("k=3", "k=5"), {})],
+        )
+
+        def fail(*_args, **_kwargs):
+            raise AssertionError("探索が呼び出されました")
+
+        index.search = fail
+        revalidated, = _request(api_main.app, [("GET", path, {"If-None-Match": first.headers["etag"]})])
+    finally:
+        api_main.player_index = original
+
+    assert first.status_code == 200
+    assert first.headers["etag"] != other.headers["etag"]
+    assert revalidated.status_code == 304
+
+
+def test_question_set_by_id():
+    """質問セット ID で取得でき、304・404 を返すこと"""
+    question_set = QuestionSet.model_validate(FALLBACK_QUESTION_SET)
+    set_id = api_main.question_set_store.save(question_set)
+    path = f"/api/questions/{set_id}"
+    first, missing = _request(
+        api_main.app, [("GET", path, {}), ("GET", "/api/questions/unknown", {})]
+    )
+    revalidated, = _request(api_main.app, [("GET", path, {"If-None-Match": first.headers["etag"]})])
+
+    assert first.status_code == 200
+    assert first.json()["set_id"] == set_id
+    assert "choice_types" not in first.json()["questions"][0]
+    assert first.headers["cache-control"] == api_main.QUESTION_SET_CACHE_CONTROL
+    assert revalidated.status_code == 304
+    assert missing.status_code == 404
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_choose_encoding,
+        test_etag_matches,
+        test_compression_threshold_and_streams,
+        test_players_etag_and_not_modified,
+        test_match_not_modified_without_search,
+        test_question_set_by_id,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""LLM バックエンド（fake / record / replay）のテストスクリプト（API キー・ネットワークなしで実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_llm_backends.py
+"""
+
+import asyncio
+import sys
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.diagnosis import NEN_TYPES, PrimaryDiagnosisResult
+from models.question import QuestionSet
+from prompts.question_generation import get_question_generation_prompt, get_question_generation_variables
+from services.llm_backends import (
+    FakeLatency,
+    RecordingChain,
+    RecordingStore,
+    ReplayChain,
+    ReplayMissError,
+    build_fake_chain,
+)
+from services.llm_registry import llm_registry
+from services.question_generator import get_question_chain
+from services.retry import TRANSIENT, classify_error
+
+
+@contextmanager
+def _env(**values):
+    """環境変数を一時的に設定する"""
+    originals = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            if original is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = original
+
+
+def test_fake_chain_is_deterministic():
+    """同じプロンプト変数には同じ有効な質問セット（タグ付き）を返すこと"""
+    chain = build_fake_chain(get_question_generation_prompt, QuestionSet, streaming=False)
+    variables = get_question_generation_variables(seed=42)
+    first = asyncio.run(chain.ainvoke(variables))
+    second = chain.invoke(variables)
+    assert isinstance(first, QuestionSet)
+    assert first == second
+    for question in first.questions:
+        assert len(question.choices) == 4
+        assert "特質系" in question.choice_types
+        assert all(nen_type in NEN_TYPES for nen_type in question.choice_types)
+
+    other = chain.invoke(get_question_generation_variables(seed=43))
+    assert other != first
+
+
+def test_fake_streaming_yields_partial_dicts():
+    """ストリーミングでは生成途中の dict を複数回返すこと"""
+    chain = build_fake_chain(get_question_generation_prompt, QuestionSet, streaming=True)
+
+    async def collect():
+        return [partial async for partial in chain.astream(get_question_generation_variables(seed=1))]
+
+    partials = asyncio.run(collect())
+    assert len(partials) > 1
+    assert len(QuestionSet.model_validate(partials[-1]).questions) == 10
+
+
+def test_fake_latency_and_failures():
+    """所要時間の分布と失敗率を指定でき、失敗は一時的なエラーとして分類されること"""
+    assert FakeLatency(median=0.05, sigma=0.0).draw() == (0.05, False)
+    assert FakeLatency(median=0.0).draw() == (0.0, False)
+
+    with _env(LLM_FAKE_FAILURE_RATE="1"):
+        chain = build_fake_chain(get_question_generation_prompt, QuestionSet, streaming=False)
+    try:
+        chain.invoke(get_question_generation_variables(seed=1))
+    except Exception as e:
+        assert classify_error(e) == TRANSIENT
+    else:
+        raise AssertionError("例外が送出されませんでした")
+
+
+def test_record_then_replay():
+    """記録した出力（レスポンスから除外されるタグを含む）をそのまま再生できること"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RecordingStore(Path(tmp) / "recordings.jsonl")
+        inner = build_fake_chain(get_question_generation_prompt, QuestionSet, streaming=False)
+        recorder = RecordingChain(inner, "question_generation", QuestionSet, False, store)
+        variables = get_question_generation_variables(seed=7)
+        recorded = asyncio.run(recorder.ainvoke(variables))
+        assert len(store) == 1
+
+        # 新しいストアでファイルから読み込んで再生する
+        replayer = ReplayChain("question_generation", QuestionSet, False, RecordingStore(store.path))
+        replayed = asyncio.run(replayer.ainvoke(variables))
+        assert replayed == recorded
+        assert replayed.questions[0].choice_types == recorded.questions[0].choice_types
+
+        # キーが一致しない場合は同じプロンプトの記録から選び、strict の場合は失敗する
+        assert replayer.invoke(get_question_generation_variables(seed=8)) == recorded
+        with _env(LLM_REPLAY_STRICT="true"):
+            try:
+                replayer.invoke(get_question_generation_variables(seed=8))
+            except ReplayMissError:
+                pass
+            else:
+                raise AssertionError("ReplayMissError が送出されませんでした")
+
+        # 記録のないスキーマは再生できない
+        diagnosis_replayer = ReplayChain("diagnosis", PrimaryDiagnosisResult, False, store)
+        try:
+            diagnosis_replayer.invoke({"question_answers": ""})
+        except ReplayMissError:
+            pass
+        else:
+            raise AssertionError("ReplayMissError が送出されませんでした")
+
+
+def test_registry_uses_offline_backend_without_api_key():
+    """LLM_BACKEND=fake / replay では API キーなしでチェーンを構築できること"""
+    with tempfile.TemporaryDirectory() as tmp:
+        with _env(LLM_BACKEND="fake", GOOGLE_API_KEY="", LLM_RECORDINGS_PATH=str(Path(tmp) / "r.jsonl")):
+            llm_registry.clear()
+            try:
+                question_set = asyncio.run(get_question_chain().ainvoke(get_question_generation_variables(seed=3)))
+                assert len(question_set.questions) == 10
+                assert llm_registry.stats()["backend"] == "fake"
+
+                os.environ["LLM_BACKEND"] = "replay"
+                assert isinstance(get_question_chain(), ReplayChain)
+            finally:
+                llm_registry.clear()
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_fake_chain_is_deterministic,
+        test_fake_streaming_yields_partial_dicts,
+        test_fake_latency_and_failures,
+        test_record_then_replay,
+        test_registry_uses_offline_backend_without_api_key,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
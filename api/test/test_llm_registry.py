@@ -0,0 +1,103 @@
+"""LLM レジストリのテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_llm_registry.py
+"""
+
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.diagnosis import PrimaryDiagnosisResult
+from models.question import QuestionSet
+from prompts.diagnosis import get_diagnosis_prompt
+from services.llm_registry import LLMRegistry
+
+
+def _with_api_key(value):
+    """GOOGLE_API_KEY を一時的に設定し、元の値を返す"""
+    original = os.environ.get("GOOGLE_API_KEY")
+    if value is None:
+        os.environ.pop("GOOGLE_API_KEY", None)
+    else:
+        os.environ["GOOGLE_API_KEY"] = value
+    return original
+
+
+def test_chain_is_built_once():
+    """同じキーのチェーンは2回目以降キャッシュが返ること"""
+    original = _with_api_key("dummy-key")
+    try:
+        registry = LLMRegistry()
+        first = registry.get_chain("diagnosis", get_diagnosis_prompt, PrimaryDiagnosisResult)
+        second = registry.get_chain("diagnosis", get_diagnosis_prompt, PrimaryDiagnosisResult)
+        assert first is second
+        assert registry.stats()["chains"] == 1
+
+        # スキーマや温度が異なる場合は別のチェーンになる
+        other = registry.get_chain(
+            "diagnosis", get_diagnosis_prompt, QuestionSet, temperature=0.9
+        )
+        assert other is not first
+        assert registry.stats()["llms"] == 2
+    finally:
+        _with_api_key(original)
+
+
+def test_chain_is_rebuilt_on_key_rotation():
+    """API キーが変わった場合はチェーンが再構築されること"""
+    original = _with_api_key("dummy-key-1")
+    try:
+        registry = LLMRegistry()
+        first = registry.get_chain("diagnosis", get_diagnosis_prompt, PrimaryDiagnosisResult)
+
+        os.environ["GOOGLE_API_KEY"] = "dummy-key-2"
+        second = registry.get_chain("diagnosis", get_diagnosis_prompt, PrimaryDiagnosisResult)
+        assert first is not second
+        assert registry.rotations == 1
+    finally:
+        _with_api_key(original)
+
+
+def test_missing_api_key_raises_value_error():
+    """API キーが未設定の場合は ValueError になること"""
+    original = _with_api_key(None)
+    try:
+        registry = LLMRegistry()
+        try:
+            registry.get_chain("diagnosis", get_diagnosis_prompt, PrimaryDiagnosisResult)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("ValueError が発生しませんでした")
+    finally:
+        _with_api_key(original)
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_chain_is_built_once,
+        test_chain_is_rebuilt_on_key_rotation,
+        test_missing_api_key_raises_value_error,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
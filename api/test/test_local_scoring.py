@@ -0,0 +1,188 @@
+"""ローカル採点エンジンのテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_local_scoring.py
+"""
+
+import asyncio
+import itertools
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.diagnosis import NEN_TYPES, QuestionAnswer
+from models.question import Question, QuestionSet
+from prompts.diagnosis import CANNED_COMMENTS
+from services.affinity import calculate_affinities
+from services.choice_tags import choice_tag_index
+from services.diagnosis_service import _local_score_for_mode, adiagnose_personality
+from services.local_scoring import score_answers, score_counts
+from services.metrics import metrics
+
+CHOICE_TYPES = ["強化系", "放出系", "変化系", "特質系"]
+
+
+def create_tagged_question_set() -> QuestionSet:
+    """選択肢のタグ付きの質問セットを作成する"""
+    return QuestionSet(
+        questions=[
+            Question(
+                question_text=f"ローカル採点テストの質問{i + 1}",
+                choices=[f"選択肢{i + 1}-{j + 1}" for j in range(4)],
+                choice_types=CHOICE_TYPES,
+            )
+            for i in range(10)
+        ]
+    )
+
+
+def _counts(**kwargs):
+    """系統ごとの選択数の dict を作成する（指定のない系統は 0）"""
+    counts = {nen_type: 0 for nen_type in NEN_TYPES}
+    counts.update(kwargs)
+    return counts
+
+
+def test_primary_is_most_selected_type():
+    """最も多く選ばれた系統が主系統になること"""
+    result = score_counts(_counts(強化系=6, 放出系=3, 特質系=1))
+    assert result.primary == "強化系"
+    assert result.specialist_score == 28
+
+
+def test_tie_is_broken_by_ring_neighbours():
+    """同数の場合は円環上の両隣の選択数が多い系統が選ばれること"""
+    # 変化系と操作系が同数。変化系の隣（強化系・具現化系）の方が多い
+    result = score_counts(_counts(変化系=4, 操作系=4, 強化系=2))
+    assert result.primary == "変化系"
+
+
+def test_specialist_score_is_capped_unless_primary():
+    """特質系が主系統でない場合、特質系スコアは 90 を超えないこと"""
+    assert score_counts(_counts(特質系=10)).specialist_score == 100
+    assert score_counts(_counts(特質系=5, 強化系=5)).primary == "強化系"
+    assert score_counts(_counts(特質系=5, 強化系=5)).specialist_score == 60
+
+
+def test_specialist_primary_scores_at_least_91():
+    """特質系が主系統の場合、特質系スコアは 91〜100 になること"""
+    result = score_counts(_counts(特質系=3, 強化系=2, 変化系=2, 操作系=2, 放出系=1))
+    assert result.primary == "特質系"
+    assert result.specialist_score == 94
+    assert calculate_affinities(result.primary, result.specialist_score) == [40, 60, 80, 94, 80, 60]
+
+
+def test_affinity_maximum_matches_primary():
+    """10問のすべての選択数の組み合わせで、6系統のスコアが最大の系統が主系統と一致すること"""
+    checked = 0
+    for combination in itertools.combinations_with_replacement(range(len(NEN_TYPES)), 10):
+        counts = _counts()
+        for index in combination:
+            counts[NEN_TYPES[index]] += 1
+        result = score_counts(counts)
+        scores = calculate_affinities(result.primary, result.specialist_score)
+        top = max(scores)
+        assert scores.count(top) == 1 and NEN_TYPES[scores.index(top)] == result.primary, (counts, scores)
+        checked += 1
+    assert checked == 3003
+
+
+def test_tags_are_restored_from_index():
+    """タグを外した質問（クライアントから送り返された質問）でもインデックスから採点できること"""
+    question_set = create_tagged_question_set()
+    assert choice_tag_index.register(question_set) == 10
+
+    # レスポンスにはタグが含まれないため、送り返された質問にはタグがない
+    returned = QuestionSet.model_validate(question_set.model_dump())
+    assert returned.questions[0].choice_types is None
+
+    question_answers = [
+        QuestionAnswer(question=q, selected_choice_index=1) for q in returned.questions
+    ]
+    result = score_answers(question_answers)
+    assert result is not None
+    assert result.primary == "放出系"
+
+
+def test_unknown_tags_return_none():
+    """タグが不明な質問がある場合は採点しないこと"""
+    question = Question(question_text="未登録の質問", choices=["A", "B", "C", "D"])
+    question_answers = [QuestionAnswer(question=question, selected_choice_index=0)] * 10
+    assert score_answers(question_answers) is None
+
+
+def test_local_mode_does_not_call_llm():
+    """local モードでは LLM を呼び出さずに定型コメントで診断すること"""
+    question_set = create_tagged_question_set()
+    choice_tag_index.register(question_set)
+    question_answers = [
+        QuestionAnswer(question=q, selected_choice_index=0) for q in question_set.questions
+    ]
+
+    original = os.environ.get("DIAGNOSIS_MODE")
+    os.environ["DIAGNOSIS_MODE"] = "local"
+    try:
+        result = asyncio.run(adiagnose_personality(question_answers))
+    finally:
+        if original is None:
+            del os.environ["DIAGNOSIS_MODE"]
+        else:
+            os.environ["DIAGNOSIS_MODE"] = original
+
+    assert result.scores[0] == 100
+    assert result.comment == CANNED_COMMENTS["強化系"]
+
+
+def test_local_mode_counts_unknown_tags():
+    """local モードでタグが不明な質問がある場合は、LLM で診断することをメトリクスに記録すること"""
+    question = Question(question_text="別のインスタンスで生成された質問", choices=["A", "B", "C", "D"])
+    question_answers = [QuestionAnswer(question=question, selected_choice_index=0)] * 10
+
+    original = os.environ.get("DIAGNOSIS_MODE")
+    os.environ["DIAGNOSIS_MODE"] = "local"
+    try:
+        mode, local = _local_score_for_mode(question_answers)
+    finally:
+        if original is None:
+            del os.environ["DIAGNOSIS_MODE"]
+        else:
+            os.environ["DIAGNOSIS_MODE"] = original
+
+    assert mode == "local"
+    assert local is None
+    assert 'giravanz_local_scoring_unavailable_total{mode="local"}' in metrics.render()
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_primary_is_most_selected_type,
+        test_tie_is_broken_by_ring_neighbours,
+        test_specialist_score_is_capped_unless_primary,
+        test_specialist_primary_scores_at_least_91,
+        test_affinity_maximum_matches_primary,
+        test_tags_are_restored_from_index,
+        test_unknown_tags_return_none,
+        test_local_mode_does_not_call_llm,
+        test_local_mode_counts_unknown_tags,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
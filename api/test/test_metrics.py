@@ -0,0 +1,151 @@
+"""メトリクス（処理段階の計測・Server-Timing・Prometheus 形式）のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_metrics.py
+"""
+
+import asyncio
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from services.metrics import (
+    MetricsRegistry,
+    ServerTimingMiddleware,
+    metrics,
+    record_stage,
+    timed_ainvoke,
+)
+
+
+def _stage_counts(operation: str) -> dict:
+    """operation の処理段階ごとの記録件数を返す"""
+    counts = {}
+    for key, values in metrics.summary_snapshot("stage_duration_seconds").items():
+        labels = dict(key)
+        if labels["operation"] == operation:
+            counts[labels["stage"]] = values["count"]
+    return counts
+
+
+class PlainChain:
+    """コールバックを呼び出さないチェーン"""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def ainvoke(self, _input, config=None):
+        return self.result
+
+
+def test_timed_ainvoke_splits_stages():
+    """LangChain のチェーンでは prompt / llm / parse に分けて記録されること"""
+    chain = (
+        ChatPromptTemplate.from_messages([("human", "{text}")])
+        | FakeListChatModel(responses=['{"reason": "ok"}'])
+        | JsonOutputParser()
+    )
+    result = asyncio.run(timed_ainvoke(chain, {"text": "hello"}, "test_split"))
+    assert result == {"reason": "ok"}
+    assert _stage_counts("test_split") == {"prompt": 1, "llm": 1, "parse": 1}
+
+
+def test_timed_ainvoke_without_callbacks_and_failures():
+    """コールバックのないチェーンは llm、None・例外は retry として記録されること"""
+    asyncio.run(timed_ainvoke(PlainChain({"ok": True}), {}, "test_plain"))
+    asyncio.run(timed_ainvoke(PlainChain(None), {}, "test_plain"))
+
+    class FailingChain:
+        async def ainvoke(self, _input, config=None):
+            raise Exception("boom")
+
+    try:
+        asyncio.run(timed_ainvoke(FailingChain(), {}, "test_plain"))
+    except Exception:
+        pass
+    assert _stage_counts("test_plain") == {"llm": 1, "retry": 2}
+
+
+def test_render_prometheus_format():
+    """summary の分位点・合計・件数、counter、stats の gauge が出力されること"""
+    registry = MetricsRegistry()
+    for value in (0.1, 0.2, 0.3, 0.4):
+        registry.observe("latency_seconds", value, help="テスト", route="/a")
+    registry.inc("requests_total", route="/a")
+    registry.register_stats("pool", lambda: {"depth": 3, "enabled": True, "backend": "memory", "latency": {"max": 1.5}})
+
+    text = registry.render()
+    assert "# TYPE giravanz_latency_seconds summary" in text
+    assert 'giravanz_latency_seconds{route="/a",quantile="0.5"} 0.3' in text
+    assert 'giravanz_latency_seconds_count{route="/a"} 4' in text
+    assert 'giravanz_requests_total{route="/a"} 1.0' in text
+    assert "giravanz_pool_depth 3.0" in text
+    assert "giravanz_pool_enabled 1.0" in text
+    assert "giravanz_pool_latency_max 1.5" in text
+    assert "backend" not in text
+
+
+def _call_middleware(content_type: bytes):
+    """ServerTimingMiddleware 経由でエンドポイントを呼び出し、送信されたヘッダーを返す"""
+
+    async def endpoint(scope, receive, send):
+        record_stage("test_middleware", "llm", 0.25)
+        record_stage("test_middleware", "llm", 0.25)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/test", "headers": []}
+    asyncio.run(ServerTimingMiddleware(endpoint)(scope, receive, send))
+    return dict(sent[0]["headers"])
+
+
+def test_server_timing_header():
+    """記録した処理段階が合計されて Server-Timing ヘッダーに入ること（SSE には付けない）"""
+    headers = _call_middleware(b"application/json")
+    value = headers[b"server-timing"].decode()
+    assert value.startswith("llm;dur=500.0, total;dur=")
+
+    headers = _call_middleware(b"text/event-stream")
+    assert b"server-timing" not in headers
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_timed_ainvoke_splits_stages,
+        test_timed_ainvoke_without_callbacks_and_failures,
+        test_render_prometheus_format,
+        test_server_timing_header,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""選手診断スクリプト（ジャーナル・アトミックな書き出し・差分診断）のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_player_diagnosis.py
+"""
+
+import importlib.util
+import json
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# 親ディレクトリ（api）と選手診断スクリプトのディレクトリをPythonパスに追加
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_DIR = os.path.join(os.path.dirname(API_DIR), "script", "player-diagnosis")
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+import journal as journal_module
+from journal import DiagnosisJournal, write_json_atomic
+
+
+def _load_diagnose_players():
+    """diagnose-players.py をモジュールとして読み込む（ファイル名にハイフンを含むため）"""
+    spec = importlib.util.spec_from_file_location("diagnose_players", os.path.join(SCRIPT_DIR, "diagnose-players.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _record(player_id: str, comment: str = "") -> dict:
+    return {"id": player_id, "name": f"選手{player_id}", "scores": [100, 80, 60, 40, 60, 80], "comment": comment}
+
+
+def test_journal_skips_torn_last_line():
+    """書き込み途中の末尾の行を無視して読み込み、再開後の追記がその行とつながらないこと"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "players-diagnosis.jsonl"
+        journal = DiagnosisJournal(path, fsync_every=1)
+        journal.append(_record("01", "1回目"))
+        journal.append(_record("02"))
+        journal.append(_record("01", "2回目"))
+        journal.close()
+        # クラッシュで書き込み途中になった行
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"id": "03", "name": "選')
+
+        records = DiagnosisJournal(path).load()
+        assert sorted(records) == ["01", "02"]
+        assert records["01"]["comment"] == "2回目"
+
+        # 再開して追記した結果は、次の再開時にも読み込めること
+        resumed = DiagnosisJournal(path)
+        resumed.append(_record("03"))
+        resumed.close()
+        assert sorted(DiagnosisJournal(path).load()) == ["01", "02", "03"]
+
+
+def test_write_json_atomic_replaces_file():
+    """一時ファイルに書き出してから置き換え、json.dump(indent=2) と同じ内容になること"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "players-diagnosis.json"
+        path.write_text("[]", encoding="utf-8")
+        data = [_record("01", "努力の人"), _record("02")]
+
+        write_json_atomic(path, data)
+
+        assert path.read_text(encoding="utf-8") == json.dumps(data, ensure_ascii=False, indent=2)
+        assert os.listdir(tmp) == ["players-diagnosis.json"]
+
+
+def test_write_json_atomic_keeps_original_on_failure():
+    """書き出しの途中で失敗した場合は元のファイルが残り、一時ファイルも残らないこと"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "players-diagnosis.json"
+        original = json.dumps([_record("01")], ensure_ascii=False, indent=2)
+        path.write_text(original, encoding="utf-8")
+
+        def fail(_fd):
+            raise OSError("disk full")
+
+        original_fsync = journal_module.os.fsync
+        journal_module.os.fsync = fail
+        try:
+            write_json_atomic(path, [_record("01"), _record("02")])
+        except OSError:
+            pass
+        else:
+            raise AssertionError("例外が送出されませんでした")
+        finally:
+            journal_module.os.fsync = original_fsync
+
+        assert path.read_text(encoding="utf-8") == original
+        assert os.listdir(tmp) == ["players-diagnosis.json"]
+
+
+def test_unchanged_players_are_skipped():
+    """内容が変わっていない選手はスキップし、未診断・内容が変わった選手は診断し直すこと"""
+    diagnose_players = _load_diagnose_players()
+    players = [
+        {"id": "01", "name": "選手01", "position": "FW", "profile": {"height": "180cm"}},
+        {"id": "02", "name": "選手02", "position": "DF"},
+        {"id": "03", "name": "選手03", "position": "MF"},
+    ]
+    completed = {
+        player["id"]: {**_record(player["id"]), "content_hash": diagnose_players.player_content_hash(player)}
+        for player in players[:2]
+    }
+
+    pending, changed = diagnose_players.select_pending(players, completed)
+    assert [p["id"] for p in pending] == ["03"]
+    assert changed == 0
+
+    # 選手情報が変わった選手は再診断する
+    updated = [{**players[0], "position": "MF"}] + players[1:]
+    pending, changed = diagnose_players.select_pending(updated, completed)
+    assert [p["id"] for p in pending] == ["01", "03"]
+    assert changed == 1
+
+    # プロンプトのバージョンが変わった場合は全選手を再診断する
+    diagnose_players.PROMPT_VERSION = diagnose_players.PROMPT_VERSION + "-next"
+    pending, changed = diagnose_players.select_pending(players, completed)
+    assert [p["id"] for p in pending] == ["01", "02", "03"]
+    assert changed == 2
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_journal_skips_torn_last_line,
+        test_write_json_atomic_replaces_file,
+        test_write_json_atomic_keeps_original_on_failure,
+        test_unchanged_players_are_skipped,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
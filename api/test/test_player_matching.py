@@ -0,0 +1,142 @@
+"""選手マッチングのテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_player_matching.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.player_matching import PlayerIndex, load_player_index_from_env, parse_vector
+
+
+def create_sample_records():
+    """テスト用の選手の診断結果"""
+    return [
+        {"id": "01", "name": "GK選手", "position": "GK", "primary": "強化系",
+         "scores": [100, 80, 60, 40, 60, 80], "comment": "..."},
+        {"id": "09", "name": "FW選手A", "position": "FW", "primary": "放出系",
+         "scores": [80, 60, 40, 60, 80, 100], "comment": "..."},
+        {"id": "07", "name": "FW選手B", "position": "FW", "primary": "放出系",
+         "scores": [80, 60, 40, 60, 80, 100], "comment": "..."},
+        {"id": "10", "name": "MF選手", "position": "MF", "primary": "変化系",
+         "scores": [80, 100, 80, 60, 40, 60], "comment": "..."},
+        {"id": "99", "name": "不正な選手", "position": "DF", "primary": "操作系",
+         "scores": [1, 2, 3], "comment": "..."},
+    ]
+
+
+def test_search_cosine_nearest():
+    """コサイン距離で最も近い選手が先頭になること"""
+    index = PlayerIndex.from_records(create_sample_records())
+    assert len(index.entries) == 4
+
+    matches = index.search([100, 80, 60, 40, 60, 80], k=2)
+    assert matches[0].id == "01"
+    assert matches[0].distance == 0.0
+    assert matches[0].distance <= matches[1].distance
+
+
+def test_search_tie_break_by_id():
+    """距離が同じ選手は選手IDの昇順になること"""
+    index = PlayerIndex.from_records(create_sample_records())
+    for metric in ("cosine", "l1"):
+        matches = index.search([80, 60, 40, 60, 80, 100], k=2, metric=metric)
+        assert [m.id for m in matches] == ["07", "09"]
+
+
+def test_search_position_filter():
+    """ポジションを指定した場合はそのポジションの選手だけを返すこと"""
+    index = PlayerIndex.from_records(create_sample_records())
+    matches = index.search([100, 80, 60, 40, 60, 80], k=10, positions=["MF", "FW"])
+    assert {m.position for m in matches} == {"MF", "FW"}
+    assert len(matches) == 3
+    assert index.search([100, 80, 60, 40, 60, 80], positions=["STAFF"]) == []
+
+
+def test_search_weighted_l1():
+    """l1 の重みが距離に反映されること"""
+    index = PlayerIndex.from_records(create_sample_records())
+    query = [100, 100, 60, 40, 60, 80]
+    unweighted = index.search(query, k=1, metric="l1")
+    assert unweighted[0].id == "01"
+    assert unweighted[0].distance == 20
+
+    # 変化系の差だけを重視すると MF 選手が最も近くなる
+    weighted = index.search(query, k=1, metric="l1", weights=[0, 10, 0, 0, 0, 0])
+    assert weighted[0].id == "10"
+
+
+def test_search_rejects_unknown_metric():
+    """不明な距離の種類は ValueError になること"""
+    index = PlayerIndex.from_records(create_sample_records())
+    try:
+        index.search([1, 1, 1, 1, 1, 1], metric="l2")
+    except ValueError:
+        return
+    raise AssertionError("ValueError が発生しませんでした")
+
+
+def test_parse_vector():
+    """カンマ区切りのスコアを解析し、不正な値は ValueError になること"""
+    assert parse_vector("80,100,80,40,60,100", "scores") == [80, 100, 80, 40, 60, 100]
+    for text in ("1,2,3", "a,b,c,d,e,f", "1,2,3,4,5,-6", "1,2,3,4,5,nan"):
+        try:
+            parse_vector(text, "scores")
+        except ValueError:
+            continue
+        raise AssertionError(f"ValueError が発生しませんでした: {text}")
+
+
+def test_load_player_index_from_env():
+    """PLAYERS_DIAGNOSIS_PATH のファイルからインデックスを構築すること"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "players-diagnosis.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(create_sample_records(), f, ensure_ascii=False)
+
+        os.environ["PLAYERS_DIAGNOSIS_PATH"] = path
+        try:
+            index = load_player_index_from_env()
+            assert index.loaded and index.source == path
+
+            os.environ["PLAYERS_DIAGNOSIS_PATH"] = os.path.join(tmp, "missing.json")
+            assert not load_player_index_from_env().loaded
+        finally:
+            del os.environ["PLAYERS_DIAGNOSIS_PATH"]
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_search_cosine_nearest,
+        test_search_tie_break_by_id,
+        test_search_position_filter,
+        test_search_weighted_l1,
+        test_search_rejects_unknown_metric,
+        test_parse_vector,
+        test_load_player_index_from_env,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""コールドスタートのプロファイラのテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_profiling.py
+"""
+
+import builtins
+import importlib
+import sys
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.profiling import ColdStartProfiler
+
+
+def test_install_and_finish_restore_import():
+    """install() で import をフックし、finish() で元の import に戻すこと（無効の場合はフックしない）"""
+    original = builtins.__import__
+
+    disabled = ColdStartProfiler(enabled=False)
+    disabled.install()
+    assert builtins.__import__ is original
+    disabled.finish()
+
+    profiler = ColdStartProfiler(enabled=True)
+    profiler.install()
+    try:
+        assert builtins.__import__ is not original
+        # 2回目の install() で自身のフックを元の import として保存しないこと
+        profiler.install()
+    finally:
+        profiler.finish()
+    assert builtins.__import__ is original
+
+
+def test_module_costs_record_new_imports():
+    """新しく読み込んだモジュールごとに、依存モジュールを含む累積時間と自身の時間を記録すること"""
+    with tempfile.TemporaryDirectory() as tmp:
+        Path(tmp, "profiling_child.py").write_text("import time\ntime.sleep(0.02)\n", encoding="utf-8")
+        Path(tmp, "profiling_parent.py").write_text(
+            "import time\nimport profiling_child\ntime.sleep(0.01)\n", encoding="utf-8"
+        )
+        sys.path.insert(0, tmp)
+        profiler = ColdStartProfiler(enabled=True)
+        profiler.install()
+        try:
+            importlib.invalidate_caches()
+            __import__("profiling_parent")
+            # 読み込み済みのモジュールは記録しない
+            __import__("profiling_child")
+        finally:
+            profiler.finish()
+            sys.path.remove(tmp)
+            sys.modules.pop("profiling_parent", None)
+            sys.modules.pop("profiling_child", None)
+
+    costs = {cost["module"]: cost for cost in profiler.module_costs()}
+    assert sorted(costs) == ["profiling_child", "profiling_parent"]
+    parent, child = costs["profiling_parent"], costs["profiling_child"]
+    assert child["self_ms"] >= 20
+    assert parent["cumulative_ms"] >= parent["self_ms"] + child["cumulative_ms"] - 1
+    assert 10 <= parent["self_ms"] < parent["cumulative_ms"]
+    assert profiler.module_costs(top=1)[0]["module"] == "profiling_child"
+
+
+def test_phase_records_elapsed_time():
+    """phase() で囲んだ処理の所要時間を、例外が発生した場合も記録すること"""
+    profiler = ColdStartProfiler(enabled=False)
+    with profiler.phase("player index"):
+        time.sleep(0.01)
+    try:
+        with profiler.phase("llm warmup"):
+            raise RuntimeError("シークレットを取得できません")
+    except RuntimeError:
+        pass
+
+    assert [name for name, _ in profiler.phases] == ["player index", "llm warmup"]
+    assert profiler.phases[0][1] >= 0.01
+    report = profiler.report()
+    assert [phase["phase"] for phase in report["phases"]] == ["player index", "llm warmup"]
+    assert report["modules"] == []
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_install_and_finish_restore_import,
+        test_module_costs_record_new_imports,
+        test_phase_records_elapsed_time,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""質問セットプールのテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_question_pool.py
+"""
+
+import asyncio
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.question import QuestionSet
+from services.question_pool import PoolConfig, QuestionPool
+from test_diagnosis import create_sample_questions
+
+
+async def fake_generator() -> QuestionSet:
+    """LLM の代わりにサンプルの質問セットを返す"""
+    await asyncio.sleep(0.01)
+    return QuestionSet(questions=create_sample_questions())
+
+
+async def failing_generator() -> QuestionSet:
+    """常に失敗する生成関数"""
+    raise Exception("generation failed")
+
+
+async def _wait_for_refill(pool: QuestionPool):
+    """補充処理の完了を待つ"""
+    while pool.refilling:
+        await asyncio.sleep(0.01)
+
+
+def test_pool_prefill_and_hit():
+    """起動時にプールが充填され、取り出しがヒットになること"""
+
+    async def run():
+        pool = QuestionPool(
+            PoolConfig(size=3, low_water=1, refill_concurrency=2), fake_generator
+        )
+        pool.start()
+        await _wait_for_refill(pool)
+        assert pool.depth == 3
+
+        question_set = await pool.get()
+        assert len(question_set.questions) == 10
+        assert pool.hits == 1 and pool.misses == 0
+        assert pool.depth == 2
+        await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_pool_refills_below_low_water():
+    """残量が low_water 以下になると目標の深さまで補充されること"""
+
+    async def run():
+        pool = QuestionPool(
+            PoolConfig(size=3, low_water=1, refill_concurrency=2), fake_generator
+        )
+        pool.start()
+        await _wait_for_refill(pool)
+
+        await pool.get()
+        await pool.get()
+        await _wait_for_refill(pool)
+        assert pool.depth == 3
+        assert pool.stats()["refill_latency_seconds"]["max"] > 0
+        await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_pool_miss_falls_back_to_generator():
+    """プールが空の場合は生成関数を直接呼び出すこと"""
+
+    async def run():
+        pool = QuestionPool(PoolConfig(size=2, low_water=0), fake_generator)
+        question_set = await pool.get()
+        assert len(question_set.questions) == 10
+        assert pool.misses == 1 and pool.hits == 0
+        await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_pool_evicts_expired_sets():
+    """最大保持時間を過ぎた質問セットが破棄されること"""
+
+    async def run():
+        pool = QuestionPool(
+            PoolConfig(size=1, low_water=0, max_age_seconds=0.05), fake_generator
+        )
+        pool.start()
+        await _wait_for_refill(pool)
+        assert pool.depth == 1
+
+        await asyncio.sleep(0.1)
+        await pool.get()
+        assert pool.expired == 1
+        assert pool.misses == 1
+        await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_pool_stops_refill_on_failure():
+    """補充が全件失敗した場合は補充ループが停止すること"""
+
+    async def run():
+        pool = QuestionPool(PoolConfig(size=2, low_water=1), failing_generator)
+        pool.start()
+        await _wait_for_refill(pool)
+        assert pool.depth == 0
+        assert pool.refill_failures == 2
+        await pool.stop()
+
+    asyncio.run(run())
+
+
+def test_pool_config_from_env():
+    """環境変数から設定が読み込まれること"""
+    os.environ["QUESTION_POOL_SIZE"] = "4"
+    os.environ.pop("QUESTION_POOL_LOW_WATER", None)
+    try:
+        config = PoolConfig.from_env()
+        assert config.enabled
+        assert config.size == 4
+        assert config.low_water == 2
+    finally:
+        del os.environ["QUESTION_POOL_SIZE"]
+
+    assert not PoolConfig.from_env().enabled
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_pool_prefill_and_hit,
+        test_pool_refills_below_low_water,
+        test_pool_miss_falls_back_to_generator,
+        test_pool_evicts_expired_sets,
+        test_pool_stops_refill_on_failure,
+        test_pool_config_from_env,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""質問セットのセッション（質問セット ID による診断）のテストスクリプト（LLM は fake バックエンドを使用）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_question_sets.py
+"""
+
+import asyncio
+import json
+import sys
+import os
+import tempfile
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main as api_main
+from models.question import QuestionSet
+from prompts.fallback_questions import FALLBACK_QUESTION_SET
+from services.llm_registry import llm_registry
+from services.question_sets import QuestionSetStore, question_set_id, to_question_answers
+from services.ttl_store import MemoryTTLStore, SQLiteTTLStore
+
+
+def _question_set() -> QuestionSet:
+    return QuestionSet.model_validate(FALLBACK_QUESTION_SET)
+
+
+def test_set_id_is_content_addressed():
+    """同じ内容の質問セットは同じ ID になり、内容が変われば ID も変わること"""
+    question_set = _question_set()
+    assert question_set_id(question_set) == question_set_id(_question_set())
+    assert len(question_set_id(question_set)) == 32
+
+    changed = _question_set()
+    changed.questions[0].choices[0] = "別の選択肢"
+    assert question_set_id(changed) != question_set_id(question_set)
+
+
+def test_store_keeps_choice_types():
+    """保存した質問セットを選択肢のタグも含めて復元できること（メモリ・SQLite）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = [
+            QuestionSetStore(MemoryTTLStore(60, 10)),
+            QuestionSetStore(SQLiteTTLStore(os.path.join(tmp, "sets.sqlite3"), 60, 10, namespace="question_sets")),
+        ]
+        for store in stores:
+            set_id = store.save(_question_set())
+            restored = store.get(set_id)
+            assert restored == _question_set()
+            assert restored.questions[0].choice_types == ["強化系", "放出系", "特質系", "操作系"]
+            assert store.get("unknown") is None
+            assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+
+    disabled = QuestionSetStore(None)
+    assert disabled.save(_question_set()) is None
+    assert disabled.get("anything") is None
+
+
+def test_to_question_answers():
+    """回答のインデックスを質問の順に対応付け、数が合わない場合はエラーにすること"""
+    question_answers = to_question_answers(_question_set(), [0, 1, 2, 3, 0, 1, 2, 3, 0, 1])
+    assert [qa.selected_choice_index for qa in question_answers][:4] == [0, 1, 2, 3]
+    assert question_answers[9].question.question_text == _question_set().questions[9].question_text
+    try:
+        to_question_answers(_question_set(), [0, 1])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("ValueError が送出されませんでした")
+
+
+def test_compact_diagnosis_endpoint():
+    """質問生成の set_id と回答のインデックスだけで診断でき、通常の診断とキャッシュを共有すること"""
+    original_backend = os.environ.get("LLM_BACKEND")
+    os.environ["LLM_BACKEND"] = "fake"
+    llm_registry.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=api_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            generated = (await client.get("/api/questions/generate")).json()
+            answers = [i % 4 for i in range(10)]
+            compact_body = {"set_id": generated["set_id"], "answers": answers}
+            full_body = {
+                "question_answers": [
+                    {"question": question, "selected_choice_index": answer}
+                    for question, answer in zip(generated["questions"], answers)
+                ]
+            }
+            compact = await client.post("/api/diagnosis/compact", json=compact_body)
+            full = await client.post("/api/diagnosis", json=full_body)
+            missing = await client.post("/api/diagnosis/compact", json={"set_id": "unknown", "answers": answers})
+            invalid = await client.post(
+                "/api/diagnosis/compact", json={"set_id": generated["set_id"], "answers": [4] * 10}
+            )
+            return generated, compact_body, full_body, compact, full, missing, invalid
+
+    try:
+        generated, compact_body, full_body, compact, full, missing, invalid = asyncio.run(run())
+    finally:
+        llm_registry.clear()
+        if original_backend is None:
+            del os.environ["LLM_BACKEND"]
+        else:
+            os.environ["LLM_BACKEND"] = original_backend
+
+    assert generated["set_id"]
+    assert "choice_types" not in generated["questions"][0]
+    assert compact.status_code == 200
+    assert full.status_code == 200
+    assert full.headers["x-diagnosis-cache"] == "hit"
+    assert full.json() == compact.json()
+    assert missing.status_code == 404
+    assert invalid.status_code == 422
+
+    # リクエストボディは 95% 以上小さくなる
+    compact_size = len(json.dumps(compact_body, ensure_ascii=False).encode("utf-8"))
+    full_size = len(json.dumps(full_body, ensure_ascii=False).encode("utf-8"))
+    assert compact_size < full_size * 0.05, (compact_size, full_size)
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_set_id_is_content_addressed,
+        test_store_keeps_choice_types,
+        test_to_question_answers,
+        test_compact_diagnosis_endpoint,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
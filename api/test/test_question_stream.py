@@ -0,0 +1,111 @@
+"""質問ストリーミング（SSE）のテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_question_stream.py
+"""
+
+import asyncio
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.question_generator as question_generator
+from models.question import Question, QuestionSet
+from test_diagnosis import create_sample_questions
+
+
+class PartialJsonChain:
+    """LLM の代わりに、生成途中の dict を少しずつ大きくしながら返すチェーン"""
+
+    def __init__(self, fail_after: int = None):
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def astream(self, _input):
+        self.calls += 1
+        questions = [q.model_dump() for q in create_sample_questions()]
+        for i, question in enumerate(questions):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise Exception("stream interrupted")
+            # 選択肢が途中までしか生成されていない状態も返す
+            partial = dict(question, choices=question["choices"][:2])
+            yield {"questions": questions[:i] + [partial]}
+            yield {"questions": questions[: i + 1]}
+
+
+def _collect(chain) -> list:
+    """ストリームの出力をすべて集める"""
+    original = question_generator.get_question_streaming_chain
+    question_generator.get_question_streaming_chain = lambda: chain
+
+    async def run():
+        return [item async for item in question_generator.astream_questions(seed=1)]
+
+    try:
+        return asyncio.run(run())
+    finally:
+        question_generator.get_question_streaming_chain = original
+
+
+def test_stream_emits_questions_then_complete_set():
+    """質問が1つずつ返り、最後に完全な質問セットが返ること"""
+    items = _collect(PartialJsonChain())
+    questions = items[:-1]
+    assert len(questions) == 10
+    assert all(isinstance(q, Question) and len(q.choices) == 4 for q in questions)
+    assert isinstance(items[-1], QuestionSet)
+    assert [q.question_text for q in questions] == [
+        q.question_text for q in items[-1].questions
+    ]
+
+
+def test_stream_error_after_first_question_is_raised():
+    """最初の質問を返した後の失敗はリトライせずに送出されること"""
+    chain = PartialJsonChain(fail_after=3)
+    try:
+        _collect(chain)
+    except Exception as e:
+        assert "stream interrupted" in str(e)
+        assert chain.calls == 1
+    else:
+        raise AssertionError("例外が発生しませんでした")
+
+
+def test_stream_retries_before_first_question():
+    """最初の質問を返す前の失敗はリトライされること"""
+    chain = PartialJsonChain(fail_after=0)
+    try:
+        _collect(chain)
+    except Exception:
+        assert chain.calls == 3
+    else:
+        raise AssertionError("例外が発生しませんでした")
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_stream_emits_questions_then_complete_set,
+        test_stream_error_after_first_question_is_raised,
+        test_stream_retries_before_first_question,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
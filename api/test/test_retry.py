@@ -0,0 +1,244 @@
+"""リトライポリシーのテストスクリプト（LLM を呼び出さずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_retry.py
+"""
+
+import asyncio
+import json
+import sys
+import os
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel, ValidationError
+
+from services.metrics import metrics
+from services.retry import (
+    FATAL,
+    INVALID_OUTPUT,
+    RATE_LIMITED,
+    TRANSIENT,
+    EmptyOutputError,
+    RetryBudget,
+    RetryPolicy,
+    classify_error,
+    retry_after_seconds,
+)
+
+
+class HttpError(Exception):
+    """ステータスコードを持つ例外（Google API の例外を模したもの）"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Model(BaseModel):
+    value: int
+
+
+def _validation_error() -> ValidationError:
+    try:
+        _Model.model_validate({"value": "abc"})
+    except ValidationError as e:
+        return e
+    raise AssertionError("ValidationError が発生しませんでした")
+
+
+def _wrapped(cause: Exception) -> Exception:
+    """原因を持つ例外（ライブラリがラップした例外を模したもの）を作成する"""
+    try:
+        raise cause
+    except Exception as e:
+        try:
+            raise RuntimeError("wrapped") from e
+        except RuntimeError as wrapped:
+            return wrapped
+
+
+def test_classify_error():
+    """ステータスコード・例外の型・メッセージからエラーを分類できること"""
+    assert classify_error(HttpError("too many", 429)) == RATE_LIMITED
+    assert classify_error(Exception("429 RESOURCE_EXHAUSTED: quota exceeded")) == RATE_LIMITED
+    assert classify_error(HttpError("unavailable", 503)) == TRANSIENT
+    assert classify_error(asyncio.TimeoutError()) == TRANSIENT
+    assert classify_error(HttpError("unauthorized", 401)) == FATAL
+    assert classify_error(Exception("400 API key not valid")) == FATAL
+    assert classify_error(ValueError("GOOGLE_API_KEY が設定されていません")) == FATAL
+    assert classify_error(EmptyOutputError()) == INVALID_OUTPUT
+    assert classify_error(_validation_error()) == INVALID_OUTPUT
+    assert classify_error(json.JSONDecodeError("bad", "{", 0)) == INVALID_OUTPUT
+    # ラップされた例外は原因までたどる
+    assert classify_error(_wrapped(HttpError("too many", 429))) == RATE_LIMITED
+    # 判定できない例外は一時的なエラーとして扱う
+    assert classify_error(RuntimeError("something happened")) == TRANSIENT
+
+
+def test_retry_after_seconds():
+    """エラーメッセージから待ち時間の指定を取り出せること"""
+    assert retry_after_seconds(Exception("429 quota exceeded. Please retry in 12.5s.")) == 12.5
+    assert retry_after_seconds(Exception("{'retryDelay': '7s'}")) == 7.0
+    assert retry_after_seconds(Exception("503 unavailable")) is None
+
+
+def test_backoff_is_capped_with_jitter():
+    """待ち時間が上限付きの指数バックオフ（上限の半分〜上限）になること"""
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, rate_limit_multiplier=4.0)
+    for _ in range(50):
+        assert 0.5 <= policy.backoff(0) <= 1.0
+        assert 1.0 <= policy.backoff(1) <= 2.0
+        assert 2.5 <= policy.backoff(5) <= 5.0
+        assert 2.0 <= policy.backoff(0, RATE_LIMITED) <= 4.0
+
+
+def test_retry_delay_respects_limits():
+    """致命的なエラー・最大試行回数・予算不足の場合はリトライしないこと"""
+    metrics.clear()
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, budget=RetryBudget(0.0, 0.0, 1.0))
+    assert policy.retry_delay("test", HttpError("forbidden", 403), 0) is None
+    assert policy.retry_delay("test", TimeoutError(), 2) is None
+    assert policy.retry_delay("test", TimeoutError(), 0) is not None
+    # 予算（1回分）を使い切ったのでリトライしない
+    assert policy.retry_delay("test", TimeoutError(), 0) is None
+    assert policy.budget.stats()["exhausted"] == 1
+
+    rendered = metrics.render()
+    assert 'giravanz_llm_retries_total{error_class="transient",operation="test"} 1' in rendered
+    assert 'reason="budget"' in rendered and 'reason="fatal"' in rendered and 'reason="exhausted"' in rendered
+
+
+def test_budget_is_refilled_by_requests():
+    """最初の試行を記録するとリトライ予算が ratio ずつ貯まること"""
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_tokens=1.0)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_request()
+    assert not budget.try_spend()
+    budget.record_request()
+    assert budget.try_spend()
+
+
+def test_arun_retries_until_success():
+    """一時的なエラーはリトライして成功すること"""
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise EmptyOutputError("empty")
+        return "ok"
+
+    assert asyncio.run(policy.arun("test", call)) == "ok"
+    assert len(calls) == 3
+
+
+def test_run_fails_fast_on_fatal_error():
+    """致命的なエラーはリトライせず、試行回数を付けて送出すること"""
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise HttpError("unauthorized", 401)
+
+    try:
+        policy.run("test", call)
+    except HttpError as e:
+        assert e.retry_attempts == 1
+    else:
+        raise AssertionError("例外が送出されませんでした")
+    assert len(calls) == 1
+
+
+class SequenceChain:
+    """LLM の代わりに、指定した出力を呼び出しごとに順に返すチェーン"""
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        return self.outputs.pop(0)
+
+    def invoke(self, _input, config=None):
+        return self._next()
+
+    async def ainvoke(self, _input, config=None):
+        return self._next()
+
+
+def test_diagnosis_retries_invalid_primary():
+    """LLM が無効な系統名を返した場合は出力の不備としてリトライし、次の有効な結果を返すこと"""
+    import services.diagnosis_service as diagnosis_service
+    from models.diagnosis import PrimaryDiagnosisResult, QuestionAnswer
+    from services.retry import llm_retry_policy
+    from test_diagnosis import create_sample_questions
+
+    question_answers = [
+        QuestionAnswer(question=q, selected_choice_index=0) for q in create_sample_questions()
+    ]
+    invalid = PrimaryDiagnosisResult(primary="強化", specialist_score=45, reason="途中")
+    valid = PrimaryDiagnosisResult(primary="強化系", specialist_score=45, reason="努力の人じゃ")
+    assert classify_error(EmptyOutputError("LLMが無効な系統を返しました: 強化")) == INVALID_OUTPUT
+
+    original_chain = diagnosis_service.get_diagnosis_chain
+    original_mode = os.environ.get("DIAGNOSIS_MODE")
+    original_delay = llm_retry_policy.base_delay
+    os.environ["DIAGNOSIS_MODE"] = "llm"
+    llm_retry_policy.base_delay = 0.001
+    try:
+        chain = SequenceChain([invalid, valid])
+        diagnosis_service.get_diagnosis_chain = lambda: chain
+        result = asyncio.run(diagnosis_service.adiagnose_personality(question_answers))
+        assert chain.calls == 2
+        assert result.scores == [100, 80, 60, 45, 60, 80]
+        assert result.comment == "努力の人じゃ"
+
+        chain = SequenceChain([invalid, valid])
+        result = diagnosis_service.diagnose_personality(question_answers)
+        assert chain.calls == 2
+        assert result.scores == [100, 80, 60, 45, 60, 80]
+    finally:
+        diagnosis_service.get_diagnosis_chain = original_chain
+        llm_retry_policy.base_delay = original_delay
+        if original_mode is None:
+            os.environ.pop("DIAGNOSIS_MODE", None)
+        else:
+            os.environ["DIAGNOSIS_MODE"] = original_mode
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_classify_error,
+        test_retry_after_seconds,
+        test_backoff_is_capped_with_jitter,
+        test_retry_delay_respects_limits,
+        test_budget_is_refilled_by_requests,
+        test_arun_retries_until_success,
+        test_run_fails_fast_on_fatal_error,
+        test_diagnosis_retries_invalid_primary,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
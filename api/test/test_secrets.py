@@ -0,0 +1,176 @@
+"""シークレットストアのテストスクリプト（AWS に接続せずに実行可能）
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_secrets.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.llm_registry as llm_registry_module
+from services.secrets import EnvSecretProvider, FileSecretProvider, SecretProvider, SecretStore
+
+
+class CountingProvider(SecretProvider):
+    """取得回数を数え、値を差し替えられる取得元"""
+
+    name = "counting"
+
+    def __init__(self, value: str):
+        self.value = value
+        self.calls = 0
+        self.fail = False
+
+    def fetch(self):
+        self.calls += 1
+        if self.fail:
+            raise Exception("secrets unavailable")
+        return {"GOOGLE_API_KEY": self.value}
+
+
+def _write_secret(path: str, value: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"GOOGLE_API_KEY": value}, f)
+
+
+def _wait_for_refresh(store: SecretStore) -> None:
+    """バックグラウンドの再取得の完了を待つ"""
+    deadline = time.monotonic() + 2
+    while store._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_provider_without_fetch_cannot_be_instantiated():
+    """fetch を実装していない取得元は作成時に失敗すること"""
+
+    class IncompleteProvider(SecretProvider):
+        name = "incomplete"
+
+    try:
+        IncompleteProvider()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("TypeError が発生しませんでした")
+
+
+def test_fetched_lazily_and_cached():
+    """最初の get() まで取得せず、TTL 内はキャッシュを返すこと"""
+    provider = CountingProvider("key-1")
+    store = SecretStore(provider, ttl_seconds=60)
+    assert provider.calls == 0
+
+    assert store.get("GOOGLE_API_KEY") == "key-1"
+    assert store.get("GOOGLE_API_KEY") == "key-1"
+    assert store.get("MISSING") is None
+    assert provider.calls == 1
+
+
+def test_file_provider_background_refresh():
+    """TTL を過ぎるとバックグラウンドで再取得し、ファイルの変更が反映されること"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "secrets.json")
+        _write_secret(path, "key-1")
+        store = SecretStore(FileSecretProvider(path), ttl_seconds=0.05, max_stale_seconds=10)
+        assert store.get("GOOGLE_API_KEY") == "key-1"
+
+        _write_secret(path, "key-2")
+        time.sleep(0.06)
+        # 期限切れ直後は古い値を返しつつ再取得を開始する
+        assert store.get("GOOGLE_API_KEY") == "key-1"
+        _wait_for_refresh(store)
+        assert store.get("GOOGLE_API_KEY") == "key-2"
+        assert store.fetches == 2
+
+
+def test_keeps_stale_value_on_refresh_failure():
+    """再取得に失敗しても、期限内であれば古い値を使い続けること"""
+    provider = CountingProvider("key-1")
+    store = SecretStore(provider, ttl_seconds=0.02, max_stale_seconds=10)
+    store.get("GOOGLE_API_KEY")
+
+    provider.fail = True
+    time.sleep(0.03)
+    assert store.get("GOOGLE_API_KEY") == "key-1"
+    _wait_for_refresh(store)
+    assert store.failures == 1
+    assert store.get("GOOGLE_API_KEY") == "key-1"
+
+
+def test_refetches_synchronously_after_max_stale():
+    """max_stale_seconds を過ぎた値は使わず、その場で再取得すること"""
+    provider = CountingProvider("key-1")
+    store = SecretStore(provider, ttl_seconds=0.01, max_stale_seconds=0.01)
+    store.get("GOOGLE_API_KEY")
+
+    provider.value = "key-2"
+    time.sleep(0.03)
+    assert store.get("GOOGLE_API_KEY") == "key-2"
+
+
+def test_first_fetch_failure_raises():
+    """キャッシュがない状態で取得に失敗した場合は例外になること"""
+    provider = CountingProvider("key-1")
+    provider.fail = True
+    store = SecretStore(provider, ttl_seconds=60)
+    try:
+        store.get("GOOGLE_API_KEY")
+    except Exception:
+        return
+    raise AssertionError("例外が発生しませんでした")
+
+
+def test_get_api_key_reads_through_store():
+    """get_api_key がシークレットストアから API キーを取得すること"""
+    original = llm_registry_module.secret_store
+    original_key = os.environ.get("GOOGLE_API_KEY")
+    try:
+        llm_registry_module.secret_store = SecretStore(CountingProvider("store-key"), ttl_seconds=60)
+        assert llm_registry_module.get_api_key() == "store-key"
+
+        llm_registry_module.secret_store = SecretStore(EnvSecretProvider(), ttl_seconds=0)
+        os.environ["GOOGLE_API_KEY"] = "env-key"
+        assert llm_registry_module.get_api_key() == "env-key"
+    finally:
+        llm_registry_module.secret_store = original
+        if original_key is None:
+            os.environ.pop("GOOGLE_API_KEY", None)
+        else:
+            os.environ["GOOGLE_API_KEY"] = original_key
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_provider_without_fetch_cannot_be_instantiated,
+        test_fetched_lazily_and_cached,
+        test_file_provider_background_refresh,
+        test_keeps_stale_value_on_refresh_failure,
+        test_refetches_synchronously_after_max_stale,
+        test_first_fetch_failure_raises,
+        test_get_api_key_reads_through_store,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
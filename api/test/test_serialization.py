@@ -0,0 +1,97 @@
+"""JSON のシリアライズとレスポンスクラスのテストスクリプト
+
+実行方法:
+    cd api
+    .venv/bin/python test/test_serialization.py
+"""
+
+import json
+import sys
+import os
+import tempfile
+
+# 親ディレクトリ（api）をPythonパスに追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import Response
+
+from models.question import QuestionSet
+from prompts.fallback_questions import FALLBACK_QUESTION_SET
+from services.responses import FastJSONResponse, model_response
+from services.serialization import dump_json_file, dumps, load_json_file, loads
+
+PLAYERS_JSON = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "script", "players.json"
+)
+
+
+def test_dumps_matches_stdlib_format():
+    """json.dumps(..., ensure_ascii=False) と同じ内容・インデント形式になること"""
+    data = {"name": "伊藤 剛", "scores": [80, 100, 60], "nested": {"ok": True, "value": None, "ratio": 0.5}}
+    assert loads(dumps(data)) == data
+    assert "伊藤".encode("utf-8") in dumps(data)
+    assert dumps(data, indent=True).decode("utf-8") == json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def test_json_file_round_trip():
+    """players.json を読み込み、json.dump(..., indent=2) と同じ形式で書き出せること"""
+    players = load_json_file(PLAYERS_JSON)
+    with open(PLAYERS_JSON, "r", encoding="utf-8") as f:
+        assert players == json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "players.json")
+        dump_json_file(path, players)
+        with open(path, "r", encoding="utf-8") as f:
+            assert f.read() == json.dumps(players, ensure_ascii=False, indent=2)
+
+
+def test_model_response_keeps_headers_and_exclusions():
+    """検証済みモデルのレスポンスが、注入された Response のヘッダーを引き継ぎ、除外フィールドを含まないこと"""
+    question_set = QuestionSet.model_validate(FALLBACK_QUESTION_SET)
+    sub_response = Response()
+    del sub_response.headers["content-length"]
+    sub_response.status_code = None
+    sub_response.headers["X-Fallback"] = "circuit-open"
+
+    result = model_response(question_set, sub_response)
+    assert result.status_code == 200
+    assert result.headers["x-fallback"] == "circuit-open"
+    assert result.headers["content-type"] == "application/json"
+    body = json.loads(result.body)
+    assert body == question_set.model_dump()
+    assert "choice_types" not in body["questions"][0]
+
+
+def test_fast_json_response():
+    """デフォルトのレスポンスクラスが非 ASCII 文字をエスケープせずにレンダリングすること"""
+    response = FastJSONResponse({"message": "診断"})
+    assert json.loads(response.body) == {"message": "診断"}
+    assert "診断".encode("utf-8") in response.body
+
+
+def main():
+    """全テストを実行"""
+    tests = [
+        test_dumps_matches_stdlib_format,
+        test_json_file_round_trip,
+        test_model_response_keeps_headers_and_exclusions,
+        test_fast_json_response,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"✗ {test.__name__}: {e}")
+
+    print()
+    print(f"成功: {passed}/{len(tests)}")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
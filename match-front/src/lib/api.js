@@ -1,6 +1,9 @@
 // API Base URL (環境変数で管理)
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
 
+// 質問セット ID を保存する sessionStorage のキー（診断時に回答のインデックスだけを送るために使う）
+const QUESTION_SET_ID_KEY = 'questionSetId';
+
 // 質問生成API - 10問4択の質問を取得
 export async function fetchQuestions() {
   try {
@@ -9,6 +12,11 @@ export async function fetchQuestions() {
       throw new Error(`質問の取得に失敗しました: ${response.status}`);
     }
     const data = await response.json();
+    if (data.set_id) {
+      sessionStorage.setItem(QUESTION_SET_ID_KEY, data.set_id);
+    } else {
+      sessionStorage.removeItem(QUESTION_SET_ID_KEY);
+    }
     return data.questions; // QuestionSet.questions を返す
   } catch (error) {
     console.error('fetchQuestions error:', error);
@@ -16,9 +24,39 @@ export async function fetchQuestions() {
   }
 }
 
+// 診断API（コンパクト形式）- 質問セット ID と回答のインデックスだけを送信する
+// 質問セットがサーバーに残っていない場合（404）は null を返す
+async function submitCompactDiagnosis(setId, questionAnswers) {
+  const response = await fetch(`${API_BASE_URL}/api/diagnosis/compact`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({
+      set_id: setId,
+      answers: questionAnswers.map((qa) => qa.selected_choice_index)
+    })
+  });
+  if (response.status === 404) {
+    return null;
+  }
+  if (!response.ok) {
+    throw new Error(`診断の実行に失敗しました: ${response.status}`);
+  }
+  return response.json();
+}
+
 // 診断API - 回答を送信して6系統スコアを取得
 export async function submitDiagnosis(questionAnswers) {
   try {
+    const setId = sessionStorage.getItem(QUESTION_SET_ID_KEY);
+    if (setId) {
+      const data = await submitCompactDiagnosis(setId, questionAnswers);
+      if (data) {
+        return data; // DiagnosisResponse { scores, comment }
+      }
+    }
+
     const response = await fetch(`${API_BASE_URL}/api/diagnosis`, {
       method: 'POST',
       headers: {
@@ -0,0 +1,176 @@
+"""並列・レート制限付きのバッチ処理パイプライン（選手診断スクリプト用）"""
+
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# API と同じリトライポリシーを使う（api ディレクトリをパスに追加）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "api"))
+from services.retry import RetryBudget, RetryPolicy, classify_error  # noqa: E402
+
+# バッチ処理のバックオフの上限（秒）。レート制限の解除を待てるよう API より長くする
+BATCH_MAX_DELAY = 60.0
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレートリミッター
+
+    rate（1秒あたりのトークン数）で補充され、最大 capacity までバーストを許容する。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """トークンが貯まるまで待ってから消費する"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class LatencyStats:
+    """1件ごとの処理時間を集計する"""
+
+    def __init__(self):
+        self.samples: List[float] = []
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        """件数・平均・p50・p95・最大を返す"""
+        if not self.samples:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(self.samples)
+        return {
+            "count": len(ordered),
+            "mean": statistics.fmean(ordered),
+            "p50": ordered[int(0.50 * (len(ordered) - 1))],
+            "p95": ordered[int(0.95 * (len(ordered) - 1))],
+            "max": ordered[-1],
+        }
+
+
+class ProgressReporter:
+    """完了件数・スループット・残り時間（ETA）を表示する"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self._started = time.monotonic()
+
+    def update(self, label: str, ok: bool) -> None:
+        self.done += 1
+        if not ok:
+            self.failed += 1
+        elapsed = time.monotonic() - self._started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 else 0.0
+        status = "✓" if ok else "✗"
+        print(
+            f"[{self.done}/{self.total}] {status} {label}  "
+            f"経過 {elapsed:.0f}s / 残り約 {remaining:.0f}s ({rate * 60:.1f} 件/分)"
+        )
+
+
+async def run_pipeline(
+    items: Sequence[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    label: Callable[[Any], str],
+    concurrency: int,
+    requests_per_minute: float,
+    max_retries: int = 3,
+    base_delay: float = 2.0,
+    on_result: Optional[Callable[[Any, Any], None]] = None,
+) -> Tuple[List[Optional[Any]], List[Tuple[Any, Exception]], LatencyStats]:
+    """
+    items を並列に処理する
+
+    同時実行数を concurrency に制限し、LLM 呼び出し（リトライを含む）ごとに
+    トークンバケットからトークンを取得して requests_per_minute を超えないようにする。
+    失敗した場合は API と同じリトライポリシー（services.retry）でエラーを分類し、
+    リトライ可能なエラーのみジッター付きの指数バックオフで max_retries 回まで試行する。
+    リトライの総数はリトライ予算で全体の約2割に抑える。
+
+    Args:
+        items: 処理対象
+        worker: 1件を処理する非同期関数
+        label: 進捗表示用のラベルを返す関数
+        concurrency: 同時実行数
+        requests_per_minute: 1分あたりの最大リクエスト数
+        max_retries: 最大試行回数
+        base_delay: バックオフの基準時間（秒）
+        on_result: 1件成功するごとに (item, result) で呼び出される関数
+
+    Returns:
+        (results, failures, latency):
+            results: items と同じ順序の結果（失敗したものは None）
+            failures: 失敗した (item, 例外) のリスト
+            latency: 成功した1件ごとの処理時間（リトライ・待ち時間を含む）
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(
+        rate=requests_per_minute / 60.0,
+        capacity=max(1.0, min(concurrency, requests_per_minute / 60.0 * 5)),
+    )
+    policy = RetryPolicy(
+        max_attempts=max_retries,
+        base_delay=base_delay,
+        max_delay=BATCH_MAX_DELAY,
+        budget=RetryBudget(ratio=0.2, min_per_second=0.0, max_tokens=max(1.0, concurrency)),
+    )
+    progress = ProgressReporter(len(items))
+    latency = LatencyStats()
+    results: List[Optional[Any]] = [None] * len(items)
+    failures: List[Tuple[Any, Exception]] = []
+
+    async def process(index: int, item: Any) -> None:
+        async with semaphore:
+            started = time.monotonic()
+            policy.record_request()
+            attempt = 0
+            while True:
+                await bucket.acquire()
+                try:
+                    result = await worker(item)
+                except Exception as e:
+                    delay = policy.retry_delay("player_diagnosis", e, attempt)
+                    if delay is not None:
+                        print(
+                            f"  エラー（{label(item)}, 試行 {attempt + 1}/{max_retries}, {classify_error(e)}）: "
+                            f"{e}. {delay:.1f}秒後にリトライします..."
+                        )
+                        await asyncio.sleep(delay)
+                        attempt += 1
+                        continue
+                    failures.append((item, e))
+                    progress.update(f"{label(item)}: {e}", ok=False)
+                    return
+
+                latency.record(time.monotonic() - started)
+                results[index] = result
+                if on_result is not None:
+                    on_result(item, result)
+                progress.update(label(item), ok=True)
+                return
+
+    await asyncio.gather(*(process(i, item) for i, item in enumerate(items)))
+    return results, failures, latency
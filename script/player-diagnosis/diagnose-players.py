@@ -1,20 +1,45 @@
-"""選手の念系統診断スクリプト"""
+"""選手の念系統診断スクリプト
 
-import json
+実行方法:
+    cd script/player-diagnosis
+    ../../api/.venv/bin/python diagnose-players.py --concurrency 8 --rpm 60
+
+診断結果は1件ごとに players-diagnosis.jsonl（ジャーナル）へ追記され、最後に
+players-diagnosis.json へまとめて書き出される。途中で中断・失敗した場合は、
+もう一度実行すると未診断の選手だけを診断する（--fresh で全選手を診断し直す）。
+各結果には選手情報とプロンプトのバージョン（PROMPT_VERSION）の content_hash が付き、
+players.json を更新しても内容が変わっていない選手は再診断しない。
+"""
+
+import argparse
+import asyncio
+import hashlib
 import os
 import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
+from batch_pipeline import run_pipeline
+from journal import DiagnosisJournal, write_json_atomic
+
 # 環境変数を読み込み（apiディレクトリの.envを参照）
 script_dir = Path(__file__).resolve().parent.parent.parent
 env_path = script_dir / "api" / ".env"
 load_dotenv(env_path)
 
+# スコア計算は API と共通のモジュールを使う
+sys.path.insert(0, str(script_dir / "api"))
+from services.affinity import NEN_TYPE_INDEX, calculate_affinities  # noqa: E402
+from services.retry import EmptyOutputError  # noqa: E402
+from services.serialization import load_json_file  # noqa: E402
+
+# プロンプト・モデル・スコア計算を変更したら上げる（全選手が再診断される）
+PROMPT_VERSION = "1"
+
 
 class PlayerDiagnosisResult(BaseModel):
     """選手診断結果"""
@@ -119,38 +144,6 @@ def get_player_diagnosis_prompt() -> ChatPromptTemplate:
     ])
 
 
-def calculate_affinities(primary: str, specialist_score: int) -> List[int]:
-    """primaryを基準に親和性スコアを計算"""
-    types = ["強化系", "変化系", "具現化系", "特質系", "操作系", "放出系"]
-    
-    if primary not in types:
-        raise ValueError(f"Invalid primary type: {primary}")
-    
-    primary_index = types.index(primary)
-    scores = [0] * 6
-    
-    for i in range(6):
-        if i == 3:  # 特質系
-            scores[i] = specialist_score
-            continue
-        
-        distance = min(
-            abs(i - primary_index),
-            6 - abs(i - primary_index)
-        )
-        
-        if distance == 0:
-            scores[i] = 100
-        elif distance == 1:
-            scores[i] = 80
-        elif distance == 2:
-            scores[i] = 60
-        else:  # distance == 3
-            scores[i] = 40
-    
-    return scores
-
-
 def format_player_info(player: Dict[str, Any]) -> str:
     """選手情報をテキスト形式に整形"""
     # look_at_my_play を安全に処理
@@ -196,55 +189,129 @@ def format_player_info(player: Dict[str, Any]) -> str:
     return info.strip()
 
 
-def diagnose_player(player: Dict[str, Any], llm) -> Dict[str, Any]:
-    """選手を診断"""
+def player_content_hash(player: Dict[str, Any]) -> str:
+    """
+    LLM に渡す選手情報とプロンプトのバージョンから内容ハッシュを作成する
+
+    Returns:
+        str: SHA-256 ハッシュ（16進数）
+    """
+    payload = f"{PROMPT_VERSION}\n{format_player_info(player)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def diagnose_player(player: Dict[str, Any], chain) -> Dict[str, Any]:
+    """
+    選手を診断（1回分の LLM 呼び出し。リトライは呼び出し側のパイプラインで行う）
+
+    Raises:
+        EmptyOutputError: LLM が構造化出力を返さなかった、または無効な系統名を返した場合（リトライ対象）
+        Exception: LLM呼び出しに失敗した場合
+    """
     player_info = format_player_info(player)
     position = player.get('position', '不明')
-    
-    prompt = get_player_diagnosis_prompt()
-    structured_llm = llm.with_structured_output(PlayerDiagnosisResult)
-    chain = prompt | structured_llm
-    
-    print(f"診断中: {player.get('name', '不明')} (ID: {player.get('id', '?')}, {position})")
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            result: PlayerDiagnosisResult = chain.invoke({
-                "player_info": player_info,
-                "position": position
-            })
-            
-            if result is None:
-                if attempt < max_retries - 1:
-                    print(f"  警告: LLMが応答を返しませんでした（試行 {attempt + 1}/{max_retries}）. リトライします...")
-                    continue
-                else:
-                    raise Exception("LLMが構造化出力の生成に失敗しました")
-            
-            scores = calculate_affinities(result.primary, result.specialist_score)
-            
-            return {
-                "id": player.get("id"),
-                "name": player.get("name"),
-                "position": player.get("position"),
-                "primary": result.primary,
-                "specialist_score": result.specialist_score,
-                "scores": scores,
-                "comment": result.reason
-            }
-            
-        except Exception as e:
-            if attempt < max_retries - 1:
-                print(f"  エラー（試行 {attempt + 1}/{max_retries}）: {e}. リトライします...")
-                continue
-            else:
-                print(f"  エラー: 診断に失敗しました - {e}")
-                raise
-
-
-def main():
+
+    result: PlayerDiagnosisResult = await chain.ainvoke({
+        "player_info": player_info,
+        "position": position
+    })
+
+    if result is None:
+        raise EmptyOutputError("LLMが構造化出力の生成に失敗しました")
+    if result.primary not in NEN_TYPE_INDEX:
+        raise EmptyOutputError(f"LLMが無効な系統を返しました: {result.primary}")
+
+    scores = calculate_affinities(result.primary, result.specialist_score)
+
+    return {
+        "id": player.get("id"),
+        "name": player.get("name"),
+        "position": player.get("position"),
+        "primary": result.primary,
+        "specialist_score": result.specialist_score,
+        "scores": scores,
+        "comment": result.reason,
+        "content_hash": player_content_hash(player),
+    }
+
+
+def player_label(player: Dict[str, Any]) -> str:
+    """進捗表示用のラベル"""
+    return f"{player.get('name', '不明')} (ID: {player.get('id', '?')}, {player.get('position', '不明')})"
+
+
+def parse_args() -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="選手の念系統を診断して players-diagnosis.json を作成する")
+    parser.add_argument("--concurrency", type=int, default=8, help="同時に実行する診断の数（デフォルト 8）")
+    parser.add_argument("--rpm", type=float, default=60, help="1分あたりの最大 LLM リクエスト数（デフォルト 60）")
+    parser.add_argument("--max-retries", type=int, default=3, help="1人あたりの最大試行回数（デフォルト 3）")
+    parser.add_argument("--fsync-every", type=int, default=8, help="ジャーナルを fsync する間隔（件数、デフォルト 8）")
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="ジャーナルと既存の診断結果を使わず、全選手を診断し直す",
+    )
+    return parser.parse_args()
+
+
+def load_completed(journal: DiagnosisJournal, output_file: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    診断済みの結果を読み込む（既存の players-diagnosis.json にジャーナルの内容を重ねる）
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 選手IDごとの診断結果
+    """
+    completed: Dict[str, Dict[str, Any]] = {}
+    if output_file.exists():
+        for result in load_json_file(output_file):
+            completed[result["id"]] = result
+        print(f"既存の診断結果: {len(completed)}人 ({output_file.name})")
+
+    journaled = journal.load()
+    if journaled:
+        print(f"ジャーナルの診断結果: {len(journaled)}人 ({journal.path.name})")
+    completed.update(journaled)
+    return completed
+
+
+def select_pending(
+    players: List[Dict[str, Any]], completed: Dict[str, Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    診断が必要な選手（未診断、または選手情報・プロンプトが前回の診断時から変わった選手）を選ぶ
+
+    Returns:
+        (pending, changed): 診断する選手のリストと、そのうち内容が変わった選手の数
+    """
+    pending = []
+    changed = 0
+    for player in players:
+        previous = completed.get(player.get("id"))
+        if previous is None:
+            pending.append(player)
+        elif previous.get("content_hash") != player_content_hash(player):
+            pending.append(player)
+            changed += 1
+    return pending, changed
+
+
+def compact(players: List[Dict[str, Any]], completed: Dict[str, Dict[str, Any]], output_file: Path) -> List[Dict[str, Any]]:
+    """
+    診断結果を players.json の順序に並べて players-diagnosis.json にアトミックに書き出す
+
+    Returns:
+        List[Dict[str, Any]]: 書き出した診断結果
+    """
+    results = [completed[p.get("id")] for p in players if p.get("id") in completed]
+    write_json_atomic(output_file, results)
+    return results
+
+
+async def main():
     """メイン処理"""
+    args = parse_args()
+
     # Google API キーの確認
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
@@ -255,40 +322,75 @@ def main():
     script_dir = Path(__file__).parent.parent
     players_file = script_dir / "players.json"
     output_file = Path(__file__).parent / "players-diagnosis.json"
+    journal = DiagnosisJournal(Path(__file__).parent / "players-diagnosis.jsonl", fsync_every=args.fsync_every)
     
     # players.json を読み込み
     print(f"選手データを読み込み: {players_file}")
-    with open(players_file, "r", encoding="utf-8") as f:
-        players = json.load(f)
+    players = load_json_file(players_file)
     
     print(f"選手数: {len(players)}人")
-    
-    # LLM の初期化
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        api_key=api_key,
-        temperature=0.7,
-    )
-    
-    # 各選手を診断
-    results = []
-    for i, player in enumerate(players, 1):
-        print(f"\n[{i}/{len(players)}]", end=" ")
+
+    # 前回までの診断結果（中断した実行のジャーナルを含む）を引き継ぐ
+    if args.fresh:
+        journal.reset()
+        completed: Dict[str, Dict[str, Any]] = {}
+    else:
+        completed = load_completed(journal, output_file)
+    # 選手情報・プロンプトが前回の診断時から変わっていない選手はスキップする
+    pending, changed = select_pending(players, completed)
+    skipped = len(players) - len(pending)
+    print(f"スキップ（変更なし）: {skipped}人 / 未診断: {len(pending) - changed}人 / 変更あり: {changed}人")
+    print(f"同時実行数: {args.concurrency} / 最大 {args.rpm:g} リクエスト/分")
+
+    def on_result(player: Dict[str, Any], result: Dict[str, Any]) -> None:
+        # 1件ごとにジャーナルへ追記し、中断しても再実行時に続きから再開できるようにする
+        journal.append(result)
+        completed[result["id"]] = result
+
+    failures = []
+    latency = None
+    if pending:
+        # LLM とチェーンの初期化（全選手で使い回す）
+        llm = ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash",
+            api_key=api_key,
+            temperature=0.7,
+        )
+        chain = get_player_diagnosis_prompt() | llm.with_structured_output(PlayerDiagnosisResult)
+
+        # 未診断の選手を並列に診断
         try:
-            diagnosis = diagnose_player(player, llm)
-            results.append(diagnosis)
-            print(f"  → {diagnosis['primary']} (特質系: {diagnosis['specialist_score']})")
-        except Exception as e:
-            print(f"  スキップ: {e}")
-            continue
-    
-    # 結果を保存
+            _, failures, latency = await run_pipeline(
+                pending,
+                worker=lambda player: diagnose_player(player, chain),
+                label=player_label,
+                concurrency=args.concurrency,
+                requests_per_minute=args.rpm,
+                max_retries=args.max_retries,
+                on_result=on_result,
+            )
+        finally:
+            journal.close()
+
+    # ジャーナルの内容を players-diagnosis.json にまとめる
     print(f"\n診断結果を保存: {output_file}")
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    
-    print(f"\n完了! {len(results)}/{len(players)} 人の診断が成功しました")
+    results = compact(players, completed, output_file)
+    if not failures:
+        # すべて出力ファイルに反映済みなのでジャーナルは不要
+        journal.reset()
+
+    print(f"\n完了! {len(results)}/{len(players)} 人の診断結果があります（今回 {len(pending) - len(failures)} 人を診断、{skipped} 人をスキップ）")
+    if latency is not None and latency.samples:
+        stats = latency.summary()
+        print(
+            f"1人あたりの所要時間: 平均 {stats['mean']:.1f}s / p50 {stats['p50']:.1f}s / "
+            f"p95 {stats['p95']:.1f}s / 最大 {stats['max']:.1f}s"
+        )
+    for player, error in failures:
+        print(f"  失敗: {player_label(player)} - {error}")
+    if failures:
+        print("失敗した選手は、もう一度このスクリプトを実行すると再診断されます")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
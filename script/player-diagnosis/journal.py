@@ -0,0 +1,130 @@
+"""診断結果のジャーナル（JSONL 追記ログ）と JSON のアトミックな書き出し"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# API と同じ JSON のシリアライズ（orjson）を使う（api ディレクトリをパスに追加）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "api"))
+from services.serialization import dumps, dumps_str, loads  # noqa: E402
+
+
+class DiagnosisJournal:
+    """
+    診断結果を1件ずつ JSONL で追記するジャーナル
+
+    追記ごとに flush し、fsync は fsync_every 件ごと、または fsync_interval 秒ごとにまとめて行う。
+    途中でクラッシュしても、最後に fsync した時点までの結果は失われない。
+    """
+
+    def __init__(self, path: Path, fsync_every: int = 8, fsync_interval: float = 2.0):
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        ジャーナルから診断済みの結果を読み込む
+
+        書き込み途中でクラッシュした末尾の不完全な行は無視する。
+        同じ選手の結果が複数ある場合は後のものを採用する。
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 選手IDごとの診断結果
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return records
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = loads(line)
+                except json.JSONDecodeError:
+                    print(f"警告: ジャーナルの {line_number} 行目を読み込めませんでした（書き込み途中の行）")
+                    continue
+                records[record["id"]] = record
+        return records
+
+    def reset(self) -> None:
+        """ジャーナルを空にする"""
+        self.close()
+        if self.path.exists():
+            self.path.unlink()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """診断結果を1件追記する"""
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+            # 前回の書き込み途中の行が末尾に残っている場合は、次の行とつながらないよう改行する
+            if self._file.tell() > 0 and not self._ends_with_newline():
+                self._file.write("\n")
+        self._file.write(dumps_str(record) + "\n")
+        self._file.flush()
+        self._pending += 1
+
+        if (
+            self._pending >= self.fsync_every
+            or time.monotonic() - self._last_fsync >= self.fsync_interval
+        ):
+            self.sync()
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def sync(self) -> None:
+        """未同期の追記をディスクに書き出す"""
+        if self._file is not None and self._pending:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_fsync = time.monotonic()
+
+    def close(self) -> None:
+        """未同期の追記を書き出してファイルを閉じる"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+def write_json_atomic(path: Path, data: List[Dict[str, Any]]) -> None:
+    """
+    JSON を一時ファイルに書き出してから置き換える（書き込み途中のファイルが残らない）
+
+    Args:
+        path: 書き出し先
+        data: 書き出すデータ
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # json.dump(data, f, ensure_ascii=False, indent=2) と同じ形式
+            f.write(dumps(data, indent=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    # ディレクトリのエントリも永続化する（POSIX のみ）
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
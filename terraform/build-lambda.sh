@@ -25,6 +25,8 @@ google-genai==1.46.0
 langchain==1.0.2
 langchain-core==1.0.0
 langchain-google-genai==3.0.0
+orjson==3.11.3
+brotli==1.2.0
 pydantic==2.12.3
 mangum==0.18.0
 boto3==1.35.0
@@ -41,6 +43,15 @@ cp -r "$API_DIR/prompts" "$BUILD_DIR/"
 cp "$API_DIR/main.py" "$BUILD_DIR/"
 cp "$API_DIR/lambda_handler.py" "$BUILD_DIR/"
 
+# 選手マッチング用の診断結果をコピー（api/data/players-diagnosis.json として読み込まれる）
+PLAYERS_DIAGNOSIS_FILE="$PROJECT_ROOT/script/player-diagnosis/players-diagnosis.json"
+if [ -f "$PLAYERS_DIAGNOSIS_FILE" ]; then
+    mkdir -p "$BUILD_DIR/data"
+    cp "$PLAYERS_DIAGNOSIS_FILE" "$BUILD_DIR/data/"
+else
+    echo "⚠️  Warning: $PLAYERS_DIAGNOSIS_FILE not found. /api/match will be unavailable"
+fi
+
 # 不要なファイルを削除（サイズ削減）
 echo "Removing unnecessary files..."
 cd "$BUILD_DIR"
@@ -5,10 +5,11 @@ resource "aws_apigatewayv2_api" "http_api" {
   description   = "HTTP API for ${var.project_name} ${var.environment}"
 
   cors_configuration {
-    allow_origins = ["*"]
-    allow_methods = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-    allow_headers = ["content-type", "authorization", "x-amz-date", "x-api-key", "x-amz-security-token"]
-    max_age       = 300
+    allow_origins  = ["*"]
+    allow_methods  = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+    allow_headers  = ["content-type", "authorization", "x-amz-date", "x-api-key", "x-amz-security-token", "if-none-match", "x-diagnosis-cache"]
+    expose_headers = ["server-timing", "etag", "retry-after", "x-fallback", "x-diagnosis-cache"]
+    max_age        = 300
   }
 
   tags = {
@@ -11,7 +11,9 @@ resource "aws_lambda_function" "api" {
 
   environment {
     variables = {
-      SECRET_NAME = var.secret_name
+      SECRET_NAME             = var.secret_name
+      REQUEST_TIMEOUT_SECONDS = var.request_timeout
+      LLM_WARMUP              = "false"
     }
   }
 
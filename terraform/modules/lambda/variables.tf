@@ -24,6 +24,12 @@ variable "lambda_timeout" {
   default     = 60
 }
 
+variable "request_timeout" {
+  description = "Per-request deadline in seconds passed down to LLM calls (keep below the 30s API Gateway integration timeout)"
+  type        = number
+  default     = 28
+}
+
 variable "lambda_memory" {
   description = "Lambda function memory in MB"
   type        = number